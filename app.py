@@ -5,16 +5,8 @@ import os
 import csv
 import io
 import math
+import itertools
 import html as _html  # used for safe HTML escaping in Grade Center + AI debrief rendering
-try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    # PDF export is optional; app should still run without reportlab installed.
-    REPORTLAB_AVAILABLE = False
-
 import time
 import random
 import hashlib
@@ -24,11 +16,44 @@ import string
 import urllib.request
 import urllib.error
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 
 import streamlit as st
 
+# Pure scoring / text / psychometrics helpers (no Streamlit; usable from batch jobs)
+from cliniq_core import (
+    AnswerChangeTracker,
+    Pseudonymizer,
+    _kr20_from_matrix,
+    _point_biserial,
+    _safe_float,
+    _top_bottom_discrimination,
+    apply_unsafe_penalty,
+    build_domain_options,
+    detect_unsafe,
+    diff_selected_vs_gold,
+    nclex_score_item,
+    safe_get_setting,
+    safe_get_system,
+    score_intake,
+    score_select4,
+    sha256_hex,
+    shuffle_if_needed,
+    study_epoch,
+)
+from cliniq_core import cat as nclex_cat
+from cliniq_core import irt as nclex_irt
+from cliniq_core import item_stats as nclex_item_stats
+from cliniq_core import rotation as nclex_rotation
+from cliniq_core.archive import ARCHIVE_SUFFIXES, ArchiveReadError, compress_files, describe_stats, iter_archive_records, resolve_codec
+from cliniq_core.lazy import heavy_modules_loaded, lazy_import, module_available
+
+# PDF export is optional; app should still run without reportlab installed.
+# Only check that it is installed here — reportlab/openpyxl/docx are imported inside the builders
+# that need them, so the student path never pays for them (see bench/import_budget.py).
+REPORTLAB_AVAILABLE = module_available("reportlab")
+
 # =============================
 # Flash messages (persist across st.rerun)
 # =============================
@@ -77,6 +102,132 @@ def load_json_safe(path, default):
             pass
         return default
 
+# =============================
+# Rerun profiler (features.json -> "profiler_enabled")
+# =============================
+PERF_RING_MAXLEN = 5000
+
+# Per-run state: Streamlit re-executes this script on every rerun, so this resets each time.
+_PERF_RUN = {"t0": time.perf_counter(), "phase": "module_init", "phase_t0": time.perf_counter(), "page": "", "enabled": None,
+             "heavy_at_start": heavy_modules_loaded()}
+
+
+@st.cache_resource(show_spinner=False)
+def _perf_ring() -> dict:
+    import threading
+    from collections import deque
+    return {"lock": threading.Lock(), "events": deque(maxlen=PERF_RING_MAXLEN)}
+
+
+def perf_enabled() -> bool:
+    if _PERF_RUN["enabled"] is None:
+        feats = load_json_safe(os.path.join(os.path.dirname(os.path.abspath(__file__)), "features.json"), {})
+        _PERF_RUN["enabled"] = bool((feats or {}).get("profiler_enabled", False)) if isinstance(feats, dict) else False
+    return bool(_PERF_RUN["enabled"])
+
+
+def perf_record(name: str, ms: float, kind: str = "span"):
+    try:
+        ring = _perf_ring()
+        with ring["lock"]:
+            ring["events"].append({"name": str(name), "kind": kind, "page": _PERF_RUN["page"] or "(unknown)",
+                                   "ms": float(ms), "ts": time.time()})
+    except Exception:
+        pass
+
+
+def perf_set_page(page: str):
+    _PERF_RUN["page"] = str(page or "")
+
+
+class perf_span:
+    """Context manager timing a block: `with perf_span("render_nclex"): ...` (no-op when disabled)."""
+
+    def __init__(self, name: str, kind: str = "span"):
+        self.name, self.kind, self.t0 = name, kind, None
+
+    def __enter__(self):
+        if perf_enabled():
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.t0 is not None:
+            perf_record(self.name, (time.perf_counter() - self.t0) * 1000.0, self.kind)
+        return False
+
+
+def perf_timed(name: str = "", kind: str = "io"):
+    """Decorator form of perf_span (used on the JSON/JSONL IO helpers)."""
+    def _wrap(fn):
+        label = name or fn.__name__
+
+        def _inner(*args, **kwargs):
+            if not perf_enabled():
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                perf_record(label, (time.perf_counter() - t0) * 1000.0, kind)
+        _inner.__name__ = fn.__name__
+        _inner.__doc__ = fn.__doc__
+        _inner.__wrapped__ = fn
+        return _inner
+    return _wrap
+
+
+def perf_checkpoint(next_phase: str):
+    """Close the current top-level script phase and start `next_phase`.
+
+    The script is one long top-level flow, so phases are marked with checkpoints
+    rather than wrapped in `with` blocks.
+    """
+    now = time.perf_counter()
+    if perf_enabled() and _PERF_RUN["phase"]:
+        perf_record(_PERF_RUN["phase"], (now - _PERF_RUN["phase_t0"]) * 1000.0, "phase")
+    _PERF_RUN["phase"], _PERF_RUN["phase_t0"] = next_phase, now
+
+
+def perf_finish():
+    """Close the last phase and record the whole rerun (call before st.stop() / at script end)."""
+    if not _PERF_RUN["phase"]:
+        return
+    perf_checkpoint("")
+    if perf_enabled():
+        perf_record("rerun_total", (time.perf_counter() - _PERF_RUN["t0"]) * 1000.0, "rerun")
+        # Import budget: a student rerun must not be the one that pulls in PDF/Excel/DOCX libraries.
+        if _PERF_RUN["page"] == "student":
+            for mod in sorted(set(heavy_modules_loaded()) - set(_PERF_RUN["heavy_at_start"])):
+                perf_record(f"heavy_import:{mod}", 0.0, "import_budget")
+
+
+def perf_summary() -> list[dict]:
+    """p50/p95 per (page, kind, name) over the ring buffer."""
+    ring = _perf_ring()
+    with ring["lock"]:
+        events = list(ring["events"])
+    groups = {}
+    for e in events:
+        groups.setdefault((e["page"], e["kind"], e["name"]), []).append(e["ms"])
+    rows = []
+    for (page, kind, name), vals in groups.items():
+        vals.sort()
+        n = len(vals)
+        rows.append({
+            "page": page, "kind": kind, "name": name, "count": n,
+            "p50_ms": round(vals[(n - 1) // 2], 2),
+            "p95_ms": round(vals[min(n - 1, int(math.ceil(0.95 * n)) - 1)], 2),
+            "max_ms": round(vals[-1], 2),
+        })
+    return sorted(rows, key=lambda r: (r["page"], -r["p95_ms"]))
+
+
+def perf_clear():
+    ring = _perf_ring()
+    with ring["lock"]:
+        ring["events"].clear()
+
 # =============================
 # Student Security Hardening (best-effort)
 # =============================
@@ -107,7 +258,6 @@ def apply_student_hardening(student_profile: dict):
         footer_text = f"Session {session_code} • Student • " + __import__("datetime").datetime.now().strftime("%Y-%m-%d %H:%M:%S") if footer_enabled else ""
 
     # Inject CSS/JS into the top-level document (works in Streamlit app page)
-    import streamlit.components.v1 as components
     components.html(f"""
     <script>
     (function() {{
@@ -226,7 +376,7 @@ def render_mcq_no_default(label, options, key, help_text=None, horizontal=False)
         return None
     st.session_state[key] = choice
     return choice
-import streamlit.components.v1 as components
+components = lazy_import("streamlit.components.v1")
 
 # =============================
 # AI (OpenAI) helper
@@ -238,21 +388,171 @@ AI_SYSTEM_PROMPT = (
     "Instead, explain what to look for, what is unsafe, and how to reason to the best answer."
 )
 
-def openai_responses_call(model: str, system_prompt: str, user_prompt: str) -> str:
+# =============================
+# Shared AI client (process-wide pool + concurrency limit + metrics)
+# =============================
+AI_MAX_CONCURRENCY_DEFAULT = 8
+AI_METRICS_MAXLEN = 500
+
+
+@st.cache_resource(show_spinner=False)
+def _ai_client_manager() -> dict:
+    """One manager per server process (shared by every student session).
+
+    Holds the reused OpenAI client, a semaphore capping simultaneous outbound calls
+    (features.json -> ai_max_concurrency), a FIFO ticket list for queue position,
+    and a ring buffer of per-call metrics for the admin dashboard.
+    """
+    import threading
+    from collections import deque
+    try:
+        feats = load_json_safe(BASE_DIR / "features.json", {}) or {}
+        limit = int(feats.get("ai_max_concurrency", AI_MAX_CONCURRENCY_DEFAULT) or AI_MAX_CONCURRENCY_DEFAULT)
+    except Exception:
+        limit = AI_MAX_CONCURRENCY_DEFAULT
+    limit = max(1, limit)
+    return {
+        "lock": threading.Lock(),
+        "sem": threading.BoundedSemaphore(limit),
+        "limit": limit,
+        "client": None,
+        "client_key": "",
+        "next_ticket": 0,
+        "waiting": [],  # tickets in arrival order
+        "in_flight": 0,
+        "metrics": deque(maxlen=AI_METRICS_MAXLEN),
+    }
+
+
+def _ai_get_client(mgr: dict, api_key: str):
+    """Return the shared OpenAI client (rebuilt only if the API key changes)."""
+    with mgr["lock"]:
+        if mgr["client"] is not None and mgr["client_key"] == api_key:
+            return mgr["client"]
+        from openai import OpenAI  # type: ignore
+        try:
+            import httpx  # installed with openai>=1
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=mgr["limit"] * 2, max_keepalive_connections=mgr["limit"]),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            client = OpenAI(api_key=api_key, http_client=http_client)
+        except Exception:
+            client = OpenAI(api_key=api_key)
+        mgr["client"] = client
+        mgr["client_key"] = api_key
+        return client
+
+
+def _ai_acquire_slot(mgr: dict, on_queue=None) -> float:
+    """Block until a concurrency slot is free. Returns seconds spent queued.
+
+    `on_queue(position)` is called while waiting (1 = next in line).
+    """
+    t0 = time.perf_counter()
+    if not mgr["waiting"] and mgr["sem"].acquire(blocking=False):
+        return 0.0
+    with mgr["lock"]:
+        ticket = mgr["next_ticket"]
+        mgr["next_ticket"] += 1
+        mgr["waiting"].append(ticket)
+    try:
+        last_pos = None
+        while True:
+            with mgr["lock"]:
+                pos = mgr["waiting"].index(ticket) + 1
+            if on_queue is not None and pos != last_pos:
+                try:
+                    on_queue(pos)
+                except Exception:
+                    pass
+                last_pos = pos
+            # Only the head of the queue competes for a slot (keeps order fair)
+            if pos == 1 and mgr["sem"].acquire(timeout=0.25):
+                break
+            if pos != 1:
+                time.sleep(0.25)
+    finally:
+        with mgr["lock"]:
+            try:
+                mgr["waiting"].remove(ticket)
+            except ValueError:
+                pass
+    return time.perf_counter() - t0
+
+
+def _ai_record_metric(mgr: dict, **rec):
+    try:
+        rec.setdefault("ts", utc_now_iso())
+        with mgr["lock"]:
+            mgr["metrics"].append(rec)
+    except Exception:
+        pass
+
+
+def ai_call_metrics_summary() -> dict:
+    """Latency/error summary of recent AI calls (for the admin dashboard)."""
+    mgr = _ai_client_manager()
+    with mgr["lock"]:
+        recs = list(mgr["metrics"])
+        in_flight = int(mgr["in_flight"])
+        waiting = len(mgr["waiting"])
+
+    def _pct(vals, p):
+        if not vals:
+            return None
+        vals = sorted(vals)
+        k = min(len(vals) - 1, max(0, int(math.ceil(p / 100.0 * len(vals))) - 1))
+        return round(vals[k], 1)
+
+    lat = [float(r.get("latency_ms", 0) or 0) for r in recs if r.get("ok")]
+    queued = [float(r.get("queued_ms", 0) or 0) for r in recs]
+    errors = [r for r in recs if not r.get("ok")]
+    return {
+        "limit": mgr["limit"],
+        "in_flight": in_flight,
+        "waiting": waiting,
+        "calls": len(recs),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(recs), 3) if recs else 0.0,
+        "latency_p50_ms": _pct(lat, 50),
+        "latency_p95_ms": _pct(lat, 95),
+        "queued_p95_ms": _pct(queued, 95),
+        "recent_errors": [{"ts": r.get("ts"), "error": r.get("error")} for r in errors[-5:]],
+    }
+
+
+def ai_queue_notice(placeholder):
+    """on_queue callback that shows the student their place in the AI queue."""
+    def _cb(pos: int):
+        try:
+            if pos > 0:
+                placeholder.info(f"⏳ AI is busy — you are #{pos} in the queue. Please keep this page open.")
+        except Exception:
+            pass
+    return _cb
+
+
+def openai_responses_call(model: str, system_prompt: str, user_prompt: str, on_queue=None) -> str:
     """Call OpenAI to generate a short coaching/debrief response.
 
     Works with:
     - OpenAI Python SDK v1 (Responses API preferred; falls back to Chat Completions).
     - Returns plain text. Raises a helpful exception if OPENAI_API_KEY is missing.
+    - Uses the shared client + concurrency limit; `on_queue(position)` reports queue position while waiting.
     """
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
 
-    # Try OpenAI Python SDK v1
+    mgr = _ai_client_manager()
+    queued_s = _ai_acquire_slot(mgr, on_queue=on_queue)
+    with mgr["lock"]:
+        mgr["in_flight"] += 1
+    t0 = time.perf_counter()
+    api_used = "responses"
     try:
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=api_key)
+        client = _ai_get_client(mgr, api_key)
 
         # Preferred: Responses API
         try:
@@ -264,22 +564,27 @@ def openai_responses_call(model: str, system_prompt: str, user_prompt: str) -> s
                 ],
             )
             # Best-effort text extraction across SDK variants
+            txt = ""
             if hasattr(resp, "output_text") and resp.output_text:
-                return str(resp.output_text).strip()
-            # Fallback: scan output blocks
-            out = getattr(resp, "output", None) or []
-            chunks = []
-            for item in out:
-                for c in getattr(item, "content", []) or []:
-                    if getattr(c, "type", None) == "output_text":
-                        chunks.append(getattr(c, "text", ""))
-            txt = "\n".join([t for t in chunks if t]).strip()
+                txt = str(resp.output_text).strip()
+            else:
+                # Fallback: scan output blocks
+                out = getattr(resp, "output", None) or []
+                chunks = []
+                for item in out:
+                    for c in getattr(item, "content", []) or []:
+                        if getattr(c, "type", None) == "output_text":
+                            chunks.append(getattr(c, "text", ""))
+                txt = "\n".join([t for t in chunks if t]).strip()
             if txt:
+                _ai_record_metric(mgr, model=model, api=api_used, ok=True,
+                                  latency_ms=(time.perf_counter() - t0) * 1000.0, queued_ms=queued_s * 1000.0)
                 return txt
         except Exception:
             pass
 
         # Fallback: Chat Completions (older but still supported in many installs)
+        api_used = "chat"
         chat = client.chat.completions.create(
             model=model,
             messages=[
@@ -287,11 +592,19 @@ def openai_responses_call(model: str, system_prompt: str, user_prompt: str) -> s
                 {"role": "user", "content": user_prompt},
             ],
         )
-        return (chat.choices[0].message.content or "").strip()
+        txt = (chat.choices[0].message.content or "").strip()
+        _ai_record_metric(mgr, model=model, api=api_used, ok=True,
+                          latency_ms=(time.perf_counter() - t0) * 1000.0, queued_ms=queued_s * 1000.0)
+        return txt
 
     except Exception as e:
+        _ai_record_metric(mgr, model=model, api=api_used, ok=False, error=str(e)[:300],
+                          latency_ms=(time.perf_counter() - t0) * 1000.0, queued_ms=queued_s * 1000.0)
         raise RuntimeError(f"OpenAI call failed: {e}")
-
+    finally:
+        with mgr["lock"]:
+            mgr["in_flight"] = max(0, mgr["in_flight"] - 1)
+        mgr["sem"].release()
 
 
 
@@ -308,6 +621,98 @@ if "attempt_case_title" not in st.session_state:
     st.session_state["attempt_case_title"] = None
 if "attempt_mode" not in st.session_state:
     st.session_state["attempt_mode"] = "practice"
+# =============================
+# HTML fragment cache (case-derived / static markup + AI output)
+# =============================
+HTML_FRAGMENT_CACHE_MAX = 4096
+_FRAGMENT_LONG_TEXT = 256  # longer str args are keyed by sha256 instead of the raw text
+
+# Per-run memo: id(case) -> (case, hash). Cases are reloaded each rerun, so ids are only trusted
+# while the object is held here (module globals reset on every rerun).
+_CASE_HASH_MEMO = {}
+
+
+@st.cache_resource(show_spinner=False)
+def _html_fragment_cache() -> dict:
+    import threading
+    from collections import OrderedDict
+    return {"lock": threading.Lock(), "items": OrderedDict(), "hits": 0, "misses": 0}
+
+
+def case_content_hash(case) -> str:
+    """Stable content hash of a case (or any JSON-like dict), memoized per rerun."""
+    if not isinstance(case, dict):
+        return ""
+    hit = _CASE_HASH_MEMO.get(id(case))
+    if hit is not None and hit[0] is case:
+        return hit[1]
+    h = sha256_hex(json.dumps(case, sort_keys=True, ensure_ascii=False, default=str))[:16]
+    _CASE_HASH_MEMO[id(case)] = (case, h)
+    return h
+
+
+def _fragment_key_part(v):
+    if isinstance(v, dict):
+        return "d:" + case_content_hash(v)
+    if isinstance(v, str) and len(v) > _FRAGMENT_LONG_TEXT:
+        return "h:" + sha256_hex(v)[:16]
+    if isinstance(v, (list, tuple)):
+        return tuple(_fragment_key_part(x) for x in v)
+    return v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+
+
+def html_fragment(kind: str, key_parts: tuple, build):
+    """Return cached markup for (kind, key_parts); `build()` runs only on a miss."""
+    cache = _html_fragment_cache()
+    key = (kind,) + tuple(key_parts)
+    with cache["lock"]:
+        val = cache["items"].get(key)
+        if val is not None:
+            cache["items"].move_to_end(key)
+            cache["hits"] += 1
+            return val
+    val = build()
+    with cache["lock"]:
+        cache["misses"] += 1
+        cache["items"][key] = val
+        while len(cache["items"]) > HTML_FRAGMENT_CACHE_MAX:
+            cache["items"].popitem(last=False)
+    return val
+
+
+def html_fragment_cached(kind: str):
+    """Decorator: cache a pure markup builder keyed by its args (dict args by case hash, long text by sha256)."""
+    def _wrap(fn):
+        def _inner(*args, **kwargs):
+            try:
+                key = tuple(_fragment_key_part(a) for a in args) + tuple(
+                    (k, _fragment_key_part(v)) for k, v in sorted(kwargs.items()))
+                hash(key)
+            except Exception:
+                return fn(*args, **kwargs)
+            return html_fragment(kind, key, lambda: fn(*args, **kwargs))
+        _inner.__name__ = fn.__name__
+        _inner.__doc__ = fn.__doc__
+        _inner.__wrapped__ = fn
+        return _inner
+    return _wrap
+
+
+def html_fragment_stats() -> dict:
+    cache = _html_fragment_cache()
+    with cache["lock"]:
+        total = cache["hits"] + cache["misses"]
+        return {"entries": len(cache["items"]), "hits": cache["hits"], "misses": cache["misses"],
+                "hit_rate": round(cache["hits"] / total, 3) if total else 0.0}
+
+
+def html_fragment_clear():
+    cache = _html_fragment_cache()
+    with cache["lock"]:
+        cache["items"].clear()
+        cache["hits"] = cache["misses"] = 0
+
+
 # =============================
 # Global UI styling (consistent colors & typography)
 # =============================
@@ -410,6 +815,7 @@ h1, h2, h3, h4, h5, h6 { color: #b00020 !important; font-weight: 900 !important;
 
 
 
+@html_fragment_cached("ai_red_titles")
 def format_text_with_red_titles(raw: str) -> str:
     """Convert short 'Section:' lines into markdown headings so global CSS makes them red/bold.
     Keeps body text as normal black.
@@ -435,6 +841,7 @@ def format_text_with_red_titles(raw: str) -> str:
     return "\n".join(out_lines)
 
 
+@html_fragment_cached("ai_debrief")
 def render_ai_debrief_html(raw: str) -> str:
     """Convert AI debrief markdown-ish text into clean HTML:
     - Wrap in a yellow box (handled by caller)
@@ -603,6 +1010,9 @@ BASE_DIR = Path(__file__).resolve().parent
 CASES_PATH = BASE_DIR / "cases.json"
 STUDENTS_PATH = BASE_DIR / "students.json"
 ATTEMPTS_PATH = BASE_DIR / "attempts_log.jsonl"
+ATTEMPTS_SEGMENTS_DIR = BASE_DIR / "attempts_segments"  # rolling segments + manifests (see iter_attempts)
+NCLEX_ITEM_STATS_PATH = BASE_DIR / "nclex_item_stats.json"  # running per-item sums, updated on every save
+NCLEX_IRT_PARAMS_PATH = BASE_DIR / "nclex_irt_params.json"  # Rasch/2PL item parameters keyed by qid (calibrate_nclex_irt)
 ATTEMPTS_CSV_PATH = BASE_DIR / "attempts_export.csv"
 NCLEX_ITEM_CSV_PATH = BASE_DIR / "nclex_item_analysis.csv"
 
@@ -613,7 +1023,9 @@ ATTEMPT_POLICY_PATH = BASE_DIR / "attempts_policy.json"
 ADMIN_SETTINGS_PATH = BASE_DIR / "admin_settings.json"
 RESEARCH_POLICY_PATH = BASE_DIR / "research_policy.json"
 RESEARCH_LOG_PATH = BASE_DIR / "research_log.jsonl"
-RESEARCH_DATASET_PATH = BASE_DIR / "research_dataset.jsonl"
+RESEARCH_DATASET_PATH = BASE_DIR / "research_dataset.jsonl"  # legacy single-file dataset (read-only now)
+# Partitioned dataset: research_store/study_<epoch>/<YYYY-MM>/part-NNNN.jsonl + manifest.json
+RESEARCH_STORE_DIR = BASE_DIR / "research_store"
 IRB_DOCS_DIR = BASE_DIR / "irb_docs"
 
 
@@ -628,13 +1040,20 @@ EXAM_ACCESS_POLICY_PATH = BASE_DIR / "exam_access_policy.json"
 NCLEX_ITEMS_PATH = BASE_DIR / "nclex_items.json"
 NCLEX_POLICY_PATH = BASE_DIR / "nclex_policy.json"
 NCLEX_ACTIVE_SETS_PATH = BASE_DIR / "nclex_active_sets.json"
+NCLEX_ROTATION_HISTORY_PATH = BASE_DIR / "nclex_rotation_history.jsonl"  # append-only, one line per generated set
+# Pre-generated AI explanations (sidecar, keyed by qid + item content hash)
+NCLEX_AI_EXPLANATIONS_PATH = BASE_DIR / "nclex_ai_explanations.json"
 
 # ✅ Feature flags + optional data files
 FEATURES_PATH = BASE_DIR / "features.json"
 BACKUP_DIR = BASE_DIR / "backups"
+# Compressed attempt archives (gzip/lzma/zstd); readable in place via iter_attempts(include_archived=True)
+ATTEMPTS_ARCHIVE_DIR = BACKUP_DIR / "attempts_archive"
 AUTOSAVE_DRAFTS_PATH = BASE_DIR / "autosave_drafts.jsonl"
 KPI_POLICY_PATH = BASE_DIR / "kpi_policy.json"
 EXAM_OVERRIDES_PATH = BASE_DIR / "exam_overrides.json"
+# Server-side attempt deadlines per (student, case, attempt); survives reconnects
+EXAM_DEADLINES_PATH = BASE_DIR / "exam_deadlines.json"
 
 # UI default: keep sidebar tidy (admin tools moved to top menu + Settings)
 SHOW_ADMIN_PANELS_IN_SIDEBAR = False
@@ -678,8 +1097,9 @@ def utc_now_iso() -> str:
     return datetime.utcnow().isoformat()
 
 
-def sha256_hex(s: str) -> str:
-    return hashlib.sha256((s or "").encode("utf-8")).hexdigest()
+def utc_iso_from_epoch(epoch: float) -> str:
+    """Naive UTC ISO timestamp for a Unix time (same format as utc_now_iso())."""
+    return datetime.fromtimestamp(float(epoch), timezone.utc).replace(tzinfo=None).isoformat()
 
 
 def safe_int(x, default=None):
@@ -738,7 +1158,6 @@ def maybe_backup_on_start(features: dict):
     for p in [
         CASES_PATH,
         STUDENTS_PATH,
-        ATTEMPTS_PATH,
         ATTEMPT_POLICY_PATH,
         ADMIN_SETTINGS_PATH,
         CASE_POLICY_PATH,
@@ -748,6 +1167,15 @@ def maybe_backup_on_start(features: dict):
         FEATURES_PATH,
     ]:
         backup_file(p)
+    # Attempts live in several segments; back them up as one compressed attempts_log_<ts>.jsonl.<codec>
+    try:
+        if list_attempt_segments():
+            BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+            compress_files(list_attempt_segments(),
+                           BACKUP_DIR / f"{ATTEMPTS_PATH.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ATTEMPTS_PATH.suffix}",
+                           archive_codec(features))
+    except Exception:
+        pass
 
 
 # =============================
@@ -832,6 +1260,7 @@ ensure_file(KPI_POLICY_PATH, {
 # =============================
 # IO
 # =============================
+@perf_timed()
 def load_cases():
     data = load_json_safe(CASES_PATH, None)
     if data is None:
@@ -862,6 +1291,7 @@ def save_cases(cases_list: list):
     CASES_PATH.write_text(json.dumps(cases_list, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+@perf_timed()
 def load_students():
     ensure_file(STUDENTS_PATH, {"students": []})
     ensure_file(EXAM_OVERRIDES_PATH, {"students": {}})
@@ -871,8 +1301,13 @@ def load_students():
     return data
 
 
+@perf_timed()
 def save_students(data: dict):
-    STUDENTS_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Atomic replace: concurrent logins never see a half-written students.json
+    tmp = STUDENTS_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, STUDENTS_PATH)
+    invalidate_credential_cache()
 
 
 def load_attempt_policy():
@@ -891,6 +1326,7 @@ def save_attempt_policy(policy: dict):
     ATTEMPT_POLICY_PATH.write_text(json.dumps(policy, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+@perf_timed()
 def load_admin_settings():
     ensure_file(ADMIN_SETTINGS_PATH, {
         "app_mode": "Practice",
@@ -916,6 +1352,7 @@ def save_admin_settings(settings: dict):
     flash_success('Saved.')
     ADMIN_SETTINGS_PATH.write_text(json.dumps(settings, ensure_ascii=False, indent=2), encoding="utf-8")
 
+@perf_timed()
 def load_research_policy() -> dict:
     ensure_file(RESEARCH_POLICY_PATH, {
         "enabled": False,
@@ -930,6 +1367,7 @@ def load_research_policy() -> dict:
         "irb_reference": "",
         "irb_docs": [],
         "anonymization_salt": "",
+        "pseudonym_scheme": "hmac-sha256",
         "retention_months": 24,
         "retention_mode": "24 months"
     })
@@ -948,6 +1386,9 @@ def load_research_policy() -> dict:
     data.setdefault("irb_reference", "")
     data.setdefault("irb_docs", [])
     data.setdefault("anonymization_salt", "")
+    # Policies whose salt predates HMAC keep the plain SHA-256 scheme until the salt is regenerated,
+    # so participant ids stay stable within a running study.
+    data.setdefault("pseudonym_scheme", "sha256" if str(data.get("anonymization_salt", "")).strip() else "hmac-sha256")
     data.setdefault("retention_months", 24)
     data.setdefault("retention_mode", "24 months")
     # Generate a private salt if missing (used for hashed participant_id)
@@ -956,6 +1397,12 @@ def load_research_policy() -> dict:
             data["anonymization_salt"] = secrets.token_hex(16)
         except Exception:
             data["anonymization_salt"] = "NR_RESEARCH_V1"
+        data["pseudonym_scheme"] = "hmac-sha256"
+        # Persist it: participant ids and the study partition must not change between calls
+        try:
+            RESEARCH_POLICY_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        except Exception:
+            pass
     return data
 
 
@@ -974,58 +1421,276 @@ def append_research_event(event: dict):
 
 
 
+# =============================
+# Pseudonymization (one keyed service per salt epoch)
+# =============================
+@st.cache_resource(show_spinner=False)
+def _pseudonymizer_holder() -> dict:
+    import threading
+    return {"lock": threading.Lock(), "sig": None, "svc": None}
+
+
+def research_pseudonymizer() -> Pseudonymizer:
+    """Keyed pseudonymizer for the current salt.
+
+    research_policy.json is re-read only when its mtime/size changes, and the service (with its LRU)
+    is rebuilt only when the salt or scheme actually changed.
+    """
+    holder = _pseudonymizer_holder()
+    sig = _file_sig(RESEARCH_POLICY_PATH)
+    svc = holder["svc"]
+    if svc is not None and holder["sig"] == sig:
+        return svc
+    with holder["lock"]:
+        if holder["svc"] is None or holder["sig"] != sig:
+            rp = load_research_policy()
+            salt = str(rp.get("anonymization_salt", "") or "").strip() or "NR_RESEARCH_V1"
+            scheme = str(rp.get("pseudonym_scheme", "") or "hmac-sha256")
+            cur = holder["svc"]
+            if cur is None or cur.epoch != study_epoch(salt) or cur.scheme != scheme:
+                holder["svc"] = Pseudonymizer(salt, scheme)
+            holder["sig"] = _file_sig(RESEARCH_POLICY_PATH)
+        return holder["svc"]
+
+
 def _hash_participant(identifier: str) -> str:
-    """Hash identifier with admin-configured salt to produce participant_id."""
+    """participant_id for one identifier (memoized per salt epoch)."""
     try:
-        rp = load_research_policy()
-        salt = str(rp.get("anonymization_salt", "") or "").strip() or "NR_RESEARCH_V1"
-        return hashlib.sha256((salt + "|" + (identifier or "")).encode("utf-8")).hexdigest()[:16]
+        return research_pseudonymizer().pid(identifier)
     except Exception:
         return "anon"
 
 
+def pseudonymize_many(identifiers) -> list[str]:
+    """participant_id for a whole export batch; each distinct identifier is hashed once."""
+    ids = list(identifiers)
+    try:
+        return research_pseudonymizer().bulk(ids)
+    except Exception:
+        return ["anon"] * len(ids)
+
+
+# =============================
+# Research dataset store (partitioned by study epoch + month)
+# =============================
+def research_study_epoch(policy: dict | None = None) -> str:
+    """Short, non-reversible id of the current anonymization salt.
+
+    Rows hashed with different salts cannot be joined, so each salt is its own study partition.
+    """
+    if not isinstance(policy, dict):
+        return research_pseudonymizer().epoch
+    salt = str(policy.get("anonymization_salt", "") or "").strip() or "NR_RESEARCH_V1"
+    return study_epoch(salt)
+
+
+@st.cache_resource(show_spinner=False)
+def _research_store_lock():
+    import threading
+    return threading.RLock()
+
+
+def _research_partition_dir(study: str, month: str) -> Path:
+    return RESEARCH_STORE_DIR / f"study_{study}" / month
+
+
+def _load_partition_manifest(pdir: Path) -> dict:
+    man = load_json_safe(pdir / "manifest.json", {})
+    if not isinstance(man, dict):
+        man = {}
+    man.setdefault("active_segment", "part-0000.jsonl")
+    man.setdefault("segments", {})
+    return man
+
+
+def _write_partition_manifest(pdir: Path, man: dict):
+    segs = man.get("segments", {}).values()
+    mins = [x["min_submitted_at"] for x in segs if x.get("min_submitted_at")]
+    maxs = [x["max_submitted_at"] for x in segs if x.get("max_submitted_at")]
+    man["rows"] = sum(int(x.get("rows", 0) or 0) for x in segs)
+    man["bytes"] = sum(int(x.get("bytes", 0) or 0) for x in segs)
+    man["min_submitted_at"] = min(mins) if mins else ""
+    man["max_submitted_at"] = max(maxs) if maxs else ""
+    man["updated_at"] = utc_now_iso()
+    tmp = pdir / "manifest.json.tmp"
+    tmp.write_text(json.dumps(man, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, pdir / "manifest.json")
+
+
 def append_research_dataset_row(row: dict):
-    """Append a de-identified research row to research_dataset.jsonl (separate from teaching attempts)."""
+    """Append a de-identified research row to its study/month partition (separate from teaching attempts)."""
     try:
         # Ensure directory exists for IRB docs (used elsewhere)
         try:
             IRB_DOCS_DIR.mkdir(parents=True, exist_ok=True)
         except Exception:
             pass
-        with open(RESEARCH_DATASET_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        row = dict(row)
+        study = str(row.get("study_epoch") or research_study_epoch())
+        row["study_epoch"] = study
+        submitted = str(row.get("submitted_at") or "") or utc_now_iso()
+        month = submitted[:7] if re.match(r"^\d{4}-\d{2}", submitted) else now_local().strftime("%Y-%m")
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+
+        with _research_store_lock():
+            pdir = _research_partition_dir(study, month)
+            pdir.mkdir(parents=True, exist_ok=True)
+            man = _load_partition_manifest(pdir)
+            man["study_epoch"], man["month"] = study, month
+            seg_name = man["active_segment"]
+            with open(pdir / seg_name, "a", encoding="utf-8") as f:
+                f.write(line)
+            seg = man["segments"].setdefault(seg_name, {"rows": 0, "bytes": 0, "min_submitted_at": "", "max_submitted_at": ""})
+            seg["rows"] = int(seg.get("rows", 0) or 0) + 1
+            seg["bytes"] = int(seg.get("bytes", 0) or 0) + len(line.encode("utf-8"))
+            if submitted and (not seg.get("min_submitted_at") or submitted < seg["min_submitted_at"]):
+                seg["min_submitted_at"] = submitted
+            if submitted and submitted > (seg.get("max_submitted_at") or ""):
+                seg["max_submitted_at"] = submitted
+            _write_partition_manifest(pdir, man)
     except Exception:
         pass
 
 
-def iter_research_dataset():
-    """Yield rows from research_dataset.jsonl (best-effort)."""
-    if not RESEARCH_DATASET_PATH.exists():
-        return []
-    out = []
+def iter_research_partitions(study: str | None = None):
+    """Yield (partition_dir, manifest) in study/month order; reads manifests only."""
+    if not RESEARCH_STORE_DIR.exists():
+        return
+    for sdir in sorted(RESEARCH_STORE_DIR.glob("study_*")):
+        if study and sdir.name != f"study_{study}":
+            continue
+        for pdir in sorted(p for p in sdir.iterdir() if p.is_dir()):
+            yield pdir, _load_partition_manifest(pdir)
+
+
+def _iter_jsonl_dicts(path: Path):
     try:
-        with open(RESEARCH_DATASET_PATH, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
                 try:
                     rec = json.loads(line)
-                    if isinstance(rec, dict):
-                        out.append(rec)
                 except Exception:
                     continue
+                if isinstance(rec, dict):
+                    yield rec
     except Exception:
-        return []
-    return out
+        return
+
+
+def iter_research_dataset(study: str | None = None, since: str = "", until: str = ""):
+    """Yield research rows one at a time (legacy research_dataset.jsonl first, then partitions).
+
+    since/until are ISO prefixes compared against submitted_at; partitions whose manifest range
+    falls outside them are skipped without being opened.
+    """
+    def _in_range(r):
+        ts = str(r.get("submitted_at", "") or "")
+        return (not since or ts >= since) and (not until or ts <= until)
+
+    if RESEARCH_DATASET_PATH.exists() and not study:
+        for rec in _iter_jsonl_dicts(RESEARCH_DATASET_PATH):
+            if _in_range(rec):
+                yield rec
+    for pdir, man in iter_research_partitions(study):
+        if since and man.get("max_submitted_at") and man["max_submitted_at"] < since:
+            continue
+        if until and man.get("min_submitted_at") and man["min_submitted_at"] > until:
+            continue
+        for seg_name in sorted(man.get("segments", {})):
+            for rec in _iter_jsonl_dicts(pdir / seg_name):
+                if _in_range(rec):
+                    yield rec
+
+
+def _archived_file(base: Path):
+    """base itself (older, uncompressed archives) or base + a codec suffix, whichever exists."""
+    for cand in [base] + [base.with_name(base.name + suffix) for suffix in ARCHIVE_SUFFIXES]:
+        if cand.exists():
+            return cand
+    return None
+
+
+def iter_archived_research_dataset(since: str = "", until: str = ""):
+    """Yield research rows from research_archives/ that are no longer in the live dataset.
+
+    Archives are snapshots: a segment still present in research_store/ (or the legacy file, while
+    it exists) is read from the live copy instead, and a segment found in several archives is read
+    once. Unreadable archives raise ArchiveReadError.
+    """
+    def _in_range(r):
+        ts = str(r.get("submitted_at", "") or "")
+        return (not since or ts >= since) and (not until or ts <= until)
+
+    if not RESEARCH_ARCHIVE_DIR.exists():
+        return
+    seen = set()
+    for folder in sorted(p for p in RESEARCH_ARCHIVE_DIR.glob("study_*") if p.is_dir()):
+        legacy = _archived_file(folder / RESEARCH_DATASET_PATH.name)
+        if legacy is not None and not RESEARCH_DATASET_PATH.exists() and "legacy" not in seen:
+            seen.add("legacy")
+            yield from (r for r in iter_archive_records(legacy) if _in_range(r))
+        store = folder / RESEARCH_STORE_DIR.name
+        if not store.exists():
+            continue
+        for man_path in sorted(store.glob("study_*/*/manifest.json")):
+            pdir = man_path.parent
+            rel = pdir.relative_to(store)
+            man = load_json_safe(man_path, {})
+            if since and man.get("max_submitted_at") and man["max_submitted_at"] < since:
+                continue
+            if until and man.get("min_submitted_at") and man["min_submitted_at"] > until:
+                continue
+            for seg_name in sorted((man or {}).get("segments", {})):
+                key = (str(rel), seg_name)
+                path = _archived_file(pdir / seg_name)
+                if path is None or key in seen or (RESEARCH_STORE_DIR / rel / seg_name).exists():
+                    continue
+                seen.add(key)
+                yield from (r for r in iter_archive_records(path) if _in_range(r))
+
+
+def research_archive_exists() -> bool:
+    return RESEARCH_ARCHIVE_DIR.exists() and any(
+        _archived_file(f / RESEARCH_DATASET_PATH.name) is not None or (f / RESEARCH_STORE_DIR.name).exists()
+        for f in RESEARCH_ARCHIVE_DIR.glob("study_*"))
+
+
+def research_dataset_exists() -> bool:
+    if RESEARCH_DATASET_PATH.exists():
+        return True
+    return any(int(man.get("rows", 0) or 0) > 0 for _pdir, man in iter_research_partitions())
+
+
+def research_store_summary() -> list[dict]:
+    """One row per partition, from manifests (for the Research admin page)."""
+    return [{
+        "study": man.get("study_epoch") or pdir.parent.name.replace("study_", ""),
+        "month": man.get("month") or pdir.name,
+        "rows": int(man.get("rows", 0) or 0),
+        "segments": len(man.get("segments", {})),
+        "bytes": int(man.get("bytes", 0) or 0),
+        "first_submitted_at": man.get("min_submitted_at", ""),
+        "last_submitted_at": man.get("max_submitted_at", ""),
+    } for pdir, man in iter_research_partitions()]
 
 
 def purge_research_dataset() -> tuple[bool, str]:
-    """Delete only the de-identified research dataset file (does not touch teaching attempts)."""
+    """Delete only the de-identified research dataset (legacy file + partitions; teaching attempts untouched)."""
     try:
-        if RESEARCH_DATASET_PATH.exists():
-            RESEARCH_DATASET_PATH.unlink()
-            return True, "De-identified research dataset purged (research_dataset.jsonl deleted)."
+        removed = []
+        with _research_store_lock():
+            if RESEARCH_DATASET_PATH.exists():
+                RESEARCH_DATASET_PATH.unlink()
+                removed.append(RESEARCH_DATASET_PATH.name)
+            if RESEARCH_STORE_DIR.exists():
+                import shutil
+                shutil.rmtree(RESEARCH_STORE_DIR)
+                removed.append(RESEARCH_STORE_DIR.name + "/")
+        if removed:
+            return True, f"De-identified research dataset purged ({', '.join(removed)} deleted)."
         return True, "No research dataset file to purge."
     except Exception as e:
         return False, f"Could not purge research dataset: {e}"
@@ -1035,12 +1700,14 @@ def regenerate_anonymization_salt(policy: dict | None = None) -> dict:
     try:
         pol = policy if isinstance(policy, dict) else load_research_policy()
         pol["anonymization_salt"] = secrets.token_hex(16)
+        pol["pseudonym_scheme"] = "hmac-sha256"
         save_research_policy(pol)
         return pol
     except Exception:
         pol = load_research_policy()
         try:
             pol["anonymization_salt"] = secrets.token_hex(16)
+            pol["pseudonym_scheme"] = "hmac-sha256"
             save_research_policy(pol)
         except Exception:
             pass
@@ -1048,26 +1715,66 @@ def regenerate_anonymization_salt(policy: dict | None = None) -> dict:
 
 
 def archive_research_data(note: str = "") -> tuple[bool, str]:
-    """Archive research_dataset.jsonl + research_log.jsonl + research_policy snapshot into a timestamped folder."""
+    """Archive the research dataset + research_log.jsonl + research_policy snapshot into a timestamped folder.
+
+    Every live partition is first sealed (new rows go to a fresh segment), so the segments being
+    archived never change afterwards; each is then compressed into the archive outside the store
+    lock, under the same study/month path and name. The research log is moved, and the live log
+    starts empty. iter_archived_research_dataset() reads the archives back.
+    """
     try:
         RESEARCH_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
         ts = now_local().strftime("%Y%m%d_%H%M%S")
         safe_note = re.sub(r"[^a-zA-Z0-9_-]+", "_", (note or "").strip())[:40].strip("_")
         folder = RESEARCH_ARCHIVE_DIR / (f"study_{ts}" + (f"_{safe_note}" if safe_note else ""))
         folder.mkdir(parents=True, exist_ok=True)
+        codec = archive_codec()
 
         moved_any = False
-        # dataset
+        n_rows = 0
+        sealed = []  # (partition dir, manifest as archived)
+        with _research_store_lock():
+            for pdir, man in list(iter_research_partitions()):
+                try:
+                    sealed.append((pdir, json.loads(json.dumps(man))))
+                    if man.get("segments"):
+                        seg_no = int(re.sub(r"\D", "", man["active_segment"]) or 0) + 1
+                        man["active_segment"] = f"part-{seg_no:04d}.jsonl"
+                        _write_partition_manifest(pdir, man)
+                except Exception:
+                    pass
+        data_in = data_out = 0
+        # legacy single-file dataset (no longer appended to)
         if RESEARCH_DATASET_PATH.exists():
             try:
-                (folder / RESEARCH_DATASET_PATH.name).write_bytes(RESEARCH_DATASET_PATH.read_bytes())
+                st_ = compress_files([RESEARCH_DATASET_PATH], folder / RESEARCH_DATASET_PATH.name, codec)
+                data_in, data_out = data_in + st_["bytes_in"], data_out + st_["bytes_out"]
+                moved_any = True
+            except Exception:
+                pass
+        # partitions: sealed segments are immutable, so they are compressed without holding the lock
+        for pdir, man in sealed:
+            rel = pdir.relative_to(RESEARCH_STORE_DIR)
+            dest_dir = folder / RESEARCH_STORE_DIR.name / rel
+            try:
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                for seg_name in man.get("segments", {}):
+                    if (pdir / seg_name).exists():
+                        st_ = compress_files([pdir / seg_name], dest_dir / seg_name, codec)
+                        data_in, data_out = data_in + st_["bytes_in"], data_out + st_["bytes_out"]
+                (dest_dir / "manifest.json").write_text(json.dumps(man, ensure_ascii=False, indent=2), encoding="utf-8")
+                n_rows += int(man.get("rows", 0) or 0)
                 moved_any = True
             except Exception:
                 pass
-        # log
+        # log: moved aside first (new events start a fresh log), then compressed into the archive
+        log_stats = None
         if RESEARCH_LOG_PATH.exists():
             try:
-                (folder / RESEARCH_LOG_PATH.name).write_bytes(RESEARCH_LOG_PATH.read_bytes())
+                moving = RESEARCH_LOG_PATH.with_name(RESEARCH_LOG_PATH.name + ".archiving")
+                os.replace(RESEARCH_LOG_PATH, moving)
+                log_stats = compress_files([moving], folder / RESEARCH_LOG_PATH.name, codec)
+                moving.unlink()
                 moved_any = True
             except Exception:
                 pass
@@ -1081,7 +1788,8 @@ def archive_research_data(note: str = "") -> tuple[bool, str]:
         if not moved_any:
             return True, f"No research dataset/log to archive. Created archive folder: {folder}"
 
-        return True, f"Archived research files to: {folder}"
+        return True, (f"Archived research files ({n_rows} partitioned rows, {data_in:,} → {data_out:,} bytes {codec}) to: {folder}"
+                      + (f"; research log {describe_stats(log_stats)}" if log_stats else ""))
     except Exception as e:
         return False, f"Archive failed: {e}"
 
@@ -1112,6 +1820,7 @@ def start_new_study_guided(note: str = "") -> tuple[bool, str]:
             pol["anonymization_salt"] = secrets.token_hex(16)
         except Exception:
             pol["anonymization_salt"] = pol.get("anonymization_salt", "NR_RESEARCH_V1")
+        pol["pseudonym_scheme"] = "hmac-sha256"
         pol["irb_status"] = "Pending"
         pol["irb_reference"] = ""
         pol["irb_docs"] = []
@@ -1131,12 +1840,8 @@ def start_new_study_guided(note: str = "") -> tuple[bool, str]:
 
 
 def _anon_student(student_username: str) -> str:
-    # Stable anonymization (same input -> same output) for cohort research
-    try:
-        salt = "NR_RESEARCH_V1"
-        return hashlib.sha256((salt + "|" + (student_username or "")).encode("utf-8")).hexdigest()[:16]
-    except Exception:
-        return "anon"
+    # Stable anonymization (same input -> same output) for cohort research; same keyed service as participant_id
+    return _hash_participant(student_username)
 
 
 def should_collect_research() -> bool:
@@ -1148,28 +1853,76 @@ def should_collect_research() -> bool:
     return True
 
 
+def nclex_change_tracker() -> AnswerChangeTracker:
+    """This attempt's answer-change tracker (in session_state; nothing is written until finalize)."""
+    t = st.session_state.get("nclex_track")
+    if not isinstance(t, AnswerChangeTracker):
+        t = AnswerChangeTracker()
+        st.session_state["nclex_track"] = t
+    return t
+
+
 def track_nclex_change(qid: str, prev, ans):
-    """Track initial vs final answers and change counts (per question)."""
-    if "nclex_track" not in st.session_state:
-        st.session_state.nclex_track = {}
-    t = st.session_state.nclex_track.get(qid) or {"changes": 0, "initial": None, "final": None}
-    # decide if ans is non-empty
-    non_empty = ans is not None and ans != "" and ans != [] and ans != {}
-    if t.get("initial") is None and non_empty:
-        try:
-            t["initial"] = json.loads(json.dumps(ans))
-        except Exception:
-            t["initial"] = ans
-    if prev is not None and prev != ans:
-        t["changes"] = int(t.get("changes", 0) or 0) + 1
+    """Track initial vs final answers, change counts and answer times (per question)."""
+    nclex_change_tracker().record(qid, prev, ans)
+
+
+def flush_nclex_research_record(case_id: str, rec: dict | None = None):
+    """Write this attempt's single research record (dataset row + log event) once, at save/finalize.
+
+    Later calls for the same attempt are no-ops, so Save Attempt, Finalize and auto-submit can all call it.
+    """
+    attempt_key = f"{case_id}|{st.session_state.get('attempt_started_epoch') or ''}"
+    if st.session_state.get("nclex_research_flushed") == attempt_key:
+        return
     try:
-        t["final"] = json.loads(json.dumps(ans))
+        if not should_collect_research():
+            return
+        rp = load_research_policy()
+        rec = rec if isinstance(rec, dict) else build_attempt_record_from_state(case_id)
+        pid_src = str(rec.get("student_id", "") or rec.get("student_username", "") or "")
+        participant_id = _hash_participant(pid_src) if bool(rp.get("anonymize_student_id", True)) else pid_src
+        scores = rec.get("scores") if isinstance(rec.get("scores"), dict) else {}
+        total_score = sum(int(scores.get(d, 0) or 0) for d in ["A", "B", "C", "D", "E"])
+        row = {
+            "participant_id": participant_id,
+            "submitted_at": rec.get("submitted_at", "") or utc_now_iso(),
+            "caseId": rec.get("caseId", ""),
+            "caseTitle": rec.get("caseTitle", ""),
+            "mode": rec.get("mode", ""),
+            "cohort": rec.get("cohort", ""),
+            "total_score": total_score,
+            "total_with_intake": total_score + int(rec.get("intake_score", 0) or 0),
+            "nclex_score": rec.get("nclex_score", None),
+            "nclex_total": rec.get("nclex_total", None),
+            "domain_scores": scores,
+            "intake_score": rec.get("intake_score", None),
+            "duration_seconds": rec.get("duration_seconds", None),
+        }
+        if bool(rp.get("collect_answer_change", True)):
+            row["nclex_changes"] = nclex_change_tracker().to_record()
+        if bool(rp.get("collect_section_performance", True)):
+            row["performance_by_section"] = {"Intake": {"score": int(rec.get("intake_score", 0) or 0)},
+                                             **{d: {"score": int(scores.get(d, 0) or 0)} for d in ["A", "B", "C", "D", "E"]},
+                                             "NCLEX": {"score": rec.get("nclex_score", 0), "total": rec.get("nclex_total", 0)}}
+        if bool(rp.get("collect_reflection", False)):
+            row["reflection"] = str(st.session_state.get("research_reflection", "") or "")
+        append_research_dataset_row(row)
+        append_research_event({
+            "event": "attempt_saved",
+            "ts": now_local().isoformat(),
+            "student": participant_id,
+            "caseId": row["caseId"],
+            "mode": row["mode"],
+            "total_score": row["total_score"],
+            "nclex_score": row["nclex_score"],
+        })
+        st.session_state["nclex_research_flushed"] = attempt_key
     except Exception:
-        t["final"] = ans
-    st.session_state.nclex_track[qid] = t
-
+        pass
 
 
+@perf_timed()
 def load_case_policy():
     ensure_file(CASE_POLICY_PATH, {
         "default_visibility": True,
@@ -1324,6 +2077,7 @@ def save_case_policy(policy: dict):
     CASE_POLICY_PATH.write_text(json.dumps(policy, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+@perf_timed()
 def load_exam_access_policy():
     ensure_file(EXAM_ACCESS_POLICY_PATH, {
         "enabled": False,
@@ -1344,6 +2098,7 @@ def load_exam_access_policy():
 def save_exam_access_policy(policy: dict):
     flash_success('Saved.')
     EXAM_ACCESS_POLICY_PATH.write_text(json.dumps(policy, ensure_ascii=False, indent=2), encoding="utf-8")
+    invalidate_credential_cache()
 
 
 def is_exam_password_active(policy: dict) -> bool:
@@ -1367,52 +2122,553 @@ def is_exam_password_active(policy: dict) -> bool:
     return True
 
 
-def save_attempt(record):
-    with open(ATTEMPTS_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+# =============================
+# Credential index (cached for login bursts)
+# =============================
+@st.cache_resource(show_spinner=False)
+def _credential_cache() -> dict:
+    """Process-wide cache shared by all sessions: students index + exam-password state."""
+    import threading
+    return {"lock": threading.RLock(), "students_sig": None, "students_index": {}, "exam_sig": None, "exam_state": None}
 
 
-def iter_attempts():
-    if not ATTEMPTS_PATH.exists():
-        return
-    with open(ATTEMPTS_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except Exception:
-                continue
+def _file_sig(path: Path):
+    try:
+        stt = path.stat()
+        return (stt.st_mtime_ns, stt.st_size)
+    except Exception:
+        return None
 
 
+def invalidate_credential_cache():
+    try:
+        c = _credential_cache()
+        with c["lock"]:
+            c["students_sig"] = None
+            c["exam_sig"] = None
+    except Exception:
+        pass
 
-def build_attempt_record_from_state(case_id: str) -> dict:
-    """Build a complete attempt record using current Streamlit session_state.
 
-    This is used by the NCLEX Practical "Save Attempt" button and by exam auto-save.
-    It must be GLOBAL (not nested) so it can be called from render_nclex_practical().
+def get_student_index() -> dict:
+    """username -> student record. Re-parses students.json only when its mtime/size changes."""
+    c = _credential_cache()
+    sig = _file_sig(STUDENTS_PATH)
+    if sig is not None and c["students_sig"] == sig:
+        return c["students_index"]
+    with c["lock"]:
+        sig = _file_sig(STUDENTS_PATH)
+        if sig is not None and c["students_sig"] == sig:
+            return c["students_index"]
+        data = load_students()
+        index = {}
+        for s in data.get("students", []):
+            u = str(s.get("username", "")).strip()
+            if u and u not in index:  # first match wins (same as the old linear scan)
+                index[u] = s
+        c["students_index"] = index
+        c["students_sig"] = _file_sig(STUDENTS_PATH)
+        return index
+
+
+def get_exam_password_state() -> dict:
+    """Cached view of exam_access_policy.json: {"enabled", "hash", "force_only", "expires_at"}.
+
+    Expiry is evaluated on every call; the policy file is written (disabled) at most once,
+    under the cache lock, instead of on every login attempt.
     """
-    # Time/duration
-    started_epoch = st.session_state.get("attempt_started_epoch") or time.time()
-    try:
-        started_epoch = float(started_epoch)
-    except Exception:
-        started_epoch = time.time()
-    duration_sec = int(max(0.0, time.time() - started_epoch))
+    c = _credential_cache()
+    sig = _file_sig(EXAM_ACCESS_POLICY_PATH)
+    state = c["exam_state"]
+    if sig is None or c["exam_sig"] != sig or state is None:
+        with c["lock"]:
+            policy = load_exam_access_policy()
+            exp = parse_iso_dt(policy.get("expires_at", ""))
+            try:
+                exp = exp.astimezone(TZ) if exp is not None else None
+            except Exception:
+                pass
+            state = {
+                "enabled": bool(policy.get("enabled", False)),
+                "hash": (policy.get("exam_password_sha256") or "").strip().lower(),
+                "force_only": bool(policy.get("force_exam_password_only", True)),
+                "expires_at": exp,
+            }
+            c["exam_state"] = state
+            c["exam_sig"] = _file_sig(EXAM_ACCESS_POLICY_PATH)
 
-    admin_settings = load_admin_settings()
-    mode = admin_settings.get("app_mode", "Practice")
+    if state["enabled"] and state["expires_at"] is not None and now_local() >= state["expires_at"]:
+        with c["lock"]:
+            if c["exam_state"] is state and state["enabled"]:
+                # Persist the expiry once (same effect as is_exam_password_active)
+                is_exam_password_active(load_exam_access_policy())
+                state = dict(state, enabled=False)
+                c["exam_state"] = state
+                c["exam_sig"] = _file_sig(EXAM_ACCESS_POLICY_PATH)
+    return state
 
-    # Student identity
-    student_profile = st.session_state.get("student_profile") or {}
-    student_username = st.session_state.get("student_username") or student_profile.get("username") or ""
 
-    student_display_name = st.session_state.get("student_display_name") or student_profile.get("display_name") or student_profile.get("name") or ""
-    student_id = st.session_state.get("student_id") or student_profile.get("student_id") or student_profile.get("id") or ""
-    cohort = student_profile.get("cohort", "") or st.session_state.get("student_cohort", "")
+# =============================
+# Attempts log (rolling segments + manifests)
+# =============================
+# New attempts go to attempts_segments/attempts_<YYYYMMDD>_<NN>.jsonl (one day per segment, rolled
+# over at ATTEMPTS_SEGMENT_MAX_BYTES). Each segment has a <name>.manifest.json sidecar with its
+# record count, min/max timestamp and the cases/cohorts/systems/modes it contains, so filtered reads
+# skip whole segments without opening them. The legacy attempts_log.jsonl is read as one more segment.
+ATTEMPTS_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+_SEGMENT_RE = re.compile(r"^attempts_(\d{8})_(\d{2})\.jsonl$")
 
-    # Case info (best-effort)
+
+@st.cache_resource(show_spinner=False)
+def _attempt_segments_state() -> dict:
+    import threading
+    return {"lock": threading.RLock(), "manifests": {}, "item_stats": None}
+
+
+def _attempt_ts(rec: dict) -> str:
+    return str(rec.get("submitted_at") or rec.get("timestamp") or "")
+
+
+def _manifest_path(seg: Path) -> Path:
+    return seg.with_name(seg.stem + ".manifest.json")
+
+
+def _new_manifest(seg: Path) -> dict:
+    return {"segment": seg.name, "records": 0, "bytes": 0, "min_ts": "", "max_ts": "",
+            "cases": [], "cohorts": [], "systems": [], "modes": []}
+
+
+def _manifest_add(man: dict, rec: dict, nbytes: int):
+    man["records"] += 1
+    man["bytes"] += nbytes
+    ts = _attempt_ts(rec)
+    if ts:
+        if not man["min_ts"] or ts < man["min_ts"]:
+            man["min_ts"] = ts
+        if ts > man["max_ts"]:
+            man["max_ts"] = ts
+    for field, val in (("cases", rec.get("caseId") or rec.get("case_id")), ("cohorts", rec.get("cohort")),
+                       ("systems", rec.get("system")), ("modes", rec.get("mode"))):
+        val = str(val or "").strip()
+        if val not in man[field]:
+            man[field].append(val)
+
+
+def _write_manifest(seg: Path, man: dict):
+    for field in ("cases", "cohorts", "systems", "modes"):
+        man[field] = sorted(man[field])
+    path = _manifest_path(seg)
+    # unique tmp name: other processes (CLI jobs, replicas) may rebuild the same manifest concurrently
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    try:
+        tmp.write_text(json.dumps(man, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _rebuild_manifest(seg: Path) -> dict:
+    man = _new_manifest(seg)
+    with open(seg, "rb") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line:
+                man["bytes"] += len(raw)
+                continue
+            try:
+                rec = json.loads(line)
+            except Exception:
+                man["bytes"] += len(raw)
+                continue
+            if isinstance(rec, dict):
+                _manifest_add(man, rec, len(raw))
+            else:
+                man["bytes"] += len(raw)
+    _write_manifest(seg, man)
+    return man
+
+
+def _segment_manifest(seg: Path) -> dict:
+    """Manifest for one segment; rebuilt by a single scan if missing or out of date (size mismatch).
+
+    Rebuilds hold the segments lock, so concurrent readers wait for one scan instead of racing it.
+    """
+    state = _attempt_segments_state()
+    sig = _file_sig(seg)
+    hit = state["manifests"].get(str(seg))
+    if hit and hit[0] == sig:
+        return hit[1]
+    with state["lock"]:
+        sig = _file_sig(seg)
+        hit = state["manifests"].get(str(seg))
+        if hit and hit[0] == sig:
+            return hit[1]
+        man = load_json_safe(_manifest_path(seg), None)
+        if not isinstance(man, dict) or int(man.get("bytes", -1)) != (sig[1] if sig else 0):
+            man = _rebuild_manifest(seg)
+        state["manifests"][str(seg)] = (sig, man)
+        return man
+
+
+def list_attempt_segments() -> list[Path]:
+    """All attempt segment files in write order (legacy attempts_log.jsonl first)."""
+    out = [ATTEMPTS_PATH] if ATTEMPTS_PATH.exists() and ATTEMPTS_PATH.stat().st_size > 0 else []
+    if ATTEMPTS_SEGMENTS_DIR.exists():
+        out += sorted(p for p in ATTEMPTS_SEGMENTS_DIR.glob("attempts_*.jsonl") if _SEGMENT_RE.match(p.name))
+    return out
+
+
+def _segment_for_append(day: str) -> Path:
+    ATTEMPTS_SEGMENTS_DIR.mkdir(parents=True, exist_ok=True)
+    existing = sorted(ATTEMPTS_SEGMENTS_DIR.glob(f"attempts_{day}_*.jsonl"))
+    if existing:
+        last = existing[-1]
+        if last.stat().st_size < ATTEMPTS_SEGMENT_MAX_BYTES:
+            return last
+        n = int(_SEGMENT_RE.match(last.name).group(2)) + 1
+    else:
+        n = 0
+    return ATTEMPTS_SEGMENTS_DIR / f"attempts_{day}_{n:02d}.jsonl"
+
+
+def _append_attempt_records(records: list) -> int:
+    """Append records to their day segments and update each touched manifest once."""
+    by_day = {}
+    for r in records:
+        ts = _attempt_ts(r)
+        day = ts[:10].replace("-", "") if re.match(r"^\d{4}-\d{2}-\d{2}", ts) else datetime.utcnow().strftime("%Y%m%d")
+        by_day.setdefault(day, []).append(r)
+    state = _attempt_segments_state()
+    with state["lock"]:
+        stats = _item_stats_locked(state)
+        for day, recs in by_day.items():
+            seg = _segment_for_append(day)
+            man = _segment_manifest(seg) if seg.exists() else _new_manifest(seg)
+            lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in recs]
+            with open(seg, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            man = dict(man, cases=list(man["cases"]), cohorts=list(man["cohorts"]),
+                       systems=list(man["systems"]), modes=list(man["modes"]))
+            for r, line in zip(recs, lines):
+                _manifest_add(man, r, len(line.encode("utf-8")))
+            _write_manifest(seg, man)
+            state["manifests"][str(seg)] = (_file_sig(seg), man)
+        for r in records:
+            nclex_item_stats.add_attempt(stats, r)
+        _save_item_stats_locked(state, stats)
+    return len(records)
+
+
+def _live_attempts_bytes() -> int:
+    return sum(int(_segment_manifest(seg).get("bytes", 0) or 0) for seg in list_attempt_segments())
+
+
+def _item_stats_locked(state: dict) -> dict:
+    """Running item statistics; rebuilt from the log when missing or not covering the live log."""
+    stats = state.get("item_stats")
+    if stats is None:
+        stats = load_json_safe(NCLEX_ITEM_STATS_PATH, None)
+    live = _live_attempts_bytes()
+    if (not isinstance(stats, dict) or stats.get("version") != nclex_item_stats.STATS_VERSION
+            or int(stats.get("covered_bytes", -1)) != live):
+        stats = nclex_item_stats.build_item_stats(iter_attempts())
+        stats["covered_bytes"] = live
+        stats["rebuilt_at"] = utc_now_iso()
+        _save_item_stats_locked(state, stats)
+    state["item_stats"] = stats
+    return stats
+
+
+def _save_item_stats_locked(state: dict, stats: dict):
+    stats["covered_bytes"] = _live_attempts_bytes()
+    stats["updated_at"] = utc_now_iso()
+    tmp = NCLEX_ITEM_STATS_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(stats, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, NCLEX_ITEM_STATS_PATH)
+    state["item_stats"] = stats
+
+
+def load_item_stats() -> dict:
+    """Per-qid sufficient statistics for the live attempts log (O(items) to read)."""
+    state = _attempt_segments_state()
+    with state["lock"]:
+        return _item_stats_locked(state)
+
+
+def rebuild_item_stats() -> tuple[bool, str]:
+    """Exact full recompute of nclex_item_stats.json from the live attempts log."""
+    try:
+        state = _attempt_segments_state()
+        with state["lock"]:
+            stats = nclex_item_stats.build_item_stats(iter_attempts())
+            stats["rebuilt_at"] = utc_now_iso()
+            _save_item_stats_locked(state, stats)
+        return True, f"Rebuilt item statistics: {len(stats['items'])} items from {stats['attempts']} attempts with NCLEX details."
+    except Exception as e:
+        return False, f"Item statistics rebuild failed: {e}"
+
+
+IRT_MODELS = ("rasch", "2pl")
+
+
+def load_irt_params() -> dict:
+    """{"models": {"rasch": fit, "2pl": fit}} from the last calibration(s); fit["items"] is keyed by qid."""
+    data = load_json_safe(NCLEX_IRT_PARAMS_PATH, None)
+    if not isinstance(data, dict) or not isinstance(data.get("models"), dict):
+        return {"models": {}}
+    return data
+
+
+def irt_item_params(qid: str, model: str = "", params: dict | None = None) -> dict:
+    """Calibrated parameters for one item (2PL preferred unless model is given); {} if never calibrated."""
+    models = (params or load_irt_params()).get("models") or {}
+    for m in ([model] if model else ["2pl", "rasch"]):
+        p = ((models.get(m) or {}).get("items") or {}).get(qid)
+        if p:
+            return dict(p, model=m)
+    return {}
+
+
+def calibrate_nclex_irt(model: str = "rasch", include_archived: bool = False,
+                        min_responses: int = 20) -> tuple[bool, str]:
+    """Fit Rasch or 2PL on every attempt's NCLEX details and store the result in nclex_irt_params.json."""
+    model = str(model or "rasch").strip().lower()
+    if model not in IRT_MODELS:
+        return False, f"Unknown IRT model: {model} (use rasch or 2pl)."
+    if not module_available("numpy"):
+        return False, "IRT calibration needs numpy (pip install numpy)."
+    try:
+        fit = nclex_irt.calibrate(iter_attempts(include_archived=include_archived), model=model,
+                                  min_responses=min_responses)
+        if not fit["n_responses"]:
+            # keep any earlier calibration instead of overwriting it with an empty fit
+            return False, "No NCLEX item details found in the attempts log; nothing to calibrate."
+        fit["calibrated_at"] = utc_now_iso()
+        fit["include_archived"] = bool(include_archived)
+        data = load_irt_params()
+        data["models"][model] = fit
+        data["updated_at"] = fit["calibrated_at"]
+        tmp = NCLEX_IRT_PARAMS_PATH.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, NCLEX_IRT_PARAMS_PATH)
+    except Exception as e:
+        return False, f"IRT calibration failed: {e}"
+    return True, (f"{model.upper() if model == '2pl' else 'Rasch'} calibration: {len(fit['items'])} items "
+                  f"(≥{min_responses} responses) from {fit['n_responses']:,} responses / {fit['n_persons']:,} attempts "
+                  f"in {fit['seconds']}s, {fit['iterations']} EM cycles"
+                  f"{'' if fit['converged'] else ' (not converged; results are approximate)'}.")
+
+
+def _segment_matches(man: dict, since: str, until: str, cases, cohorts, modes) -> bool:
+    if since and man.get("max_ts") and man["max_ts"] < since:
+        return False
+    if until and man.get("min_ts") and man["min_ts"] > until:
+        return False
+    for field, wanted in (("cases", cases), ("cohorts", cohorts), ("modes", modes)):
+        if wanted and not (set(man.get(field) or []) & set(wanted)):
+            return False
+    return True
+
+
+@perf_timed()
+def save_attempt(record):
+    _append_attempt_records([record])
+    try:
+        close_exam_deadline(record.get("student_username", ""), record.get("caseId", ""), "saved")
+    except Exception:
+        pass
+
+
+def save_attempts_bulk(records: list) -> int:
+    """Append many attempt records with one write per segment (used by the deadline sweeper)."""
+    records = [r for r in (records or []) if isinstance(r, dict)]
+    if not records:
+        return 0
+    return _append_attempt_records(records)
+
+
+def iter_attempts(since: str = "", until: str = "", cases=None, cohorts=None, modes=None, include_archived: bool = False):
+    """Yield attempt records from every segment (compatible with the old single-file reader).
+
+    Optional filters only skip whole segments whose manifest cannot match (since/until are ISO
+    strings compared with submitted_at/timestamp); callers still filter individual records.
+    include_archived=True first streams the compressed archives in ATTEMPTS_ARCHIVE_DIR; an archive
+    that cannot be read raises ArchiveReadError.
+    """
+    filtered = bool(since or until or cases or cohorts or modes)
+    if include_archived:
+        for arc in list_attempt_archives():
+            man = load_json_safe(_archive_manifest_path(arc), None)
+            if filtered and isinstance(man, dict) and not _segment_matches(man, since, until, cases, cohorts, modes):
+                continue
+            yield from iter_archive_records(arc)  # ArchiveReadError propagates: never drop archived data silently
+    for seg in list_attempt_segments():
+        if filtered:
+            try:
+                man = _segment_manifest(seg)
+            except Exception:
+                man = None  # no manifest to prune with: read the whole segment rather than skip it
+            if man is not None and not _segment_matches(man, since, until, cases, cohorts, modes):
+                continue
+        try:
+            f = open(seg, "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue  # archived or compacted since it was listed
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except Exception:
+                    continue
+
+
+def archive_codec(features: dict | None = None) -> str:
+    """Codec for new archives (features.json "archive_codec": gzip | lzma | zstd; zstd needs `zstandard`)."""
+    return resolve_codec((features if isinstance(features, dict) else load_features()).get("archive_codec", "gzip"))
+
+
+def list_attempt_archives() -> list[Path]:
+    if not ATTEMPTS_ARCHIVE_DIR.exists():
+        return []
+    return sorted(p for p in ATTEMPTS_ARCHIVE_DIR.glob("attempts_log_*.jsonl.*") if p.suffix in (".gz", ".xz", ".zst"))
+
+
+def _archive_manifest_path(arc: Path) -> Path:
+    return arc.with_name(arc.name + ".manifest.json")
+
+
+def _merged_manifest(segments: list) -> dict:
+    """One manifest covering several segments (for an archive built from them)."""
+    out = {"records": 0, "bytes": 0, "min_ts": "", "max_ts": "", "cases": [], "cohorts": [], "systems": [], "modes": []}
+    for seg in segments:
+        man = _segment_manifest(seg)
+        out["records"] += int(man.get("records", 0) or 0)
+        out["bytes"] += int(man.get("bytes", 0) or 0)
+        if man.get("min_ts") and (not out["min_ts"] or man["min_ts"] < out["min_ts"]):
+            out["min_ts"] = man["min_ts"]
+        if man.get("max_ts", "") > out["max_ts"]:
+            out["max_ts"] = man["max_ts"]
+        for field in ("cases", "cohorts", "systems", "modes"):
+            out[field] = sorted(set(out[field]) | set(man.get(field) or []))
+    return out
+
+
+def attempt_manifest_values(field: str) -> list[str]:
+    """Distinct cases/cohorts/systems/modes across all segments, read from manifests only."""
+    vals = set()
+    for seg in list_attempt_segments():
+        try:
+            vals.update(_segment_manifest(seg).get(field) or [])
+        except Exception:
+            continue
+    return sorted(vals)
+
+
+def attempt_system_options() -> list[str]:
+    """System filter choices from manifests, resolved like _attempt_system() (stored value, else the case's)."""
+    stored = attempt_manifest_values("systems")
+    vals = {v for v in stored if v}
+    if "" in stored:  # some records carry no system: they resolve through their case
+        for cid in attempt_manifest_values("cases"):
+            case = CASES_BY_ID.get(cid)
+            vals.add((safe_get_system(case) if isinstance(case, dict) else "") or "—")
+    return sorted(vals)
+
+
+def attempt_segments_summary() -> list[dict]:
+    rows = []
+    for seg in list_attempt_segments():
+        try:
+            man = _segment_manifest(seg)
+        except Exception:
+            continue
+        rows.append({"segment": seg.name, "records": man.get("records", 0), "bytes": man.get("bytes", 0),
+                     "first": man.get("min_ts", ""), "last": man.get("max_ts", ""),
+                     "cases": len(man.get("cases") or []), "cohorts": len(man.get("cohorts") or [])})
+    return rows
+
+
+def write_all_attempts_jsonl(out_path: Path) -> int:
+    """Concatenate every segment into one JSONL file (backups / archives); returns bytes written."""
+    import shutil
+    n = 0
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp, "wb") as out:
+        for seg in list_attempt_segments():
+            with open(seg, "rb") as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+            n += seg.stat().st_size
+    os.replace(tmp, out_path)
+    return n
+
+
+def clear_all_attempts():
+    """Remove every segment + manifest and truncate the legacy log."""
+    state = _attempt_segments_state()
+    with state["lock"]:
+        if ATTEMPTS_PATH.exists():
+            ATTEMPTS_PATH.write_text("", encoding="utf-8")
+        if ATTEMPTS_SEGMENTS_DIR.exists():
+            for p in ATTEMPTS_SEGMENTS_DIR.glob("attempts_*"):
+                p.unlink()
+        state["manifests"].clear()
+        _save_item_stats_locked(state, nclex_item_stats.empty_item_stats())
+
+
+def segment_legacy_attempts_log() -> tuple[bool, str]:
+    """Move records from the single-file attempts_log.jsonl into day segments (one-time migration)."""
+    try:
+        state = _attempt_segments_state()
+        with state["lock"]:
+            if not ATTEMPTS_PATH.exists() or ATTEMPTS_PATH.stat().st_size == 0:
+                return True, "attempts_log.jsonl is empty; nothing to segment."
+            legacy = [r for r in _iter_jsonl_dicts(ATTEMPTS_PATH)]
+            _append_attempt_records(legacy)
+            ATTEMPTS_PATH.write_text("", encoding="utf-8")
+            state["manifests"].pop(str(ATTEMPTS_PATH), None)
+            rebuild_item_stats()  # the moved records were just counted a second time
+        return True, f"Moved {len(legacy)} record(s) from {ATTEMPTS_PATH.name} into {ATTEMPTS_SEGMENTS_DIR.name}/."
+    except Exception as e:
+        return False, f"Segmenting attempts log failed: {e}"
+
+
+def replace_all_attempts(records: list):
+    """Rewrite the whole attempts log as fresh segments (Data Tools delete)."""
+    state = _attempt_segments_state()
+    with state["lock"]:
+        clear_all_attempts()
+        _append_attempt_records([r for r in records if isinstance(r, dict)])
+
+
+def build_attempt_record_from_state(case_id: str) -> dict:
+    """Build a complete attempt record using current Streamlit session_state.
+
+    This is used by the NCLEX Practical "Save Attempt" button and by exam auto-save.
+    It must be GLOBAL (not nested) so it can be called from render_nclex_practical().
+    """
+    # Time/duration
+    started_epoch = st.session_state.get("attempt_started_epoch") or time.time()
+    try:
+        started_epoch = float(started_epoch)
+    except Exception:
+        started_epoch = time.time()
+    duration_sec = int(max(0.0, time.time() - started_epoch))
+
+    admin_settings = load_admin_settings()
+    mode = admin_settings.get("app_mode", "Practice")
+
+    # Student identity
+    student_profile = st.session_state.get("student_profile") or {}
+    student_username = st.session_state.get("student_username") or student_profile.get("username") or ""
+
+    student_display_name = st.session_state.get("student_display_name") or student_profile.get("display_name") or student_profile.get("name") or ""
+    student_id = st.session_state.get("student_id") or student_profile.get("student_id") or student_profile.get("id") or ""
+    cohort = student_profile.get("cohort", "") or st.session_state.get("student_cohort", "")
+
+    # Case info (best-effort)
     case_obj = None
     try:
         # Prefer already-loaded global cases list if present
@@ -1469,7 +2725,7 @@ def build_attempt_record_from_state(case_id: str) -> dict:
 
     rec = {
         # Timing
-        "started_at": datetime.utcfromtimestamp(started_epoch).isoformat(),
+        "started_at": utc_iso_from_epoch(started_epoch),
         "submitted_at": utc_now_iso(),
         "duration_seconds": duration_sec,
 
@@ -1503,6 +2759,7 @@ def build_attempt_record_from_state(case_id: str) -> dict:
             "total_points": nclex_score,
             "total_max": nclex_total,
             "details": nclex_details,
+            **({"adaptive": nclex_scored["adaptive"]} if isinstance(nclex_scored.get("adaptive"), dict) else {}),
         },
 
         # Research (optional)
@@ -1511,6 +2768,351 @@ def build_attempt_record_from_state(case_id: str) -> dict:
     return rec
 
 
+# =============================
+# Exam deadlines (server-authoritative) + expiry sweeper
+# =============================
+EXAM_DEADLINE_KEEP_CLOSED_DAYS = 7
+EXAM_DEADLINE_STALE_HOURS = 24  # active sessions this far past their deadline are closed as "expired"
+
+
+def exam_deadline_grace_sec(features: dict | None = None) -> int:
+    """Seconds after a deadline during which only the student's own session may auto-submit it (one sweep interval)."""
+    feats = load_features() if features is None else features
+    return max(5, int((feats or {}).get("deadline_sweep_interval_sec", 30) or 30))
+
+
+@st.cache_resource(show_spinner=False)
+def _exam_deadline_store() -> dict:
+    import threading
+    return {"lock": threading.RLock(), "data": None, "sig": None}
+
+
+def _exam_deadlines_locked(store: dict) -> dict:
+    sig = _file_sig(EXAM_DEADLINES_PATH)
+    if store["data"] is None or store["sig"] != sig:
+        d = load_json_safe(EXAM_DEADLINES_PATH, {"sessions": {}})
+        if not isinstance(d, dict) or not isinstance(d.get("sessions"), dict):
+            d = {"sessions": {}}
+        store["data"], store["sig"] = d, sig
+    return store["data"]
+
+
+def _save_exam_deadlines_locked(store: dict, data: dict):
+    now = time.time()
+    keep = {}
+    for k, sess in (data.get("sessions") or {}).items():
+        if sess.get("status") == "active":
+            if now - float(sess.get("deadline_epoch") or now) > EXAM_DEADLINE_STALE_HOURS * 3600:
+                sess = dict(sess, status="expired", closed_epoch=now)
+        elif now - float(sess.get("closed_epoch") or now) > EXAM_DEADLINE_KEEP_CLOSED_DAYS * 86400:
+            continue
+        keep[k] = sess
+    data = {"sessions": keep}
+    tmp = EXAM_DEADLINES_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, EXAM_DEADLINES_PATH)
+    store["data"], store["sig"] = data, _file_sig(EXAM_DEADLINES_PATH)
+
+
+def _active_deadline_key(sessions: dict, student: str, case_id: str):
+    for k, sess in sessions.items():
+        if sess.get("status") == "active" and sess.get("student") == student and sess.get("case_id") == case_id:
+            return k
+    return None
+
+
+def _unsaved_exam_deadline_key(sessions: dict, student: str, case_id: str, current_key: str = ""):
+    """Key of an Exam deadline closed as "expired" with no attempt written (other than current_key)."""
+    for k, sess in sessions.items():
+        if (sess.get("status") == "expired" and sess.get("mode") == "Exam" and k != current_key
+                and sess.get("student") == student and sess.get("case_id") == case_id):
+            return k
+    return None
+
+
+def exam_deadline_for(student_username: str, case_id: str, timer_minutes, mode: str, current_key: str = "",
+                      max_attempts: int | None = None):
+    """Return the active server-side deadline for this student+case, creating it on first use.
+
+    The browser session only mirrors this record, so a reconnect or new tab resumes the same
+    countdown instead of restarting it. A deadline more than one sweep interval past due that
+    `current_key` (the caller's own deadline) does not name is left over from an earlier visit
+    nobody submitted. Exam deadlines never restart: unless the sweeper will auto-submit it, the
+    attempt is saved from its latest autosave draft (so it counts against attempt limits) and
+    only then does a new attempt start (None when that save used up `max_attempts`). Other modes
+    are closed as "expired" and restart.
+    """
+    student, case_id = str(student_username or "").strip(), str(case_id or "").strip()
+    if not student or not case_id or timer_minutes in (None, "unlimited"):
+        return None
+    store = _exam_deadline_store()
+    with store["lock"]:
+        data = _exam_deadlines_locked(store)
+        now = time.time()
+        k = _active_deadline_key(data["sessions"], student, case_id)
+        owed = None  # Exam deadline that ran out unsaved: its attempt is written before a new one starts
+        if k:
+            sess = data["sessions"][k]
+            if k == current_key:
+                return dict(sess, key=k)
+            feats = load_features() or {}
+            swept = sess.get("mode") == "Exam" and bool(feats.get("auto_submit_on_expiry", False))
+            if swept or float(sess.get("deadline_epoch") or now) + exam_deadline_grace_sec(feats) > now:
+                return dict(sess, key=k)  # still running, or the sweeper will save it from the draft
+            owed = k if sess.get("mode") == "Exam" else None
+            data = {"sessions": dict(data["sessions"], **{k: dict(sess, status="expired", closed_epoch=now)})}
+        else:
+            owed = _unsaved_exam_deadline_key(data["sessions"], student, case_id, current_key)
+        if owed:
+            # claim it (same status as the sweeper) so no other session saves it too
+            sessions = dict(data["sessions"])
+            sessions[owed] = dict(sessions[owed], status="auto_submitted", closed_epoch=now)
+            _save_exam_deadlines_locked(store, {"sessions": sessions})
+            owed_sess = sessions[owed]
+        else:
+            return _new_exam_deadline_locked(store, data, student, case_id, timer_minutes, mode)
+    _save_unsaved_exam_attempt(owed_sess, "deadline_on_return")
+    if max_attempts is not None and attempts_count_for(student, case_id) >= int(max_attempts):
+        return None
+    return exam_deadline_for(student, case_id, timer_minutes, mode, current_key=current_key, max_attempts=max_attempts)
+
+
+def _new_exam_deadline_locked(store: dict, data: dict, student: str, case_id: str, timer_minutes, mode: str) -> dict:
+    """Start attempt N+1 for student+case (caller holds the store lock)."""
+    now = time.time()
+    attempt_no = attempts_count_for(student, case_id) + 1
+    sess = {
+        "student": student,
+        "case_id": case_id,
+        "attempt_no": attempt_no,
+        "mode": str(mode or ""),
+        "timer_minutes": int(timer_minutes),
+        "started_epoch": now,
+        "deadline_epoch": now + int(timer_minutes) * 60,
+        "status": "active",
+    }
+    k = f"{student}::{case_id}::{attempt_no}"
+    if k in data["sessions"]:  # an unsaved earlier try of the same attempt number
+        k = f"{k}::{int(now)}"
+    data = {"sessions": dict(data["sessions"], **{k: sess})}
+    _save_exam_deadlines_locked(store, data)
+    return dict(sess, key=k)
+
+
+def close_exam_deadline(student_username: str, case_id=None, status: str = "saved", only_if_expired: bool = False) -> int:
+    """Move active deadline(s) for a student (one case, or all when case_id is None) to `status`.
+
+    With only_if_expired=True this is the claim step for auto-submit: whoever flips the record
+    (student rerun or sweeper) saves the attempt, the other sees 0 and does nothing.
+    """
+    student = str(student_username or "").strip()
+    if not student:
+        return 0
+    case_id = None if case_id is None else str(case_id).strip()
+    store = _exam_deadline_store()
+    with store["lock"]:
+        data = _exam_deadlines_locked(store)
+        now = time.time()
+        changed = 0
+        sessions = dict(data["sessions"])
+        for k, sess in sessions.items():
+            if sess.get("status") != "active" or sess.get("student") != student:
+                continue
+            if case_id is not None and sess.get("case_id") != case_id:
+                continue
+            if only_if_expired and float(sess.get("deadline_epoch") or 0) > now:
+                continue
+            sessions[k] = dict(sess, status=str(status), closed_epoch=now)
+            changed += 1
+        if changed:
+            _save_exam_deadlines_locked(store, {"sessions": sessions})
+        return changed
+
+
+def close_exam_deadline_key(key: str, status: str):
+    store = _exam_deadline_store()
+    with store["lock"]:
+        sessions = dict(_exam_deadlines_locked(store)["sessions"])
+        if key in sessions:
+            sessions[key] = dict(sessions[key], status=str(status), closed_epoch=time.time())
+            _save_exam_deadlines_locked(store, {"sessions": sessions})
+
+
+def reclaim_unsaved_exam_deadline(key: str, status: str = "auto_submitted") -> bool:
+    """Claim a deadline that was closed as "expired" (no attempt written) so its session can still save.
+
+    Returns True for exactly one caller; a record that was saved or reset is never reclaimed.
+    """
+    store = _exam_deadline_store()
+    with store["lock"]:
+        sessions = dict(_exam_deadlines_locked(store)["sessions"])
+        if not key or (sessions.get(key) or {}).get("status") != "expired":
+            return False
+        sessions[key] = dict(sessions[key], status=str(status), closed_epoch=time.time())
+        _save_exam_deadlines_locked(store, {"sessions": sessions})
+        return True
+
+
+def list_exam_deadlines(active_only: bool = True) -> list[dict]:
+    store = _exam_deadline_store()
+    with store["lock"]:
+        sessions = _exam_deadlines_locked(store)["sessions"]
+        rows = [dict(v, key=k) for k, v in sessions.items() if (not active_only or v.get("status") == "active")]
+    return sorted(rows, key=lambda r: float(r.get("deadline_epoch") or 0))
+
+
+def _attempt_record_from_draft(sess: dict, draft: dict, case_obj: dict | None, profile: dict) -> dict:
+    """Attempt record for an expired session, built from its latest autosave draft.
+
+    Same fields as build_attempt_record_from_state(), with the draft standing in for session_state.
+    """
+    draft = draft if isinstance(draft, dict) else {}
+    nclex_scored = draft.get("nclex_scored") if isinstance(draft.get("nclex_scored"), dict) else {}
+    started = float(sess.get("started_epoch") or time.time())
+    deadline = float(sess.get("deadline_epoch") or time.time())
+    return {
+        "started_at": utc_iso_from_epoch(started),
+        "submitted_at": utc_iso_from_epoch(deadline),
+        "duration_seconds": int(max(0.0, deadline - started)),
+        "student_username": sess.get("student", ""),
+        "student_display_name": profile.get("display_name") or profile.get("name") or "",
+        "student_id": profile.get("student_id") or profile.get("id") or "",
+        "cohort": profile.get("cohort", ""),
+        "mode": sess.get("mode", "Exam"),
+        "caseId": sess.get("case_id", ""),
+        "caseTitle": (case_obj or {}).get("title", ""),
+        "system": safe_get_system(case_obj) if isinstance(case_obj, dict) else "",
+        "intake_score": draft.get("intake_score"),
+        "intake_breakdown": draft.get("intake_breakdown") if isinstance(draft.get("intake_breakdown"), dict) else {},
+        "scores": draft.get("scores") if isinstance(draft.get("scores"), dict) else {},
+        "answers": draft.get("answers") if isinstance(draft.get("answers"), dict) else {},
+        "unsafe_counts": {},
+        "unsafe_total": 0,
+        "nclex_total": int(nclex_scored.get("total_max", 0) or 0),
+        "nclex_score": int(nclex_scored.get("total_points", 0) or 0),
+        "nclex_answers": draft.get("nclex_answers") if isinstance(draft.get("nclex_answers"), dict) else {},
+        "nclex": {
+            "total_points": int(nclex_scored.get("total_points", 0) or 0),
+            "total_max": int(nclex_scored.get("total_max", 0) or 0),
+            "details": nclex_scored.get("details") if isinstance(nclex_scored.get("details"), list) else [],
+        },
+        "research_consent": False,
+        "timer_minutes": sess.get("timer_minutes"),
+        "timer_expired": True,
+        "auto_submitted": True,
+        "auto_submit_source": "deadline_sweeper",
+    }
+
+
+def _save_unsaved_exam_attempt(sess: dict, source: str) -> int:
+    """Write the attempt for an Exam deadline that ran out without a submit, from its latest draft (if any)."""
+    student, case_id = str(sess.get("student", "")), str(sess.get("case_id", ""))
+    case_obj = next((c for c in (load_cases() or []) if isinstance(c, dict) and str(c.get("id", "")) == case_id), None)
+    rec = _attempt_record_from_draft(sess, load_last_autosave(student, case_id) or {}, case_obj,
+                                     get_student_index().get(student) or {})
+    rec["auto_submit_source"] = source
+    return save_attempts_bulk([rec])
+
+
+def sweep_expired_exam_sessions(grace_sec: float | None = None) -> tuple[bool, str]:
+    """Auto-finalize every expired Exam session: claim it, build its record from the latest
+    autosave draft and append all records in one write.
+
+    Sessions are only claimed `grace_sec` (default: one sweep interval) after their deadline, so a
+    student whose browser is still open auto-submits their own, fuller answers first.
+    """
+    grace = exam_deadline_grace_sec() if grace_sec is None else max(0.0, float(grace_sec))
+    store = _exam_deadline_store()
+    now = time.time()
+    claimed = []
+    with store["lock"]:
+        data = _exam_deadlines_locked(store)
+        sessions = dict(data["sessions"])
+        for k, sess in sessions.items():
+            if sess.get("status") == "active" and sess.get("mode") == "Exam" and float(sess.get("deadline_epoch") or now) + grace <= now:
+                sessions[k] = dict(sess, status="auto_submitted", closed_epoch=now)
+                claimed.append((k, sess))
+        if claimed:
+            _save_exam_deadlines_locked(store, {"sessions": sessions})
+    if not claimed:
+        return True, "No expired exam sessions."
+
+    cases_by_id = {str(c.get("id", "")): c for c in (load_cases() or []) if isinstance(c, dict)}
+    students = get_student_index()
+    records, no_draft = [], []
+    for k, sess in claimed:
+        draft = load_last_autosave(sess.get("student", ""), sess.get("case_id", ""))
+        if not draft:
+            # Opened but never worked on: close it without writing an empty attempt yet. "expired" lets a
+            # session that is still open save its answers (reclaim_unsaved_exam_deadline); otherwise the
+            # student's next visit writes it (exam_deadline_for), so the attempt is never lost or restarted
+            no_draft.append(k)
+            continue
+        records.append(_attempt_record_from_draft(sess, draft, cases_by_id.get(sess.get("case_id", "")),
+                                                  students.get(sess.get("student", "")) or {}))
+    for k in no_draft:
+        close_exam_deadline_key(k, "expired")
+    n = save_attempts_bulk(records) if records else 0
+    return True, f"Auto-submitted {n} expired exam session(s)" + (f"; closed {len(no_draft)} with no draft." if no_draft else ".")
+
+
+@st.cache_resource(show_spinner=False)
+def _exam_deadline_sweeper() -> dict:
+    """One daemon thread per server process; each tick re-reads features.json."""
+    import threading
+    state = {"last_run": None, "last_msg": "", "runs": 0}
+
+    def _loop():
+        while True:
+            feats = load_features()
+            interval = exam_deadline_grace_sec(feats)
+            if bool((feats or {}).get("auto_submit_on_expiry", False)):
+                try:
+                    _ok, msg = sweep_expired_exam_sessions(grace_sec=interval)
+                except Exception as e:
+                    msg = f"Sweep failed: {e}"
+                state.update(last_run=time.time(), last_msg=msg, runs=state["runs"] + 1)
+            time.sleep(interval)
+
+    t = threading.Thread(target=_loop, name="cliniq-deadline-sweeper", daemon=True)
+    t.start()
+    state["thread"] = t
+    return state
+
+
+def ensure_exam_deadline_sweeper() -> dict:
+    try:
+        return _exam_deadline_sweeper()
+    except Exception:
+        return {}
+
+
+def render_deadline_countdown(deadline_epoch: float, height: int = 44):
+    """Client-side countdown (no reruns); the server deadline stays authoritative."""
+    server_now_ms = int(time.time() * 1000)
+    deadline_ms = int(float(deadline_epoch) * 1000)
+    components.html(f"""
+    <div id="cd" style="font-family:sans-serif;font-weight:800;font-size:1.05rem;color:#0b2233;"></div>
+    <script>
+    (function() {{
+      const skew = Date.now() - {server_now_ms};
+      const deadline = {deadline_ms} + skew;
+      const el = document.getElementById("cd");
+      function pad(n) {{ return String(n).padStart(2, "0"); }}
+      function tick() {{
+        let s = Math.max(0, Math.floor((deadline - Date.now()) / 1000));
+        const h = Math.floor(s / 3600), m = Math.floor((s % 3600) / 60), sec = s % 60;
+        el.textContent = "Remaining: " + (h ? h + ":" + pad(m) : m) + ":" + pad(sec);
+        el.style.color = s <= 0 ? "#b00020" : (s <= 300 ? "#c05600" : "#0b2233");
+        if (s <= 0) {{ el.textContent = "Time is up"; clearInterval(timer); }}
+      }}
+      const timer = setInterval(tick, 1000);
+      tick();
+    }})();
+    </script>
+    """, height=height)
+
+
 # =============================
 # Research exports & archiving (Admin-only, on-demand)
 # =============================
@@ -1569,17 +3171,22 @@ def _flatten_attempt_row(rec: dict) -> dict:
     }
 
 
-def build_research_csv_bytes() -> bytes:
+@perf_timed()
+def build_research_csv_bytes(include_archived: bool = False) -> bytes:
     """Download Research CSV.
 
     If research_dataset.jsonl exists, export the de-identified dataset (participant_id-based).
-    Otherwise, fall back to the teaching attempts export.
+    Otherwise, fall back to the teaching attempts export. include_archived=True adds archived
+    research rows (or archived attempts, for the fallback).
     """
     rp = load_research_policy()
-    use_dataset = bool(rp.get("enabled", False)) and RESEARCH_DATASET_PATH.exists()
+    use_dataset = bool(rp.get("enabled", False)) and (
+        research_dataset_exists() or (include_archived and research_archive_exists()))
 
     if use_dataset:
-        rows = iter_research_dataset() or []
+        rows = iter_research_dataset()
+        if include_archived:
+            rows = itertools.chain(iter_archived_research_dataset(), rows)
         # Stable, human-friendly column order
         headers = [
             "participant_id",
@@ -1629,9 +3236,11 @@ def build_research_csv_bytes() -> bytes:
     # ---- Fallback: teaching attempts export (original behavior) ----
     rows = []
     try:
-        for rec in iter_attempts() or []:
+        for rec in iter_attempts(include_archived=include_archived):
             if isinstance(rec, dict):
                 rows.append(_flatten_attempt_row(rec))
+    except ArchiveReadError:
+        raise
     except Exception:
         rows = []
 
@@ -1658,21 +3267,25 @@ def build_research_csv_bytes() -> bytes:
     w = csv.DictWriter(buf, fieldnames=headers, extrasaction="ignore")
     w.writeheader()
 
-    for r in rows:
-        # Optional: anonymize identifiers in the export when research policy asks for it
-        if bool(rp.get("enabled", False)) and bool(rp.get("anonymize_student_id", True)):
+    # Optional: anonymize identifiers in the export when research policy asks for it (one bulk pass)
+    if bool(rp.get("enabled", False)) and bool(rp.get("anonymize_student_id", True)):
+        pids = pseudonymize_many(str(r.get("student_id","") or r.get("student_username","") or "") for r in rows)
+        for r, pid in zip(rows, pids):
             r["student_username"] = ""
-            r["student_id"] = _hash_participant(str(r.get("student_id","") or r.get("student_username","") or ""))
+            r["student_id"] = pid
+
+    for r in rows:
         w.writerow(r)
 
     return buf.getvalue().encode("utf-8")
 
 
-def build_attempt_summary_csv_bytes() -> bytes:
+@perf_timed()
+def build_attempt_summary_csv_bytes(include_archived: bool = False) -> bytes:
     """Download Attempt Summary CSV (latest attempt per student+case)."""
     latest = {}
     try:
-        for rec in iter_attempts() or []:
+        for rec in iter_attempts(include_archived=include_archived):
             if not isinstance(rec, dict):
                 continue
             key = (str(rec.get("student_username","")), str(rec.get("caseId","")))
@@ -1686,6 +3299,8 @@ def build_attempt_summary_csv_bytes() -> bytes:
                     latest[key] = rec
                 elif not sub:
                     latest[key] = rec
+    except ArchiveReadError:
+        raise
     except Exception:
         latest = {}
 
@@ -1731,96 +3346,149 @@ def build_attempt_summary_csv_bytes() -> bytes:
     return buf.getvalue().encode("utf-8")
 
 
-# =============================
-# Psychometrics / Item Analysis (NCLEX) — computed export (Excel)
-# =============================
-def _safe_float(x, default=None):
-    try:
-        if x is None or x == "":
-            return default
-        return float(x)
-    except Exception:
-        return default
+@perf_timed()
+def rebuild_attempt_export_files(cases: list) -> tuple[int, int]:
+    """Rebuild attempts_export.csv and nclex_item_analysis.csv from attempts_log.jsonl.
 
-def _point_biserial(item_scores: list[int], total_scores: list[float]):
-    """Point-biserial correlation between item (0/1) and total score."""
-    try:
-        n = len(item_scores)
-        if n < 5:
-            return None
-        # totals variance
-        mt = sum(total_scores) / n
-        vt = sum((t - mt) ** 2 for t in total_scores)
-        if vt <= 0:
-            return None
-        st = math.sqrt(vt / (n - 1))
-        if st <= 0:
-            return None
+    Returns (attempt_rows, nclex_question_rows). Used by the Research page button and the CLI.
+    """
+    cases_by_id = {str(c.get("id","")): c for c in cases}
+    nclex_bank = load_nclex_items()
+    nclex_cases = (nclex_bank.get("cases") or {})
+    rows = []
+    qrows = []  # detailed NCLEX per-question rows
+    for rec in iter_attempts():
+        cid = str(rec.get("caseId", ""))
+        case = cases_by_id.get(cid, {}) if isinstance(cases_by_id, dict) else {}
+        answers = rec.get("answers") or {}
+
+        # --- A–E item analysis (gold vs selected) ---
+        def _gold4(lst):
+            lst = lst or []
+            return list(lst)[:4] if isinstance(lst, list) else []
+        gs_assess = _gold4(get_gs_list(case, ["keyAssessments", "assessment"]))
+        gs_prio   = _gold4(get_gs_list(case, ["priorities", "prioritize"]))
+        gs_inter  = _gold4(get_gs_list(case, ["interventions"]))
+        gs_reass  = _gold4(get_gs_list(case, ["reassessment", "reassess"]))
+        gs_sbar_d = get_gs_sbar(case) or {}
+        gs_sbar   = _gold4([x for x in [gs_sbar_d.get("S",""), gs_sbar_d.get("B",""), gs_sbar_d.get("A",""), gs_sbar_d.get("R","")] if str(x).strip()])
+
+        def _sel(dom):
+            a = answers.get(dom) or {}
+            if isinstance(a, dict):
+                return a.get("selected") or []
+            return []
+
+        def _stats(selected, gold):
+            selected = list(selected or [])
+            gold = list(gold or [])
+            correct = [x for x in selected if x in gold]
+            wrong = [x for x in selected if x not in gold]
+            missed = [x for x in gold if x not in selected]
+            return len(correct), len(wrong), len(missed)
+
+        a_ok,a_wrong,a_miss = _stats(_sel("A"), gs_assess)
+        b_ok,b_wrong,b_miss = _stats(_sel("B"), gs_prio)
+        c_ok,c_wrong,c_miss = _stats(_sel("C"), gs_inter)
+        d_ok,d_wrong,d_miss = _stats(_sel("D"), gs_reass)
+        e_ok,e_wrong,e_miss = _stats(_sel("E"), gs_sbar)
+
+        # --- NCLEX item analysis ---
+        nblob = rec.get("nclex") or {}
+        ndetails = nblob.get("details") or []
+        n_answers = rec.get("nclex_answers") or {}
+        n_correct = 0
+        n_total = 0
+        for d in ndetails:
+            n_total += 1
+            if bool(d.get("correct")) or (str(d.get("points")) == str(d.get("max"))):
+                n_correct += 1
 
-        p = sum(item_scores) / n
-        q = 1 - p
-        if p <= 0 or p >= 1:
-            return None
+        row = {
+            "timestamp": rec.get("timestamp", ""),
+            "duration_seconds": rec.get("duration_seconds", ""),
+            "mode": rec.get("mode", ""),
+            "timer_minutes": rec.get("timer_minutes", ""),
+            "timer_expired": rec.get("timer_expired", ""),
+            "student_username": rec.get("student_username", ""),
+            "student_display_name": rec.get("student_display_name", ""),
+            "student_id": rec.get("student_id", ""),
+            "cohort": rec.get("student_cohort", ""),
+            "caseId": rec.get("caseId", ""),
+            "caseTitle": rec.get("caseTitle", ""),
+            "system": rec.get("system", ""),
+            "setting": rec.get("setting", ""),
+            "A": rec.get("scores", {}).get("A", ""),
+            "B": rec.get("scores", {}).get("B", ""),
+            "C": rec.get("scores", {}).get("C", ""),
+            "D": rec.get("scores", {}).get("D", ""),
+            "E": rec.get("scores", {}).get("E", ""),
+            "total": rec.get("total", ""),
+            "unsafe_total": rec.get("unsafe_total", ""),
+            "attempt_number_for_case": rec.get("attempt_number_for_case", ""),
+            "A_correct": a_ok, "A_wrong": a_wrong, "A_missed": a_miss,
+            "B_correct": b_ok, "B_wrong": b_wrong, "B_missed": b_miss,
+            "C_correct": c_ok, "C_wrong": c_wrong, "C_missed": c_miss,
+            "D_correct": d_ok, "D_wrong": d_wrong, "D_missed": d_miss,
+            "E_correct": e_ok, "E_wrong": e_wrong, "E_missed": e_miss,
+            "nclex_points": (nblob or {}).get("total_points", ""),
+            "nclex_max": (nblob or {}).get("total_max", ""),
+            "nclex_correct": n_correct,
+            "nclex_total": n_total,
+        }
+        rows.append(row)
 
-        # mean total for correct vs incorrect
-        tot1 = [total_scores[i] for i in range(n) if item_scores[i] == 1]
-        tot0 = [total_scores[i] for i in range(n) if item_scores[i] == 0]
-        if len(tot1) < 2 or len(tot0) < 2:
-            return None
-        m1 = sum(tot1) / len(tot1)
-        m0 = sum(tot0) / len(tot0)
-        r_pb = (m1 - m0) / st * math.sqrt(p * q)
-        return r_pb
-    except Exception:
-        return None
+        item_map = {}
+        try:
+            pack = nclex_cases.get(cid, {}) or {}
+            for it in (pack.get("items") or []):
+                if isinstance(it, dict) and it.get("id"):
+                    item_map[str(it.get("id"))] = it
+        except Exception:
+            item_map = {}
 
-def _top_bottom_discrimination(item_scores: list[int], total_scores: list[float], frac: float = 0.27):
-    """Top–bottom discrimination (difference in p between top and bottom groups)."""
-    try:
-        n = len(item_scores)
-        if n < 10:
-            return None
-        idx = list(range(n))
-        idx.sort(key=lambda i: total_scores[i])
-        g = max(1, int(round(n * frac)))
-        bottom = idx[:g]
-        top = idx[-g:]
-        p_top = sum(item_scores[i] for i in top) / len(top)
-        p_bottom = sum(item_scores[i] for i in bottom) / len(bottom)
-        return p_top - p_bottom
-    except Exception:
-        return None
+        for d in ndetails:
+            qid = str(d.get("qid", ""))
+            meta = item_map.get(qid, {})
+            qrows.append({
+                "timestamp": rec.get("timestamp", ""),
+                "student_username": rec.get("student_username", ""),
+                "student_id": rec.get("student_id", ""),
+                "cohort": rec.get("student_cohort", ""),
+                "caseId": cid,
+                "caseTitle": rec.get("caseTitle", ""),
+                "qid": qid,
+                "type": d.get("type", ""),
+                "difficulty": meta.get("difficulty", ""),
+                "client_need": meta.get("client_need", ""),
+                "topic": meta.get("topic", ""),
+                "points": d.get("points", ""),
+                "max": d.get("max", ""),
+                "correct": d.get("correct", ""),
+                "student_answer": json.dumps(n_answers.get(qid, ""), ensure_ascii=False),
+                "correct_answer": json.dumps(meta.get("correct", ""), ensure_ascii=False),
+            })
 
-def _kr20_from_matrix(matrix: list[list[int]]):
-    """KR-20 from a 0/1 matrix (rows=examinees, cols=items)."""
-    try:
-        if not matrix:
-            return None
-        k = len(matrix[0])
-        if k < 2:
-            return None
-        # total scores
-        totals = [sum(row) for row in matrix]
-        n = len(totals)
-        if n < 3:
-            return None
-        mean_t = sum(totals) / n
-        var_t = sum((t - mean_t) ** 2 for t in totals) / (n - 1) if n > 1 else 0.0
-        if var_t <= 0:
-            return None
+    out = io.StringIO()
+    if rows:
+        w = csv.DictWriter(out, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+    ATTEMPTS_CSV_PATH.write_text(out.getvalue(), encoding="utf-8")
 
-        # sum p*q across items
-        pq_sum = 0.0
-        for j in range(k):
-            col = [row[j] for row in matrix]
-            p = sum(col) / n
-            q = 1 - p
-            pq_sum += p * q
+    out2 = io.StringIO()
+    if qrows:
+        w2 = csv.DictWriter(out2, fieldnames=list(qrows[0].keys()))
+        w2.writeheader()
+        w2.writerows(qrows)
+    NCLEX_ITEM_CSV_PATH.write_text(out2.getvalue(), encoding="utf-8")
+    return len(rows), len(qrows)
+
+
+# =============================
+# Psychometrics / Item Analysis (NCLEX) — computed export (Excel)
+# =============================
 
-        kr20 = (k / (k - 1)) * (1 - (pq_sum / var_t))
-        return kr20
-    except Exception:
-        return None
 
 def _index_sheet(ws):
     # Basic readability
@@ -1841,7 +3509,9 @@ def _write_table(ws, headers, rows):
         ws.append([r.get(h, "") for h in headers])
     _index_sheet(ws)
 
-def build_nclex_psychometrics_excel_bytes(min_attempts_per_item: int = 10, min_items_intersection: int = 10) -> bytes:
+@perf_timed()
+def build_nclex_psychometrics_excel_bytes(min_attempts_per_item: int = 10, min_items_intersection: int = 10,
+                                         include_archived: bool = False) -> bytes:
     """Build a multi-sheet Excel psychometrics report from attempts_log.jsonl.
 
     This exports COMPUTED results (difficulty, discrimination, KR-20) — not raw logs.
@@ -1849,7 +3519,7 @@ def build_nclex_psychometrics_excel_bytes(min_attempts_per_item: int = 10, min_i
     from io import BytesIO
     from openpyxl import Workbook
 
-    attempts = _load_attempts_records(ATTEMPTS_PATH)
+    attempts = _load_attempts_records(ATTEMPTS_PATH, include_archived=include_archived)
 
     # Build lookup for item metadata (difficulty/client_need/topic/type/correct)
     try:
@@ -2128,18 +3798,27 @@ def build_credentials_docx_bytes(rows: list, title: str = "Student Credentials")
     doc.save(bio)
     return bio.getvalue()
 
-def archive_attempt_logs(clear_after: bool = True) -> tuple[bool, str]:
-    """Archive attempts_log.jsonl into BACKUP_DIR with date stamp; optionally clear."""
+def archive_attempt_logs(clear_after: bool = True, codec: str | None = None) -> tuple[bool, str]:
+    """Compress all attempt segments into ATTEMPTS_ARCHIVE_DIR/attempts_log_<ts>.jsonl.<codec>; optionally clear.
+
+    The archive gets a merged manifest so iter_attempts(include_archived=True) can skip it by date/case.
+    """
     try:
-        if not ATTEMPTS_PATH.exists():
+        segments = list_attempt_segments()
+        if not segments:
             return False, "No attempts_log.jsonl to archive."
-        BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+        ATTEMPTS_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        out = BACKUP_DIR / f"attempts_log_{ts}.jsonl"
-        out.write_bytes(ATTEMPTS_PATH.read_bytes())
-        if clear_after:
-            ATTEMPTS_PATH.write_text("", encoding="utf-8")
-        return True, f"Archived to: {out.name}" + (" (log cleared)" if clear_after else "")
+        state = _attempt_segments_state()
+        with state["lock"]:
+            man = _merged_manifest(segments)
+            stats = compress_files(segments, ATTEMPTS_ARCHIVE_DIR / f"attempts_log_{ts}.jsonl", codec or archive_codec())
+            man.update(segment=stats["path"].name, codec=stats["codec"], compressed_bytes=stats["bytes_out"])
+            _archive_manifest_path(stats["path"]).write_text(json.dumps(man, ensure_ascii=False), encoding="utf-8")
+            if clear_after:
+                clear_all_attempts()
+        return True, (f"Archived {man['records']} attempts to: {stats['path'].name} — {describe_stats(stats)}"
+                      + (" (log cleared)" if clear_after else ""))
     except Exception as e:
         return False, f"Archive failed: {e}"
 
@@ -2147,12 +3826,13 @@ def attempts_count_for(student_username: str, case_id: str) -> int:
     if not student_username or not case_id:
         return 0
     c = 0
-    for rec in iter_attempts():
+    for rec in iter_attempts(cases=[str(case_id)]):
         if str(rec.get("student_username", "")) == str(student_username) and str(rec.get("caseId", "")) == str(case_id):
             c += 1
     return c
 
 
+@perf_timed()
 def load_nclex_items():
     """
     Load NCLEX-style practice bank and normalize to the structure this app expects:
@@ -2211,10 +3891,277 @@ def load_nclex_items():
     return data
 
 
+# =============================
+# Shared NCLEX bank (one read-only copy per process)
+# =============================
+@st.cache_resource(show_spinner=False)
+def _shared_nclex_bank_cache() -> dict:
+    import threading
+    return {"lock": threading.Lock(), "sig": None, "bank": None, "by_qid": {}}
+
+
+def get_shared_nclex_bank() -> dict:
+    """Normalized bank (same shape as load_nclex_items()) shared by every session.
+
+    Re-read only when nclex_items.json changes (mtime/size). Treat it as READ-ONLY:
+    admin editors must keep using load_nclex_items() for a private, mutable copy.
+    """
+    c = _shared_nclex_bank_cache()
+    try:
+        stt = NCLEX_ITEMS_PATH.stat()
+        sig = (stt.st_mtime_ns, stt.st_size)
+    except Exception:
+        sig = None
+    if c["bank"] is not None and sig is not None and c["sig"] == sig:
+        return c["bank"]
+    with c["lock"]:
+        if c["bank"] is not None and sig is not None and c["sig"] == sig:
+            return c["bank"]
+        bank = load_nclex_items()
+        by_qid = {}
+        for pack in (bank.get("cases") or {}).values():
+            for it in (pack or {}).get("items", []) or []:
+                if isinstance(it, dict) and str(it.get("id", "")).strip():
+                    by_qid.setdefault(str(it.get("id")), it)
+        c["bank"], c["by_qid"], c["sig"] = bank, by_qid, sig
+        return bank
+
+
+def resolve_nclex_qids(qids) -> list[dict]:
+    """qid tuple -> item dicts from the shared bank (unknown qids are dropped)."""
+    get_shared_nclex_bank()
+    by_qid = _shared_nclex_bank_cache()["by_qid"]
+    return [by_qid[str(q)] for q in (qids or []) if str(q) in by_qid]
+
+
+def get_presented_nclex_items(fallback: list | None = None) -> list[dict]:
+    """Items presented in this session, resolved from `nclex_presented_qids`."""
+    qids = st.session_state.get("nclex_presented_qids")
+    if qids:
+        resolved = resolve_nclex_qids(qids)
+        if resolved:
+            return resolved
+    return list(fallback or [])
+
+
+# =============================
+# Adaptive NCLEX (CAT): item-information tables + per-session state
+# =============================
+@st.cache_resource(show_spinner=False)
+def _cat_table_holder() -> dict:
+    import threading
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def nclex_cat_model(policy: dict) -> str:
+    """Calibration used for selection: adaptive_model, or 2PL when calibrated ("auto") else Rasch."""
+    want = str((policy or {}).get("adaptive_model", "auto") or "auto").strip().lower()
+    if want in IRT_MODELS:
+        return want
+    models = load_irt_params().get("models") or {}
+    return "2pl" if (models.get("2pl") or {}).get("items") else "rasch"
+
+
+def nclex_cat_table(case_id: str, pool: list, policy: dict):
+    """Information table for a case pack; rebuilt only when the pack or nclex_irt_params.json changes."""
+    model = nclex_cat_model(policy)
+    key = (str(case_id), model, tuple(str(it.get("id", "")) for it in pool), _file_sig(NCLEX_IRT_PARAMS_PATH))
+    holder = _cat_table_holder()
+    table = holder["tables"].get(str(case_id))
+    if table is not None and table[0] == key:
+        return table[1]
+    with holder["lock"]:
+        table = holder["tables"].get(str(case_id))
+        if table is None or table[0] != key:
+            fit = (load_irt_params().get("models") or {}).get(model) or {}
+            table = (key, nclex_cat.ItemInfoTable(nclex_cat.item_params_for_pool(pool, fit.get("items") or {}),
+                                                  prior_sd=float(fit.get("theta_sd", 1.0) or 1.0)))
+            holder["tables"][str(case_id)] = table
+        return table[1]
+
+
+def nclex_cat_expected_length(policy: dict, min_items: int, se_target: float) -> tuple[float, float, int]:
+    """(mean expected questions, share stopping on the SE target, case packs) over every NCLEX case pack."""
+    enabled_types = policy.get("enabled_types") or {}
+    lengths, shares = [], []
+    for cid, pack in sorted((get_shared_nclex_bank().get("cases") or {}).items()):
+        pool = [it for it in (pack or {}).get("items", []) or [] if enabled_types.get(it.get("type"), True)]
+        if not pool:
+            continue
+        n, share = nclex_cat_table(cid, pool, policy).expected_length(
+            min_items, nclex_items_per_case(policy, cid), se_target)
+        lengths.append(n)
+        shares.append(share)
+    if not lengths:
+        return 0.0, 0.0, 0
+    return sum(lengths) / len(lengths), sum(shares) / len(shares), len(lengths)
+
+
+def nclex_cat_presented_items(case_id: str, pool: list, policy: dict) -> list[dict]:
+    """Administered items + the current max-information item; keeps nclex_presented_qids in step."""
+    state = st.session_state.get("nclex_cat")
+    if not isinstance(state, dict) or state.get("case_id") != str(case_id):
+        state = nclex_cat.new_state()
+        state["case_id"] = str(case_id)
+        st.session_state["nclex_cat"] = state
+    cur = nclex_cat.current_item(nclex_cat_table(case_id, pool, policy), state)
+    qids = tuple(state["administered"]) + ((cur,) if cur else ())
+    st.session_state["nclex_presented_case_id"] = str(case_id)
+    st.session_state["nclex_presented_qids"] = qids
+    return resolve_nclex_qids(qids)
+
+
+def nclex_cat_summary() -> dict:
+    """Stored with the attempt under nclex.adaptive."""
+    state = st.session_state.get("nclex_cat") or {}
+    return {
+        "model": state.get("model", ""),
+        "items": len(state.get("administered") or []),
+        "theta": state.get("theta"),
+        "se": state.get("se"),
+        "stop_reason": state.get("stop_reason", ""),
+        "responses": list(state.get("responses") or []),
+    }
+
+
+def approx_deep_sizeof(obj, _seen=None) -> int:
+    """Approximate retained size in bytes (recursive sys.getsizeof; shared objects counted once)."""
+    import sys
+    if _seen is None:
+        _seen = set()
+    oid = id(obj)
+    if oid in _seen:
+        return 0
+    _seen.add(oid)
+    try:
+        size = sys.getsizeof(obj)
+    except Exception:
+        return 0
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_deep_sizeof(k, _seen) + approx_deep_sizeof(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += approx_deep_sizeof(v, _seen)
+    return size
+
+
+def measure_nclex_session_reduction(case_id: str, policy: dict) -> dict:
+    """Per-session bytes for one presented set: private item copies (old) vs qid tuple (new)."""
+    k = nclex_items_per_case(policy, case_id)
+    private_copy = list((load_nclex_items().get("cases") or {}).get(str(case_id), {}).get("items", []) or [])[:k]
+    qids = tuple(str(it.get("id", "")) for it in private_copy)
+    old_b = approx_deep_sizeof(private_copy)
+    new_b = approx_deep_sizeof(qids) + approx_deep_sizeof(f"{case_id}|seed")
+    return {
+        "case_id": str(case_id),
+        "items": len(qids),
+        "full_copies_bytes": old_b,
+        "qid_refs_bytes": new_b,
+        "reduction_pct": round(100.0 * (1 - new_b / old_b), 1) if old_b else 0.0,
+    }
+
+
+# =============================
+# Session memory accounting (sampled; admin Settings panel)
+# =============================
+MEMORY_SAMPLE_INTERVAL_S = 60       # at most one measurement per session per minute
+MEMORY_SAMPLE_MAX_ITEMS = 200       # containers larger than this are sampled and extrapolated
+MEMORY_SESSION_STALE_S = 30 * 60    # sessions not seen for 30 min drop out of the totals
+
+
+@st.cache_resource(show_spinner=False)
+def _session_memory_registry() -> dict:
+    import threading
+    return {"lock": threading.Lock(), "sessions": {}}
+
+
+def sampled_deep_sizeof(obj, max_items: int = MEMORY_SAMPLE_MAX_ITEMS) -> int:
+    """Like approx_deep_sizeof, but large lists/dicts are measured on an evenly spaced
+    sample of `max_items` elements and scaled up, so measuring stays cheap."""
+    import sys
+    try:
+        if isinstance(obj, dict) and len(obj) > max_items:
+            keys = list(obj.keys())
+            step = len(keys) / float(max_items)
+            pick = [keys[int(i * step)] for i in range(max_items)]
+            part = sum(approx_deep_sizeof(k) + approx_deep_sizeof(obj[k]) for k in pick)
+            return sys.getsizeof(obj) + int(part * len(keys) / float(max_items))
+        if isinstance(obj, (list, tuple)) and len(obj) > max_items:
+            step = len(obj) / float(max_items)
+            part = sum(approx_deep_sizeof(obj[int(i * step)]) for i in range(max_items))
+            return sys.getsizeof(obj) + int(part * len(obj) / float(max_items))
+    except Exception:
+        pass
+    return approx_deep_sizeof(obj)
+
+
+def record_session_memory_sample(force: bool = False):
+    """Measure this session's st.session_state (per key) and report it to the process registry."""
+    try:
+        now = time.time()
+        last = float(st.session_state.get("_mem_sampled_at", 0) or 0)
+        if not force and (now - last) < MEMORY_SAMPLE_INTERVAL_S:
+            return
+        sid = st.session_state.get("_mem_session_id")
+        if not sid:
+            sid = secrets.token_hex(6)
+            st.session_state["_mem_session_id"] = sid
+        st.session_state["_mem_sampled_at"] = now
+
+        per_key = {}
+        for k in list(st.session_state.keys()):
+            try:
+                per_key[str(k)] = sampled_deep_sizeof(st.session_state[k])
+            except Exception:
+                continue
+        prof = st.session_state.get("student_profile") or {}
+        who = str((prof or {}).get("username", "") or ("admin" if st.session_state.get("is_admin") else "anonymous"))
+        reg = _session_memory_registry()
+        with reg["lock"]:
+            reg["sessions"][sid] = {"who": who, "ts": now, "total": sum(per_key.values()), "per_key": per_key}
+            for old_sid, rec in list(reg["sessions"].items()):
+                if now - float(rec.get("ts", 0)) > MEMORY_SESSION_STALE_S:
+                    reg["sessions"].pop(old_sid, None)
+    except Exception:
+        pass
+
+
+def session_memory_report(top_n: int = 15) -> dict:
+    """Aggregate the latest sample of every live session (bytes)."""
+    reg = _session_memory_registry()
+    with reg["lock"]:
+        sessions = {sid: dict(rec) for sid, rec in reg["sessions"].items()}
+    by_key = {}
+    for rec in sessions.values():
+        for k, b in (rec.get("per_key") or {}).items():
+            agg = by_key.setdefault(k, {"key": k, "total_bytes": 0, "max_bytes": 0, "sessions": 0})
+            agg["total_bytes"] += int(b)
+            agg["max_bytes"] = max(agg["max_bytes"], int(b))
+            agg["sessions"] += 1
+    rss_bytes = None
+    try:
+        import resource
+        rss_bytes = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024  # Linux reports KB
+    except Exception:
+        pass
+    rows = sorted(sessions.items(), key=lambda kv: -int(kv[1].get("total", 0)))
+    return {
+        "sessions": len(sessions),
+        "total_bytes": sum(int(r.get("total", 0)) for r in sessions.values()),
+        "peak_rss_bytes": rss_bytes,
+        "top_keys": sorted(by_key.values(), key=lambda r: -r["total_bytes"])[:int(top_n)],
+        "top_sessions": [{"session": sid, "who": r.get("who"), "bytes": int(r.get("total", 0)),
+                          "sampled_at": datetime.fromtimestamp(float(r.get("ts", 0))).strftime("%H:%M:%S")}
+                         for sid, r in rows[:int(top_n)]],
+    }
+
+
 def save_nclex_items(data: dict):
     NCLEX_ITEMS_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+@perf_timed()
 def load_nclex_policy():
     data = load_json_safe(NCLEX_POLICY_PATH, {"enabled": False})
     if not isinstance(data, dict):
@@ -2240,8 +4187,17 @@ def load_nclex_policy():
     data.setdefault("one_question_at_a_time", False)
     data.setdefault("randomize_per_student_session", True)
 
+    # Adaptive (CAT) mode: max-information selection from the whole case pack; items_per_case is the cap
+    data.setdefault("adaptive_enabled", False)
+    data.setdefault("adaptive_min_items", 10)
+    data.setdefault("adaptive_se_target", 0.50)
+    data.setdefault("adaptive_model", "auto")
+
     # Admin-controlled rotation: only used when admin generates a new active set
     data.setdefault("rotation_enabled", False)
+    # Bulk generator targets (client_need_blueprint is seeded by ensure_file)
+    data.setdefault("difficulty_mix", {"easy": 0.3, "medium": 0.4, "hard": 0.3})
+    data.setdefault("rotation_history_window", 3)  # avoid items used in this many previous sets
 
     # Enabled types guard
     if not isinstance(data.get("enabled_types"), dict):
@@ -2292,50 +4248,352 @@ def save_nclex_policy(policy: dict):
 
 
 
+@st.cache_resource(show_spinner=False)
+def _active_sets_cache() -> dict:
+    import threading
+    return {"lock": threading.Lock(), "sig": None, "data": None}
+
+
+def _read_active_sets() -> dict:
+    """Parsed nclex_active_sets.json, shared across sessions and re-read only when the file changes.
+
+    Callers must not mutate the result; load_nclex_active_sets() hands out a copy.
+    """
+    c = _active_sets_cache()
+    sig = _file_sig(NCLEX_ACTIVE_SETS_PATH)
+    if c["data"] is not None and c["sig"] == sig:
+        return c["data"]
+    with c["lock"]:
+        if c["data"] is None or c["sig"] != _file_sig(NCLEX_ACTIVE_SETS_PATH):
+            ensure_file(NCLEX_ACTIVE_SETS_PATH, {"by_case": {}})
+            data = load_json_safe(NCLEX_ACTIVE_SETS_PATH, {"by_case": {}})
+            if not isinstance(data, dict):
+                data = {"by_case": {}}
+            if not isinstance(data.get("by_case"), dict):
+                data["by_case"] = {}
+            if any(isinstance(rec, dict) and rec.get("history") for rec in data["by_case"].values()):
+                data = _migrate_active_sets_history(data)
+            for cid, rec in list(data["by_case"].items()):
+                if not isinstance(rec, dict):
+                    data["by_case"][cid] = {}
+            c["data"], c["sig"] = data, _file_sig(NCLEX_ACTIVE_SETS_PATH)
+        return c["data"]
+
+
 def load_nclex_active_sets():
     """Stores admin-generated 'active' NCLEX question sets per case (rotation).
     Shape:
       {
         "by_case": {
-          "<case_id>": {
-            "qids": [...],
-            "generated_at": "...",
-            "generated_by": "admin",
-            "seed": "...",
-            "history": [
-              {"qids":[...], "generated_at":"...", "generated_by":"admin", "seed":"..."},
-              ...
-            ]
-          }
+          "<case_id>": {"qids": [...], "generated_at": "...", "generated_by": "admin", "seed": "..."}
         }
       }
+    Past sets live in nclex_rotation_history.jsonl (load_rotation_history). Returns a private copy.
     """
-    ensure_file(NCLEX_ACTIVE_SETS_PATH, {"by_case": {}})
-    data = load_json_safe(NCLEX_ACTIVE_SETS_PATH, {"by_case": {}})
+    data = _read_active_sets()
+    return {**data, "by_case": {cid: dict(rec) for cid, rec in data["by_case"].items()}}
+
+
+def nclex_active_qids(case_id: str) -> list:
+    """Current active qids for a case (hot path: no copy, no JSON parse unless the file changed)."""
+    rec = _read_active_sets()["by_case"].get(str(case_id))
+    qids = rec.get("qids") if isinstance(rec, dict) else None
+    return qids if isinstance(qids, list) else []
+
+
+def _write_nclex_active_sets(data: dict):
+    """Atomic replace (tmp + os.replace); raises on failure. History never goes into this file."""
     if not isinstance(data, dict):
         data = {"by_case": {}}
     if not isinstance(data.get("by_case"), dict):
         data["by_case"] = {}
+    data = {**data, "by_case": {cid: {k: v for k, v in (rec or {}).items() if k != "history"}
+                                for cid, rec in data["by_case"].items()}}
+    tmp = NCLEX_ACTIVE_SETS_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, NCLEX_ACTIVE_SETS_PATH)
+
+
+def save_nclex_active_sets(data: dict):
+    try:
+        _write_nclex_active_sets(data)
+    except Exception:
+        pass
+
+
+# =============================
+# Rotation history (append-only JSONL, qids as case-relative references)
+# =============================
+def _qid_refs(case_id: str, qids) -> str:
+    """"adult_acs_01-Q012" -> "Q012" for the case's own qids; anything else is kept whole as "=<qid>"."""
+    prefix = f"{case_id}-"
+    return " ".join(q[len(prefix):] if q.startswith(prefix) else "=" + q for q in (str(x) for x in qids or []))
+
+
+def _qids_from_refs(case_id: str, refs: str) -> list:
+    prefix = f"{case_id}-"
+    return [r[1:] if r.startswith("=") else prefix + r for r in str(refs or "").split()]
+
 
-    # ensure per-case shapes
-    for cid, rec in list((data.get("by_case") or {}).items()):
+def append_rotation_history(entries):
+    """Append {case_id, qids, generated_at, generated_by, seed} entries (one line each, single write)."""
+    lines = []
+    for e in entries:
+        cid = str(e.get("case_id", ""))
+        qids = list(e.get("qids") or [])
+        lines.append(json.dumps({
+            "case_id": cid,
+            "generated_at": e.get("generated_at", ""),
+            "generated_by": e.get("generated_by", ""),
+            "seed": e.get("seed", ""),
+            "count": len(qids),
+            "refs": _qid_refs(cid, qids),
+        }, ensure_ascii=False))
+    if lines:
+        with open(NCLEX_ROTATION_HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def load_rotation_history(case_id: str | None = None, last: int | None = None) -> list[dict]:
+    """History entries (oldest first) with qids expanded; optionally one case and/or its `last` N."""
+    out = []
+    want = str(case_id) if case_id is not None else None
+    for rec in _iter_jsonl_dicts(NCLEX_ROTATION_HISTORY_PATH):
+        cid = str(rec.get("case_id", ""))
+        if want is not None and cid != want:
+            continue
+        rec["qids"] = _qids_from_refs(cid, rec.pop("refs", ""))
+        out.append(rec)
+    return out[-last:] if last else out
+
+
+def rotation_history_csv_bytes(case_id: str | None = None) -> bytes:
+    rows = [{
+        "case_id": h.get("case_id", ""),
+        "generated_at": h.get("generated_at", ""),
+        "generated_by": h.get("generated_by", ""),
+        "count": h.get("count", len(h.get("qids") or [])),
+        "seed": h.get("seed", ""),
+        "qids_json": json.dumps(h.get("qids", []), ensure_ascii=False),
+    } for h in load_rotation_history(case_id)]
+    return _to_csv_bytes(rows, ["case_id", "generated_at", "generated_by", "count", "seed", "qids_json"])
+
+
+def _migrate_active_sets_history(data: dict) -> dict:
+    """One-time move of embedded per-case `history` lists into the JSONL log; rewrites the hot file."""
+    entries = []
+    for cid, rec in data["by_case"].items():
         if not isinstance(rec, dict):
-            rec = {}
-            data["by_case"][cid] = rec
-        if "history" not in rec or not isinstance(rec.get("history"), list):
-            rec["history"] = []
+            continue
+        for h in rec.pop("history", None) or []:
+            if isinstance(h, dict):
+                entries.append(dict(h, case_id=cid))
+    entries.sort(key=lambda e: str(e.get("generated_at", "")))
+    # an interrupted earlier migration may have logged some of them already
+    logged = {(str(r.get("case_id", "")), str(r.get("generated_at", "")), str(r.get("seed", "")))
+              for r in _iter_jsonl_dicts(NCLEX_ROTATION_HISTORY_PATH)}
+    entries = [e for e in entries
+               if (str(e["case_id"]), str(e.get("generated_at", "")), str(e.get("seed", ""))) not in logged]
+    try:
+        append_rotation_history(entries)
+        _write_nclex_active_sets(data)
+    except Exception:
+        pass  # keep serving the current sets; migration retries on the next change
+    return data
 
+
+def generate_all_active_sets(history_window: int | None = None, case_ids=None) -> tuple[bool, str, list[dict]]:
+    """New blueprint-constrained active set for every case (or case_ids), saved in one atomic write.
+
+    Each set has nclex_items_per_case() items from the type-enabled bank, matching client_need_blueprint
+    and difficulty_mix as closely as the bank allows and avoiding qids of the last `history_window`
+    sets of that case. Returns (ok, message, per-case report rows).
+    """
+    try:
+        pol = load_nclex_policy()
+        window = int(pol.get("rotation_history_window", 3) if history_window is None else history_window)
+        enabled_types = pol.get("enabled_types") or {}
+        blueprint = pol.get("client_need_blueprint") if isinstance(pol.get("client_need_blueprint"), dict) else {}
+        mix = pol.get("difficulty_mix") if isinstance(pol.get("difficulty_mix"), dict) else {}
+        packs = load_nclex_items().get("cases") or {}
+        wanted = {str(c) for c in case_ids} if case_ids else None
+        active_sets = load_nclex_active_sets()
+        by_case = active_sets["by_case"]
+        recent_sets = {}  # case_id -> last `window` qid lists, one pass over the history log
+        if window > 0:
+            for h in load_rotation_history():
+                recent_sets.setdefault(h["case_id"], []).append(h["qids"])
+                del recent_sets[h["case_id"]][:-window]
+        seed = sha256_hex(f"bulk|{time.time()}|{secrets.token_hex(6)}")
+        now_ts = utc_now_iso()
+        rows, log_entries = [], []
+        for cid in sorted(packs):
+            if wanted is not None and cid not in wanted:
+                continue
+            items = [it for it in ((packs[cid] or {}).get("items") or []) if enabled_types.get(it.get("type"), True)]
+            if not items:
+                continue
+            rec = by_case.setdefault(cid, {})
+            recent = {q for qs in recent_sets.get(cid, []) for q in qs}
+            if window > 0:
+                recent.update(rec.get("qids") or [])
+            case_seed = sha256_hex(f"{seed}|{cid}")
+            qids, rep = nclex_rotation.build_active_set(
+                items, nclex_items_per_case(pol, cid), blueprint, mix, recent,
+                random.Random(int(case_seed[:8], 16)))
+            rec.update({"qids": qids, "generated_at": now_ts, "generated_by": "admin (bulk)", "seed": case_seed[:16]})
+            log_entries.append(dict(rec, case_id=cid))
+            rows.append({"case_id": cid, "items": len(qids), "bank": rep["bank"],
+                         "reused_recent": rep["reused_recent"],
+                         "blueprint_off_by": rep["blueprint_deviation"],
+                         "difficulty_off_by": rep["difficulty_deviation"],
+                         "client_need": ", ".join(f"{c.split()[0]} {v}" for c, v in rep["client_need"].items()),
+                         "difficulty": ", ".join(f"{d} {v}" for d, v in rep["difficulty"].items())})
+        if not rows:
+            return False, "No case has type-enabled NCLEX items; nothing generated.", []
+        _write_nclex_active_sets(active_sets)
+        append_rotation_history(log_entries)
+        return True, f"Generated {len(rows)} active sets (avoiding the last {window} set(s) per case where the bank allows).", rows
+    except Exception as e:
+        return False, f"Bulk generation failed: {e}", []
+
+
+# =============================
+# NCLEX AI explanations (offline batch pre-generation)
+# =============================
+AI_BATCH_RATIONALE_PROMPT = (
+    "You are an expert NCLEX item rationales writer. "
+    "Explain why the correct answer is correct and why the other options are wrong. "
+    "Be concise (<= 150 words). Use nursing safety and prioritization language."
+)
+
+# Fields that define an item's content; any change here invalidates its explanation.
+_NCLEX_HASH_FIELDS = ("type", "stem", "options", "correct", "correct_text", "acceptable", "rationale", "rows", "cols", "stages")
+
+
+def nclex_item_content_hash(item: dict) -> str:
+    """Stable sha256 of the fields that define an NCLEX item's content."""
+    try:
+        core = {k: item.get(k) for k in _NCLEX_HASH_FIELDS if k in item}
+        return sha256_hex(json.dumps(core, ensure_ascii=False, sort_keys=True, default=str))
+    except Exception:
+        return ""
+
+
+def load_nclex_ai_explanations() -> dict:
+    """Shape: {"by_qid": {qid: {"hash", "text", "model", "generated_at"}}}"""
+    data = load_json_safe(NCLEX_AI_EXPLANATIONS_PATH, {"by_qid": {}})
+    if not isinstance(data, dict):
+        data = {"by_qid": {}}
+    if not isinstance(data.get("by_qid"), dict):
+        data["by_qid"] = {}
     return data
 
-def save_nclex_active_sets(data: dict):
+
+def save_nclex_ai_explanations(data: dict):
+    try:
+        tmp = NCLEX_AI_EXPLANATIONS_PATH.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, NCLEX_AI_EXPLANATIONS_PATH)
+    except Exception:
+        pass
+
+
+def get_cached_nclex_ai_explanation(item: dict, store: dict | None = None) -> str:
+    """Return the pre-generated explanation for `item`, or "" if missing/stale."""
     try:
-        if not isinstance(data, dict):
-            data = {"by_case": {}}
-        if not isinstance(data.get("by_case"), dict):
-            data["by_case"] = {}
-        NCLEX_ACTIVE_SETS_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        store = store if isinstance(store, dict) else load_nclex_ai_explanations()
+        rec = (store.get("by_qid") or {}).get(str(item.get("id", "")))
+        if isinstance(rec, dict) and rec.get("text") and rec.get("hash") == nclex_item_content_hash(item):
+            return str(rec.get("text"))
     except Exception:
         pass
+    return ""
+
+
+def _nclex_batch_user_prompt(item: dict) -> str:
+    correct = item.get("correct", None)
+    if item.get("type") == "cloze":
+        correct = item.get("correct_text") or correct
+    return (
+        f"Question type: {item.get('type', '')}\n"
+        f"Question: {item.get('stem', '')}\n"
+        f"Options: {item.get('options', []) or []}\n"
+        f"Correct: {correct}\n"
+        f"Official rationale: {item.get('rationale', '')}\n"
+        "Write an explanation."
+    )
+
+
+def collect_nclex_items_for_explanations(scope: str = "all") -> list[dict]:
+    """Items to pre-generate. scope="active" limits to qids in nclex_active_sets.json."""
+    bank = load_nclex_items()
+    out, seen = [], set()
+    active_by_case = (load_nclex_active_sets().get("by_case") or {}) if scope == "active" else {}
+    for cid, pack in (bank.get("cases") or {}).items():
+        its = [it for it in (pack or {}).get("items", []) or [] if isinstance(it, dict)]
+        if scope == "active":
+            qids = set(str(q) for q in ((active_by_case.get(str(cid)) or {}).get("qids") or []))
+            its = [it for it in its if str(it.get("id", "")) in qids]
+        for it in its:
+            qid = str(it.get("id", "")).strip()
+            if qid and qid not in seen:
+                seen.add(qid)
+                out.append(it)
+    return out
+
+
+def pregenerate_nclex_ai_explanations(model: str, scope: str = "all", max_workers: int = 4,
+                                      force: bool = False, progress_cb=None) -> tuple[bool, str]:
+    """Generate explanations for every item whose content hash changed (or is missing).
+
+    Calls run on a bounded thread pool; the sidecar is written once at the end.
+    `progress_cb(done, total)` is optional (used by the admin UI progress bar).
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    store = load_nclex_ai_explanations()
+    by_qid = store["by_qid"]
+    items = collect_nclex_items_for_explanations(scope)
+    todo = []
+    for it in items:
+        qid = str(it.get("id", ""))
+        h = nclex_item_content_hash(it)
+        rec = by_qid.get(qid)
+        if force or not (isinstance(rec, dict) and rec.get("text") and rec.get("hash") == h):
+            todo.append((qid, h, it))
+
+    if not todo:
+        return True, f"All {len(items)} item explanations are up to date."
+
+    def _one(it):
+        return openai_responses_call(model, AI_BATCH_RATIONALE_PROMPT, _nclex_batch_user_prompt(it))
+
+    ok_n, errors = 0, []
+    workers = max(1, min(int(max_workers or 1), 16))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(_one, it): (qid, h) for qid, h, it in todo}
+        for i, fut in enumerate(as_completed(futs), start=1):
+            qid, h = futs[fut]
+            try:
+                txt = (fut.result() or "").strip()
+                if txt:
+                    by_qid[qid] = {"hash": h, "text": txt, "model": model, "generated_at": utc_now_iso()}
+                    ok_n += 1
+            except Exception as e:
+                errors.append(f"{qid}: {e}")
+            if progress_cb is not None:
+                try:
+                    progress_cb(i, len(todo))
+                except Exception:
+                    pass
+
+    store["updated_at"] = utc_now_iso()
+    save_nclex_ai_explanations(store)
+    msg = f"Generated {ok_n}/{len(todo)} explanations ({len(items) - len(todo)} already up to date)."
+    if errors:
+        msg += f" {len(errors)} failed (first: {errors[0]})"
+    return (not errors), msg
 
 
 def build_instructor_key_pdf_bytes(
@@ -2354,6 +4612,10 @@ def build_instructor_key_pdf_bytes(
     - `nclex_type_allow`: filter NCLEX items by type (e.g., ["mcq","sata"]).
       If None/empty/"all" present => include all provided items.
     """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet
+
     buf = io.BytesIO()
     styles = getSampleStyleSheet()
     doc = SimpleDocTemplate(buf, pagesize=letter, title="ClinIQ Nurse - Instructor Key")
@@ -2517,6 +4779,184 @@ def upsert_students(existing: dict, new_students: list):
     return existing
 
 
+# =============================
+# Bulk provisioning (large cohorts)
+# =============================
+CREDENTIAL_FIELDS = ["display_name", "username", "password", "student_id", "cohort"]
+
+
+def read_student_import_header(file_bytes: bytes, filename: str, sheet: str = "") -> list[str]:
+    """Column names of an uploaded CSV/XLSX (reads only the first row)."""
+    try:
+        if str(filename).lower().endswith(".csv"):
+            text = io.TextIOWrapper(io.BytesIO(file_bytes), encoding="utf-8-sig", newline="")
+            return [str(h or "").strip() for h in next(csv.reader(text), [])]
+        from openpyxl import load_workbook
+        wb = load_workbook(filename=io.BytesIO(file_bytes), read_only=True, data_only=True)
+        ws = wb[sheet] if sheet and sheet in wb.sheetnames else wb[wb.sheetnames[0]]
+        for r in ws.iter_rows(min_row=1, max_row=1, values_only=True):
+            return [str(c).strip() if c is not None else "" for c in r]
+    except Exception:
+        pass
+    return []
+
+
+def iter_student_import_rows(file_bytes: bytes, filename: str, colmap: dict, sheet: str = ""):
+    """Stream rows of an uploaded CSV/XLSX as {display_name, username, student_id, cohort} dicts.
+
+    `colmap` maps those keys to column names from read_student_import_header(); missing keys
+    yield "". XLSX uses openpyxl read-only mode so large sheets are not loaded into memory.
+    """
+    if str(filename).lower().endswith(".csv"):
+        text = io.TextIOWrapper(io.BytesIO(file_bytes), encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        header = [str(h or "").strip() for h in next(reader, [])]
+        rows = reader
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(filename=io.BytesIO(file_bytes), read_only=True, data_only=True)
+        ws = wb[sheet] if sheet and sheet in wb.sheetnames else wb[wb.sheetnames[0]]
+        rows = ws.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in (next(rows, None) or [])]
+
+    idx = {k: (header.index(v) if v in header else None) for k, v in (colmap or {}).items()}
+    for r in rows:
+        if not r:
+            continue
+        out = {}
+        for k in ("display_name", "username", "student_id", "cohort"):
+            i = idx.get(k)
+            v = r[i] if (i is not None and i < len(r)) else None
+            v = "" if v is None else str(v).strip()
+            out[k] = "" if v.lower() in ("nan", "none") else v
+        if out["display_name"] or out["username"]:
+            yield out
+
+
+def bulk_provision_students(rows, *, prefix: str = "student", start_num: int = 1, pad3: bool = True,
+                            cohort: str = "", pw_len: int = 10, batch_size: int = 500) -> tuple[int, int, list[dict]]:
+    """Create accounts for a stream of rows with one atomic write of students.json.
+
+    Usernames are auto-numbered when missing; existing usernames are skipped.
+    Passwords are generated and hashed per batch. Returns (created, skipped, credential_rows).
+    """
+    data = load_students()
+    students = data.setdefault("students", [])
+    existing = {str(s.get("username", "")).strip() for s in students if str(s.get("username", "")).strip()}
+    created_rows, skipped = [], 0
+    n = 0
+    now_iso = utc_now_iso()
+
+    def _flush(batch):
+        for rec, pw in batch:
+            rec["password_sha256"] = sha256_hex(pw)
+            students.append(rec)
+            created_rows.append({
+                "display_name": rec["display_name"],
+                "username": rec["username"],
+                "password": pw,
+                "student_id": rec["student_id"],
+                "cohort": rec["cohort"],
+            })
+
+    batch = []
+    for r in rows:
+        uname = str(r.get("username", "") or "").strip()
+        if uname and uname in existing:
+            skipped += 1
+            continue
+        num = int(start_num) + n
+        while not uname or uname in existing:
+            # auto-numbered usernames step past accounts that already exist
+            uname = f"{prefix}{num:03d}" if pad3 else f"{prefix}{num}"
+            if uname in existing:
+                n += 1
+                num = int(start_num) + n
+                uname = ""
+        existing.add(uname)
+        batch.append(({
+            "username": uname,
+            "display_name": str(r.get("display_name", "") or "").strip() or uname,
+            "student_id": str(r.get("student_id", "") or "").strip() or (f"{num:03d}" if pad3 else str(num)),
+            "cohort": str(r.get("cohort", "") or "").strip() or cohort,
+            "created_at": now_iso,
+        }, generate_password(int(pw_len))))
+        n += 1
+        if len(batch) >= int(batch_size):
+            _flush(batch)
+            batch = []
+    _flush(batch)
+
+    if created_rows:
+        save_students(data)
+    return len(created_rows), skipped, created_rows
+
+
+def build_credentials_csv_bytes(rows: list) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CREDENTIAL_FIELDS)
+    writer.writeheader()
+    for r in (rows or []):
+        if isinstance(r, dict):
+            writer.writerow({k: r.get(k, "") for k in CREDENTIAL_FIELDS})
+    return out.getvalue().encode("utf-8")
+
+
+def _build_credentials_bundle(rows: list, title: str) -> dict:
+    return {
+        "csv": build_credentials_csv_bytes(rows),
+        "xlsx": build_credentials_xlsx_bytes(rows, title=title),
+        "docx": build_credentials_docx_bytes(rows, title=title),
+        "count": len(rows or []),
+    }
+
+
+# =============================
+# Background jobs (process-wide; results kept in memory only)
+# =============================
+@st.cache_resource(show_spinner=False)
+def _background_jobs() -> dict:
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    return {"lock": threading.Lock(), "pool": ThreadPoolExecutor(max_workers=2), "jobs": {}}
+
+
+def submit_background_job(kind: str, fn, *args, **kwargs) -> str:
+    reg = _background_jobs()
+    job_id = f"{kind}-{secrets.token_hex(6)}"
+    with reg["lock"]:
+        # keep the registry small (oldest first)
+        for old in list(reg["jobs"].keys())[:-19]:
+            reg["jobs"].pop(old, None)
+        reg["jobs"][job_id] = {"kind": kind, "created_at": utc_now_iso(), "future": reg["pool"].submit(fn, *args, **kwargs)}
+    return job_id
+
+
+def get_background_job(job_id: str) -> dict | None:
+    """{"kind", "created_at", "status": running|done|error, "result", "error"} or None."""
+    reg = _background_jobs()
+    with reg["lock"]:
+        job = reg["jobs"].get(str(job_id or ""))
+    if not job:
+        return None
+    fut = job["future"]
+    out = {"kind": job["kind"], "created_at": job["created_at"], "status": "running", "result": None, "error": ""}
+    if fut.done():
+        try:
+            out["result"] = fut.result()
+            out["status"] = "done"
+        except Exception as e:
+            out["status"] = "error"
+            out["error"] = str(e)
+    return out
+
+
+def discard_background_job(job_id: str):
+    reg = _background_jobs()
+    with reg["lock"]:
+        reg["jobs"].pop(str(job_id or ""), None)
+
+
 def verify_student(username: str, password: str):
     """
     Login logic:
@@ -2531,19 +4971,14 @@ def verify_student(username: str, password: str):
     if not username or not password:
         return None
 
-    data = load_students()
-    student_obj = None
-    for s in data.get("students", []):
-        if str(s.get("username", "")).strip() == username:
-            student_obj = s
-            break
+    student_obj = get_student_index().get(username)
     if not student_obj:
         return None
 
-    policy = load_exam_access_policy()
-    exam_active = is_exam_password_active(policy)
-    exam_hash = (policy.get("exam_password_sha256") or "").strip().lower()
-    force_only = bool(policy.get("force_exam_password_only", True))
+    exam_state = get_exam_password_state()
+    exam_active = bool(exam_state.get("enabled"))
+    exam_hash = exam_state.get("hash", "")
+    force_only = bool(exam_state.get("force_only", True))
 
     if exam_active and exam_hash:
         if sha256_hex(password).lower() == exam_hash:
@@ -2568,15 +5003,44 @@ def verify_student(username: str, password: str):
     return None
 
 
-# =============================
-# Safe getters
-# =============================
-def safe_get_system(case: dict) -> str:
-    return (case.get("system") or case.get("category") or "Uncategorized").strip()
+def benchmark_login_throughput(n_logins: int = 500, threads: int = 8) -> dict:
+    """Time verify_student() for a simulated login burst (wrong passwords; nothing is written).
+
+    Runs the same burst twice: "cold" invalidates the credential cache before every
+    call (old behaviour: parse students.json + policy each time), "cached" uses the index.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    usernames = list(get_student_index().keys()) or ["nobody"]
+    names = [usernames[i % len(usernames)] for i in range(max(1, int(n_logins)))]
+    bad_pw = "bench-" + secrets.token_hex(8)
+
+    def _run(cold: bool) -> dict:
+        def _one(u):
+            if cold:
+                invalidate_credential_cache()
+            t0 = time.perf_counter()
+            verify_student(u, bad_pw)
+            return time.perf_counter() - t0
+
+        t_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, int(threads))) as ex:
+            lat = sorted(ex.map(_one, names))
+        wall = time.perf_counter() - t_start
+        return {
+            "logins": len(lat),
+            "wall_s": round(wall, 4),
+            "logins_per_s": round(len(lat) / wall, 1) if wall > 0 else None,
+            "p50_ms": round(lat[len(lat) // 2] * 1000.0, 3),
+            "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000.0, 3),
+        }
 
+    cold = _run(True)
+    invalidate_credential_cache()
+    get_student_index()
+    cached = _run(False)
+    return {"students": len(usernames), "threads": int(threads), "cold": cold, "cached": cached}
 
-def safe_get_setting(case: dict) -> str:
-    return (case.get("setting") or "Unspecified").strip()
 
 def fmt_patient(p: dict) -> str:
     if not isinstance(p, dict):
@@ -2835,16 +5299,6 @@ def _render_nclex_correct_pretty(correct):
 
 
 
-# =============================
-# Step 8 Rubric Scoring (matching)
-# =============================
-STOPWORDS = {
-    "the", "a", "an", "and", "or", "to", "of", "in", "on", "for", "with", "without", "at", "by",
-    "is", "are", "was", "were", "be", "been", "being", "as", "from", "that", "this", "it", "its",
-    "patient", "pt"
-}
-
-
 # =============================
 # Attempt state reset (safe init)
 # =============================
@@ -2915,6 +5369,8 @@ def reset_full_attempt_for_case(case_id: str, student_username: str = ""):
 
     # NCLEX / Practical
     st.session_state["nclex_answers"] = {}
+    st.session_state["nclex_track"] = AnswerChangeTracker()
+    st.session_state.pop("nclex_cat", None)
     st.session_state["nclex_scored"] = {}
     st.session_state["nclex_finalized"] = False
     st.session_state["practical_submitted"] = False
@@ -2940,6 +5396,10 @@ def reset_full_attempt_for_case(case_id: str, student_username: str = ""):
     # Remove autosave drafts for this student+case (prevents immediate re-freeze)
     if student_username:
         delete_autosaves_for(student_username, case_id)
+        try:
+            close_exam_deadline(student_username, case_id, "reset")
+        except Exception:
+            pass
 
 
 def ensure_section_locks(case_id: str):
@@ -3035,22 +5495,17 @@ def init_case_state_if_needed(case_id: str, case_title: str = ""):
         # NCLEX reset
         st.session_state["practical_submitted"] = False
         st.session_state["nclex_answers"] = {}
+        st.session_state["nclex_track"] = AnswerChangeTracker()
+        st.session_state.pop("nclex_cat", None)
         st.session_state["nclex_score"] = 0
         st.session_state["nclex_total"] = 0
         st.session_state["nclex_scored"] = None
 
-def norm(s: str) -> str:
-    return (s or "").lower().strip()
-
-
-def tokenize(s: str):
-    s = norm(s)
-    tokens = re.findall(r"[a-z0-9]+", s)
-    return [t for t in tokens if t and t not in STOPWORDS]
 
 # =============================
 # Intake (5 marks) + scenario trigger
 # =============================
+@html_fragment_cached("scenario_trigger")
 def build_scenario_trigger(case: dict) -> str:
     """Create a more realistic clinical scenario (trigger) from the case.
 
@@ -3227,375 +5682,10 @@ def build_scenario_trigger(case: dict) -> str:
     scenario = re.sub(r"\s+", " ", scenario)
     return scenario
 
-def _token_set(s: str):
-    return set(tokenize(s or ""))
-
-def _overlap_ratio(a: str, b: str) -> float:
-    A = _token_set(a)
-    B = _token_set(b)
-    if not A or not B:
-        return 0.0
-    return len(A & B) / max(1, len(B))
-
-def score_intake(case: dict, intake: dict) -> tuple[int, dict]:
-    """Score student intake out of 5 using overlap against the case ground truth."""
-    intake = intake or {}
-    patient = case.get("patient", {}) if isinstance(case.get("patient", {}), dict) else {}
-    expected_age = str(patient.get("age", "")).strip()
-    expected_setting = str(safe_get_setting(case) or "")
-    expected_cc = str(case.get("chiefComplaint", "") or "")
-    expected_hist = " ".join([
-        " ".join((case.get("history", {}) or {}).get("pmh", []) if isinstance((case.get("history", {}) or {}).get("pmh", []), list) else []),
-        " ".join((case.get("history", {}) or {}).get("meds", []) if isinstance((case.get("history", {}) or {}).get("meds", []), list) else []),
-        " ".join((case.get("history", {}) or {}).get("allergies", []) if isinstance((case.get("history", {}) or {}).get("allergies", []), list) else []),
-        str((case.get("history", {}) or {}).get("social", "") or ""),
-        str((case.get("history", {}) or {}).get("hpi", "") or ""),
-    ]).strip()
-
-    vitals = case.get("vitals", {}) if isinstance(case.get("vitals", {}), dict) else {}
-    vit_text = " ".join([f"{k} {vitals.get(k,'')}" for k in vitals.keys() if str(vitals.get(k,'')).strip()])
-    findings = case.get("findings", []) if isinstance(case.get("findings", []), list) else []
-    findings_text = " ".join([str(x) for x in findings if str(x).strip()])
-
-    expected_sx = (expected_cc + " " + vit_text + " " + findings_text).strip()
-
-    # Student inputs
-    s_age = str(intake.get("age", "")).strip()
-    s_setting = str(intake.get("setting", "")).strip()
-    s_cc = str(intake.get("chief_complaint", "")).strip()
-    s_sx = str(intake.get("signs_symptoms", "")).strip()
-    s_findings = str(intake.get("findings", "")).strip()
-    s_hist = str(intake.get("history", "")).strip()
-
-    breakdown = {}
-    score = 0
-
-    # 1) Age (exact or close numeric)
-    age_ok = False
-    try:
-        ea = int(re.findall(r"\d+", expected_age)[0]) if expected_age else None
-        sa = int(re.findall(r"\d+", s_age)[0]) if s_age else None
-        if ea is not None and sa is not None and abs(ea - sa) <= 5:
-            age_ok = True
-    except Exception:
-        age_ok = False
-    if age_ok or (expected_age and s_age and expected_age == s_age):
-        score += 1
-        breakdown["age"] = 1
-    else:
-        breakdown["age"] = 0
-
-    # 2) Setting (token overlap)
-    setting_ratio = _overlap_ratio(s_setting, expected_setting)
-    if expected_setting and setting_ratio >= 0.45:
-        score += 1
-        breakdown["setting"] = 1
-    else:
-        breakdown["setting"] = 0
-
-    # 3) Chief complaint
-    cc_ratio = _overlap_ratio(s_cc, expected_cc)
-    if expected_cc and cc_ratio >= 0.45:
-        score += 1
-        breakdown["chief_complaint"] = 1
-    else:
-        breakdown["chief_complaint"] = 0
-
-    # 4) Major signs/symptoms + findings (combined)
-    sx_student = (s_sx + " " + s_findings).strip()
-    sx_ratio = _overlap_ratio(sx_student, expected_sx)
-    if expected_sx and sx_ratio >= 0.30:
-        score += 1
-        breakdown["signs_symptoms_findings"] = 1
-    else:
-        breakdown["signs_symptoms_findings"] = 0
-
-    # 5) History
-    hist_ratio = _overlap_ratio(s_hist, expected_hist)
-    if expected_hist and hist_ratio >= 0.25:
-        score += 1
-        breakdown["history"] = 1
-    else:
-        breakdown["history"] = 0
-
-    return int(score), breakdown
-
 
 # =============================
 # Gold-4 options + scoring helpers (4 correct + distractors)
 # =============================
-SYSTEM_DISTRACTORS = {
-    "Cardiovascular": {
-        "A": [
-            "Ask about long-term diet goals only and delay immediate assessment",
-            "Complete discharge planning before stabilizing the patient",
-            "Assess pain only and skip focused cardiopulmonary assessment",
-            "Perform a full psychosocial interview before obtaining vital signs",
-            "Delay vital signs because the patient is awake and talking",
-            "Focus on sodium education before reassessing instability",
-        ],
-        "B": [
-            "Prioritize completing documentation before reassessment",
-            "Prioritize patient education first despite red flags",
-            "Wait for the next scheduled vital signs without reassessment",
-            "Focus on comfort measures only despite instability",
-            "Arrange routine outpatient follow-up as the first action",
-            "Delay escalation to avoid overreacting",
-        ],
-        "C": [
-            "Administer a medication without verifying orders/allergies",
-            "Change prescribed doses independently",
-            "Allow unassisted ambulation while unstable",
-            "Delay escalation and recheck in 1 hour despite red flags",
-            "Stop oxygen abruptly without targets/orders",
-            "Give extra dose because values are abnormal without protocol",
-        ],
-        "D": [
-            "Reassess only at end of shift regardless of symptoms",
-            "Stop monitoring to reduce alarms",
-            "Do not trend vital signs after interventions",
-            "Reassess only if the patient asks for help",
-            "Skip neuro checks despite headache/visual symptoms",
-            "Document later without trending",
-        ],
-        "E": [
-            "Leave out objective vital signs to keep SBAR brief",
-            "State opinions without objective assessment data",
-            "Recommend medication changes without orders",
-            "Delay calling provider until next round despite red flags",
-            "Do not mention response to interventions",
-            "Request discharge planning as the main recommendation",
-        ],
-    },
-    "Respiratory": {
-        "A": [
-            "Check diet history first and delay respiratory assessment",
-            "Do a full skin assessment before assessing airway",
-            "Focus on family history only and skip SpO2 assessment",
-            "Assess bowel sounds before lung sounds",
-            "Delay vital signs to avoid disturbing the patient",
-            "Ask about exercise routine before checking work of breathing",
-        ],
-        "B": [
-            "Provide education first before treating hypoxia",
-            "Complete documentation before applying oxygen",
-            "Encourage ambulation while dyspneic",
-            "Wait for respiratory therapist without reassessment",
-            "Delay escalation despite increased work of breathing",
-            "Address diet as first priority over breathing",
-        ],
-        "C": [
-            "Discontinue oxygen abruptly without targets/orders",
-            "Administer sedatives without verifying respiratory status",
-            "Delay protocol actions despite wheeze",
-            "Change prescribed doses independently",
-            "Allow oral intake in severe respiratory distress",
-            "Stop monitoring to reduce alarms",
-        ],
-        "D": [
-            "Reassess only once daily regardless of condition",
-            "Stop pulse oximetry to reduce alarms",
-            "Do not reassess after oxygen/nebulizer treatments",
-            "Skip respiratory rate trending",
-            "Ignore accessory muscle use during reassessment",
-            "Document later without trending",
-        ],
-        "E": [
-            "Do not report SpO2 or oxygen requirements",
-            "Provide a vague recommendation with no clear ask",
-            "Leave out response to interventions",
-            "Delay provider call despite deterioration",
-            "Focus SBAR on social history only",
-            "Recommend discharge despite unstable status",
-        ],
-    },
-    "Neurological": {
-        "A": [
-            "Assess diet history only and skip neuro checks",
-            "Delay vital signs to complete full psychosocial interview",
-            "Skip LOC assessment because patient is talking",
-            "Check skin integrity before neuro status",
-            "Focus on sleep hygiene before urgent assessment",
-            "Assess bowel habits first",
-        ],
-        "B": [
-            "Provide reassurance only despite neuro red flags",
-            "Delay reassessment for 1 hour",
-            "Complete paperwork before escalation",
-            "Focus on discharge planning first",
-            "Wait for next scheduled vitals",
-            "Address diet first over neuro status",
-        ],
-        "C": [
-            "Give medication without checking contraindications/orders",
-            "Allow ambulation without fall precautions",
-            "Delay escalation despite acute neuro change",
-            "Change prescribed doses independently",
-            "Ignore seizure precautions when indicated",
-            "Stop monitoring to reduce alarms",
-        ],
-        "D": [
-            "Skip neuro checks during reassessment",
-            "Stop monitoring to reduce alarms",
-            "Reassess only at end of shift",
-            "Do not trend LOC/vitals after interventions",
-            "Ignore headache/vision changes",
-            "Document later without trending",
-        ],
-        "E": [
-            "Do not mention neuro status/LOC in SBAR",
-            "Provide no objective data (vitals, GCS) to provider",
-            "Recommend medication changes without orders",
-            "Delay provider call despite deterioration",
-            "Omit time course/onset details",
-            "Ask for non-urgent consult as main recommendation",
-        ],
-    },
-}
-
-GENERIC_DOMAIN_DISTRACTORS = {
-    "A": [
-        "Complete a full head-to-toe exam before checking ABCs",
-        "Focus on documentation first before reassessment",
-        "Discuss discharge planning before stabilizing the patient",
-        "Assess only pain and ignore abnormal vital signs",
-        "Delay vital signs to avoid disturbing the patient",
-        "Ask about lifestyle goals only and delay urgent assessment",
-    ],
-    "B": [
-        "Complete documentation before reassessing the patient",
-        "Provide education first despite instability",
-        "Delay escalation and wait for next scheduled vitals",
-        "Focus on comfort only despite red flags",
-        "Arrange routine follow-up before stabilization",
-        "Address diet first over acute symptoms",
-    ],
-    "C": [
-        "Administer medication without verifying orders/allergies",
-        "Change prescribed doses independently",
-        "Delay escalation despite red flags",
-        "Allow unassisted ambulation while unstable",
-        "Stop monitoring to reduce alarms",
-        "Provide reassurance only and no interventions",
-    ],
-    "D": [
-        "Reassess only at the end of shift regardless of condition",
-        "Do not trend vital signs after interventions",
-        "Stop monitoring to reduce alarms",
-        "Reassess only if the patient asks",
-        "Document later without trending",
-        "Skip reassessment of response to interventions",
-    ],
-    "E": [
-        "Leave out objective data to keep SBAR short",
-        "State opinions without objective assessment",
-        "Recommend medication changes without orders",
-        "Delay provider call despite deterioration",
-        "Omit time course/response to interventions",
-        "Ask for non-urgent tasks as the main recommendation",
-    ],
-}
-
-def infer_system_key(case: dict) -> str:
-    s = (safe_get_system(case) or "").lower()
-    if "card" in s or "cv" in s or "hypert" in s or "heart" in s:
-        return "Cardiovascular"
-    if "resp" in s or "pulm" in s or "asth" in s or "copd" in s:
-        return "Respiratory"
-    if "neuro" in s or "stroke" in s or "seiz" in s:
-        return "Neurological"
-    return "Generic"
-
-def build_domain_options(domain_key: str, case: dict, gold_list: list, total: int = 10, distractors: int = 6):
-    """Build multi-select options for a domain (A–D).
-
-    IMPORTANT (fairness):
-    - We do NOT force '4 correct' anymore.
-    - The required selection count is the number of gold-standard targets available for that domain in the case.
-    - If a case has 2/3/4 gold targets, the student must select exactly 2/3/4 respectively.
-    """
-    gold = [str(x).strip() for x in (gold_list or []) if str(x).strip()]
-    # Cap very large lists just to keep UI usable (typical cases use 2–4)
-    cap = min(len(gold), 6)
-    goldN = gold[:cap] if cap > 0 else []
-    req_n = len(goldN) if goldN else 4  # safe fallback if a case is missing gold targets
-
-    sys_key = infer_system_key(case)
-
-    pool = []
-    if sys_key != "Generic":
-        pool += SYSTEM_DISTRACTORS.get(sys_key, {}).get(domain_key, [])
-    pool += GENERIC_DOMAIN_DISTRACTORS.get(domain_key, [])
-
-    pool = [p for p in pool if str(p).strip() and str(p).strip() not in set(goldN)]
-
-    picked = []
-    seen = set()
-    for p in pool:
-        p = str(p).strip()
-        if p and p not in seen:
-            seen.add(p)
-            picked.append(p)
-        if len(picked) >= distractors:
-            break
-
-    # Fill if pool is short
-    while len(picked) < distractors:
-        filler = f"Non-priority action ({domain_key}) — routine follow-up"
-        if filler not in seen and filler not in set(goldN):
-            seen.add(filler)
-            picked.append(filler)
-        else:
-            break
-
-    # Ensure enough total options for reasonable choice
-    total = max(int(total or 10), req_n + int(distractors or 6))
-    options = (goldN + picked)[:total]
-
-    # Deterministic shuffle by case_id+domain
-    seed = sha256_hex(f"{case.get('id','')}-{domain_key}-options")[:8]
-    try:
-        r = random.Random(int(seed, 16))
-        r.shuffle(options)
-    except Exception:
-        pass
-
-    return options, goldN
-
-
-def diff_selected_vs_gold(selected: list, gold4: list):
-    selected = [str(x).strip() for x in (selected or []) if str(x).strip()]
-    gold4 = [str(x).strip() for x in (gold4 or []) if str(x).strip()]
-    correct = [x for x in selected if x in gold4]
-    wrong = [x for x in selected if x not in gold4]
-    missed = [x for x in gold4 if x not in selected]
-    return correct, wrong, missed
-
-def score_select4(selected: list, gold4: list) -> int:
-    """Backwards-compatible wrapper for score_selectN (kept name to avoid breaking other code)."""
-    return score_selectN(selected, gold4, max_points=len([x for x in (gold4 or []) if str(x).strip()]) or 4)
-
-def score_selectN(selected: list, gold_list: list, max_points: int) -> int:
-    """Domain scoring with partial credit and variable max.
-
-    +1 for each correct gold-standard option selected.
-    No negative marking for wrong selections.
-
-    The score is floored at 0 and capped at max_points (typically 4, but may vary by session/question settings).
-    """
-    selected = [str(x).strip() for x in (selected or []) if str(x).strip()]
-    gold_list = [str(x).strip() for x in (gold_list or []) if str(x).strip()]
-    correct = [x for x in selected if x in gold_list]
-
-    score = len(correct)
-
-    if score < 0:
-        score = 0
-    if max_points is None or int(max_points) <= 0:
-        max_points = len(gold_list) or 4
-    if score > int(max_points):
-        score = int(max_points)
-    return int(score)
 
 
 def resolve_ae_rationale(case: dict | None, domain_key: str, gold_items: list | None = None, sbar_expected: str | None = None) -> str:
@@ -3674,6 +5764,7 @@ def render_select_feedback(domain_name: str, domain_key: str, score: int, correc
     return "\n".join(lines)
 
 
+@html_fragment_cached("ae_header")
 def render_ae_section_header_html(letter: str, title: str) -> str:
     letter = (letter or "").strip()
     title = (title or "").strip()
@@ -3687,6 +5778,7 @@ def render_ae_section_header_html(letter: str, title: str) -> str:
     )
 
 
+@html_fragment_cached("ae_feedback")
 def render_select_feedback_html(domain_name: str, domain_key: str, score: int, correct_selected, wrong_selected, missed_correct, max_points: int,
                                case: dict | None = None, gold_items: list | None = None, sbar_expected: str | None = None) -> str:
     # Build rationale text (plain)
@@ -3727,68 +5819,6 @@ def render_select_feedback_html(domain_name: str, domain_key: str, score: int, c
     return "".join(html_parts)
 
 
-
-
-def item_match(student_text: str, gold_item: str) -> bool:
-    stxt = norm(student_text)
-    g = norm(str(gold_item))
-    if not stxt or not g:
-        return False
-    if g in stxt:
-        return True
-    s_tokens = set(tokenize(stxt))
-    g_tokens = set(tokenize(g))
-    if not g_tokens:
-        return False
-    return len(s_tokens.intersection(g_tokens)) >= 1
-
-
-def rubric_match_report(student_text: str, gold_list):
-    gold_list = gold_list or []
-    matched, missed = [], []
-    for g in gold_list:
-        if item_match(student_text, str(g)):
-            matched.append(str(g))
-        else:
-            missed.append(str(g))
-    return matched, missed
-
-
-def score_from_matched(matched_count: int, has_any_text: bool) -> int:
-    if matched_count >= 3:
-        return 4
-    if matched_count == 2:
-        return 3
-    if matched_count == 1:
-        return 2
-    if has_any_text:
-        return 1
-    return 0
-
-
-UNSAFE_PATTERNS = [
-    (r"\blower\s+bp\s+quick(ly)?\b", "Rapid BP lowering without orders can cause ischemia/stroke."),
-    (r"\bdouble\s+(the\s+)?dose\b", "Dose changes without orders are unsafe."),
-    (r"\bgive\s+extra\s+dose\b", "Extra dosing without verification/orders is unsafe."),
-    (r"\bpush\s+potassium\b", "IV potassium must NEVER be IV push."),
-    (r"\bbolus\s+insulin\b", "Insulin dosing must follow protocol/orders."),
-    (r"\bdiscontinue\s+oxygen\b", "Stopping oxygen abruptly can worsen hypoxia—follow orders/targets."),
-]
-
-
-def detect_unsafe(text: str):
-    t = norm(text)
-    hits = []
-    for pat, msg in UNSAFE_PATTERNS:
-        if re.search(pat, t):
-            hits.append(msg)
-    return hits
-
-
-def apply_unsafe_penalty(score: int, unsafe_hits):
-    return min(score, 1) if unsafe_hits else score
-
-
 def score_explainer_markdown() -> str:
     return (
         "**How scoring works (0–4, partial credit):\n\n"
@@ -3994,304 +6024,53 @@ def fmt_nclex_stem(stem: str) -> str:
     )
 
 
-def normalize_text_basic(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"[^\w\s]", "", s)  # remove punctuation
-    return s
+def _st_fragment(fn):
+    """st.fragment when this Streamlit has it (>= 1.33, experimental_fragment before 1.37); else run inline."""
+    frag = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    return frag(fn) if frag else fn
 
 
-def shuffle_if_needed(options: list, seed_str: str, enabled: bool) -> list:
-    if not enabled:
-        return options
-    # deterministic shuffle per item id
-    rnd = hashlib.sha256(seed_str.encode("utf-8")).hexdigest()
-    # simple deterministic shuffle: sort by hash of (rnd + option)
-    return sorted(list(options), key=lambda x: hashlib.sha256((rnd + "||" + str(x)).encode("utf-8")).hexdigest())
-
-
-def nclex_score_item(item: dict, answer, policy: dict, features: dict):
-    qtype = item.get("type")
-    correct = item.get("correct")
-    max_points = 1
-    points = 0
-    detail = {"qid": item.get("id"), "type": qtype, "points": 0, "max": 1, "correct": False}
-
-    partial_credit = bool(features.get("nclex_partial_credit", False))
-
-    if qtype == "mcq":
-        points = 1 if answer == correct else 0
-
-    elif qtype == "sata":
-        # answer expected list
-        correct_set = set(correct or [])
-        ans_set = set(answer or [])
-        if not partial_credit:
-            points = 1 if ans_set == correct_set else 0
-        else:
-            # simple partial: +1 for each correct chosen, -1 for each extra wrong chosen, floor at 0, normalize to 1
-            # if you want a stricter rule, disable partial_credit.
-            hit = len(ans_set.intersection(correct_set))
-            extra = len(ans_set - correct_set)
-            raw = max(0, hit - extra)
-            points = 1 if (raw > 0 and hit == len(correct_set) and extra == 0) else (1 if raw >= len(correct_set) else 0)
-            # We keep it conservative: either correct=1 or 0. Turn on partial later if you want fractional.
-
-    elif qtype == "ordered_response":
-        # correct expected list
-        corr = list(correct or [])
-        ans = list(answer or [])
-        if not corr:
-            points = 0
-        else:
-            if not partial_credit:
-                points = 1 if ans == corr else 0
-            else:
-                # partial per position (0..1)
-                max_points = len(corr)
-                points = sum(1 for i in range(min(len(ans), len(corr))) if ans[i] == corr[i])
-                detail["max"] = max_points
-                detail["points"] = points
-                detail["correct"] = (points == max_points)
-                return detail
-
-    elif qtype == "cloze":
-        # correct_text OR correct + acceptable
-        correct_text = item.get("correct_text") or correct or ""
-        acceptable = item.get("acceptable") or []
-        ans = normalize_text_basic(answer or "")
-        ok = ans == normalize_text_basic(correct_text)
-        if not ok:
-            for a in acceptable:
-                if ans == normalize_text_basic(a):
-                    ok = True
-                    break
-        points = 1 if ok else 0
-
-    elif qtype == "matrix":
-        # correct expected dict: row -> col
-        corr = item.get("correct") or {}
-        ans = answer or {}
-        rows = item.get("rows") or list(corr.keys())
-        if not partial_credit:
-            ok = True
-            for r in rows:
-                if ans.get(r) != corr.get(r):
-                    ok = False
-                    break
-            points = 1 if ok else 0
-        else:
-            max_points = len(rows) if rows else 1
-            points = 0
-            for r in rows:
-                if ans.get(r) == corr.get(r):
-                    points += 1
-            detail["max"] = max_points
-            detail["points"] = points
-            detail["correct"] = (points == max_points)
-            return detail
-
-    elif qtype == "evolving_case":
-        stages = item.get("stages") or []
-        # answer expected dict stage_index -> stage_answer
-        ans = answer or {}
-        if not partial_credit:
-            ok_all = True
-            for si, stage in enumerate(stages):
-                q = stage.get("question", {}) or {}
-                stype = q.get("type")
-                scorrect = q.get("correct")
-                given = ans.get(str(si))
-                if stype == "mcq":
-                    if given != scorrect:
-                        ok_all = False
-                elif stype == "sata":
-                    if set(given or []) != set(scorrect or []):
-                        ok_all = False
-                else:
-                    ok_all = False
-            points = 1 if ok_all and stages else 0
-        else:
-            max_points = 0
-            points = 0
-            for si, stage in enumerate(stages):
-                q = stage.get("question", {}) or {}
-                stype = q.get("type")
-                scorrect = q.get("correct")
-                given = ans.get(str(si))
-                if stype == "mcq":
-                    max_points += 1
-                    points += 1 if given == scorrect else 0
-                elif stype == "sata":
-                    max_points += 1
-                    points += 1 if set(given or []) == set(scorrect or []) else 0
-            detail["max"] = max_points if max_points else 1
-            detail["points"] = points
-            detail["correct"] = (points == detail["max"])
-            return detail
-
-    else:
-        points = 0
-
-    detail["max"] = max_points
-    detail["points"] = points
-    detail["correct"] = (points == max_points)
-    return detail
-
-
-
-def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: dict, mode: str, timer_lock: bool, student_username: str = "", case_title: str = ""):
-    """
-    Renders NCLEX-style practice AFTER A–E completion only.
-    Adds:
-    - Per-question "Save" (writes to autosave file; helps against crashes)
-    - Finalize + Review page that shows correct/wrong + rationale (and optional AI explanation)
-    """
-    if not policy.get("enabled", False):
-        return
-
-    vis = policy.get("mode_visibility", {"Practice": True, "Exam": True})
-    if not bool(vis.get(mode, True)):
-        return
-
-    # Policy defaults (safe if older nclex_policy.json is missing keys)
-    show_correct_after = False  # per-question feedback disabled; review only after final submit
-    show_rationales_after = False  # per-question feedback disabled; review only after final submit
-    shuffle_opts = bool(policy.get("shuffle_options", True))
-    show_review_after_finalize = bool(policy.get("show_review_after_finalize", True))
-    ai_explain_after_finalize = bool(policy.get("ai_explanations_after_finalize", True))
-
-    st.divider()
-    st.subheader("🧾 Practical (NCLEX-Style)")
-
-    case_pack = (nclex.get("cases") or {}).get(case_id)
-    if not case_pack:
-        st.error(
-            f"No NCLEX-style practice items found for this case ID in nclex_items.json.\n\n"
-            f"Looking for case id: {case_id}"
-        )
-        st.info("Admin: open ✅ NCLEX Validator to auto-fix missing packs (IDs).")
-        return
-
-    items = list(case_pack.get("items", []) or [])
-    enabled_types = (policy.get("enabled_types") or {})
-    items = [it for it in items if enabled_types.get(it.get("type"), True)]
-
-    if not items:
-        st.info("This case has an NCLEX pack, but no items are inside (or all types are disabled).")
-        return
-
-    # Apply items_per_case + optional Admin-controlled active set rotation
-    items_per_case = nclex_items_per_case(policy, case_id)
-    try:
-        if bool(policy.get("rotation_enabled", False)):
-            active_sets = load_nclex_active_sets()
-            active = (active_sets.get("by_case") or {}).get(str(case_id))
-            qids = (active or {}).get("qids") if isinstance(active, dict) else None
-            if isinstance(qids, list) and qids:
-                by_id = {str(it.get("id", "")): it for it in items}
-                ordered = [by_id[q] for q in qids if q in by_id]
-                remaining = [it for it in items if str(it.get("id", "")) not in set(qids)]
-                items = (ordered + remaining)[:items_per_case]
-            else:
-                # No active set yet: fall back to first N
-                items = items[:items_per_case]
-        else:
-            items = items[:items_per_case]
-    except Exception:
-        items = items[:items_per_case]
-
-    # Randomize order per student/session (optional) AFTER rotation is applied
+def _rerun_fragment():
+    """Re-run only the current fragment; falls back to a full rerun on older Streamlit."""
     try:
-        if bool(policy.get("randomize_per_student_session", False)):
-            seed_base = f"{student_username}|{case_id}|{st.session_state.get('attempt_started_epoch') or ''}|{mode}"
-            items = sorted(list(items), key=lambda it: hashlib.sha256((seed_base + '||' + str(it.get('id',''))).encode('utf-8')).hexdigest())
-    except Exception:
-        pass
-
-    # Persist the presented items order for stable scoring/review (prevents missing/out-of-order questions on reruns)
-    if st.session_state.get("nclex_presented_case_id") != str(case_id):
-        st.session_state["nclex_presented_case_id"] = str(case_id)
-        st.session_state["nclex_presented_items"] = list(items)
-        # Reset one-at-a-time index for a new case/session
-        if "nclex_one_idx" in st.session_state:
-            st.session_state.nclex_one_idx = 0
-    else:
-        # Reuse the same presented list once established
-        pi = st.session_state.get("nclex_presented_items")
-        if isinstance(pi, list) and pi:
-            items = list(pi)
-        else:
-            st.session_state["nclex_presented_items"] = list(items)
-
-    st.caption(f"{len(items)} items loaded for this case.")
+        st.rerun(scope="fragment")
+    except TypeError:
+        st.rerun()
 
-    # Session defaults
-    if "practical_submitted" not in st.session_state:
-        st.session_state.practical_submitted = False
-    if "nclex_answers" not in st.session_state:
-        st.session_state.nclex_answers = {}
-    if "nclex_scored" not in st.session_state:
-        st.session_state.nclex_scored = None
-    if "nclex_finalized" not in st.session_state:
-        st.session_state.nclex_finalized = False
-    if "nclex_ai_explanations" not in st.session_state:
-        st.session_state.nclex_ai_explanations = {}  # qid -> text
 
-    # Reset NCLEX state when switching to a different case
-    # (Prevents "frozen" inputs when a prior case was finalized/locked.)
-    if str(st.session_state.get("nclex_case_id", "")).strip() != str(case_id).strip():
-        st.session_state["nclex_case_id"] = str(case_id).strip()
-        st.session_state.practical_submitted = False
-        st.session_state.nclex_answers = {}
-        st.session_state.nclex_scored = None
-        st.session_state.nclex_finalized = False
-        st.session_state.nclex_ai_explanations = {}
-        # Reset one-at-a-time index if it exists
-        if "nclex_one_idx" in st.session_state:
-            st.session_state.nclex_one_idx = 0
+@_st_fragment
+def _nclex_questions_fragment(*args, **kwargs):
+    """NCLEX question list (or the single current question) as an st.fragment.
 
+    Answering, Prev/Next and the per-question Save re-run only this function, not the whole
+    script. Submit / Reset / Save Attempt / Finalize live outside it and still trigger full reruns.
+    Timed as the "nclex_questions_fragment" span so it can be compared with rerun_total.
+    """
+    with perf_span("nclex_questions_fragment"):
+        _render_nclex_questions(*args, **kwargs)
 
-    # When finalized, lock inputs completely
-    disabled_inputs = bool(timer_lock or bool(st.session_state.get('nclex_finalized', False)) or bool(st.session_state.get('practical_submitted', False)))
 
-    one_at_a_time = bool(policy.get("one_question_at_a_time", False))
-    # In "one question at a time" mode, we keep a per-session index
+def _render_nclex_questions(case_id: str, items: list, features: dict, mode: str, disabled_inputs: bool, one_at_a_time: bool,
+                            shuffle_opts: bool, show_correct_after: bool, show_rationales_after: bool,
+                            student_username: str = "", case_title: str = "", start_number: int = 1):
     if one_at_a_time:
-        if "nclex_one_idx" not in st.session_state:
-            st.session_state.nclex_one_idx = 0
-        # Clamp index
-        st.session_state.nclex_one_idx = max(0, min(int(st.session_state.nclex_one_idx), max(0, len(items) - 1)))
-
-        # Show scenario trigger above each question (helps context without revealing the answer keys)
-        try:
-            case_obj = next((c for c in load_cases() if str(c.get("id","")).strip() == str(case_id).strip()), None)
-            if case_obj:
-                trig = build_scenario_trigger(case_obj)
-                if trig:
-                    st.markdown(trig)
-                    st.divider()
-        except Exception:
-            pass
-
         # Navigation
         cols_nav = st.columns([1,2,1])
         with cols_nav[0]:
             if st.button("⬅️ Prev", disabled=(disabled_inputs or st.session_state.nclex_one_idx <= 0), key="nclex_prev"):
                 st.session_state.nclex_one_idx = max(0, st.session_state.nclex_one_idx - 1)
-                st.rerun()
+                _rerun_fragment()
         with cols_nav[1]:
             st.caption(f"Question {st.session_state.nclex_one_idx + 1} of {len(items)}")
         with cols_nav[2]:
             if st.button("Next ➡️", disabled=(disabled_inputs or st.session_state.nclex_one_idx >= len(items) - 1), key="nclex_next"):
                 st.session_state.nclex_one_idx = min(len(items) - 1, st.session_state.nclex_one_idx + 1)
-                st.rerun()
+                _rerun_fragment()
 
         items_to_render = [items[st.session_state.nclex_one_idx]] if items else []
         start_number = st.session_state.nclex_one_idx + 1
     else:
         items_to_render = list(items)
-        start_number = 1
 
     # Render each item
     for display_i, item in enumerate(items_to_render, start=start_number):
@@ -4299,6 +6078,7 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
         qtype = item.get("type", "")
 
         st.markdown(fmt_nclex_header(item, display_i), unsafe_allow_html=True)
+        nclex_change_tracker().seen(qid)
         stem = item.get("stem", "")
         if stem:
             st.markdown(fmt_nclex_stem(stem), unsafe_allow_html=True)
@@ -4316,10 +6096,6 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
             prev = st.session_state.nclex_answers.get(qid)
             idx = opts.index(prev) if (prev in opts) else 0
             ans = st_radio_no_preselect("Select one", opts, prev, key=key, disabled=disabled_inputs)
-            try:
-                track_nclex_change(qid, prev, ans)
-            except Exception:
-                pass
             try:
                 track_nclex_change(qid, prev, ans)
             except Exception:
@@ -4343,10 +6119,6 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
                 key=key,
                 disabled=disabled_inputs
             )
-            try:
-                track_nclex_change(qid, prev, ans)
-            except Exception:
-                pass
             try:
                 track_nclex_change(qid, prev, ans)
             except Exception:
@@ -4511,25 +6283,213 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
                 )
                 st.success("Saved.")
 
-        # Lightweight feedback after submit (existing behavior)
-        if st.session_state.practical_submitted and show_correct_after:
-            correct = item.get("correct", None)
-            if qtype == "cloze":
-                correct = item.get("correct_text") or correct
-            st.markdown("**✅ Correct answer:**")
-            _render_nclex_correct_pretty(correct)
-            if show_rationales_after:
-                rat = item.get("rationale", "")
-                if rat:
-                    st.markdown("**Explanation:**")
-                    st.write(rat)
-        st.divider()
+        # Lightweight feedback after submit (existing behavior)
+        if st.session_state.practical_submitted and show_correct_after:
+            correct = item.get("correct", None)
+            if qtype == "cloze":
+                correct = item.get("correct_text") or correct
+            st.markdown("**✅ Correct answer:**")
+            _render_nclex_correct_pretty(correct)
+            if show_rationales_after:
+                rat = item.get("rationale", "")
+                if rat:
+                    st.markdown("**Explanation:**")
+                    st.write(rat)
+        st.divider()
+
+
+def _render_nclex_adaptive_step(case_id: str, items: list, pool: list, policy: dict, features: dict, mode: str,
+                                disabled_inputs: bool, shuffle_opts: bool, student_username: str = "", case_title: str = ""):
+    state = st.session_state.get("nclex_cat") or {}
+    n_done = len(state.get("administered") or [])
+    if state.get("done") or len(items) <= n_done:
+        st.success(f"Adaptive section complete after {n_done} questions. Submit the practical section to score it.")
+        return
+    max_items = nclex_items_per_case(policy, case_id)
+    st.caption(f"Adaptive mode: question {n_done + 1} (at most {max_items}). "
+               "Questions follow your answers; confirmed answers cannot be changed.")
+    item = items[-1]
+    qid = str(item.get("id", ""))
+    _render_nclex_questions(case_id, [item], features, mode, disabled_inputs, False, shuffle_opts, False, False,
+                            student_username, case_title, start_number=n_done + 1)
+    if st.button("Confirm answer ➡️", key=f"nclex_cat_confirm_{qid}", disabled=disabled_inputs):
+        ans = st.session_state.nclex_answers.get(qid)
+        if ans is None or ans == "" or ans == [] or ans == {}:
+            st.warning("Answer the question before confirming.")
+            return
+        d = nclex_score_item(item, ans, policy, features)
+        with perf_span("nclex_cat_step"):
+            table = nclex_cat_table(case_id, pool, policy)
+            nclex_cat.record_response(
+                table, state, qid, int(d.get("points", 0)) >= int(d.get("max", 1) or 1),
+                min_items=int(policy.get("adaptive_min_items", 10) or 10),
+                max_items=max_items,
+                se_target=float(policy.get("adaptive_se_target", 0.50) or 0.50),
+            )
+        state["model"] = nclex_cat_model(policy)
+        st.session_state["nclex_cat"] = state
+        autosave_draft(features, student_username, case_id, {"kind": "nclex_cat_step", "qid": qid, "mode": mode})
+        st.rerun()
+
+
+def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: dict, mode: str, timer_lock: bool, student_username: str = "", case_title: str = ""):
+    """
+    Renders NCLEX-style practice AFTER A–E completion only.
+    Adds:
+    - Per-question "Save" (writes to autosave file; helps against crashes)
+    - Finalize + Review page that shows correct/wrong + rationale (and optional AI explanation)
+    """
+    if not policy.get("enabled", False):
+        return
+
+    vis = policy.get("mode_visibility", {"Practice": True, "Exam": True})
+    if not bool(vis.get(mode, True)):
+        return
+
+    # Policy defaults (safe if older nclex_policy.json is missing keys)
+    show_correct_after = False  # per-question feedback disabled; review only after final submit
+    show_rationales_after = False  # per-question feedback disabled; review only after final submit
+    shuffle_opts = bool(policy.get("shuffle_options", True))
+    show_review_after_finalize = bool(policy.get("show_review_after_finalize", True))
+    ai_explain_after_finalize = bool(policy.get("ai_explanations_after_finalize", True))
+
+    st.divider()
+    st.subheader("🧾 Practical (NCLEX-Style)")
+
+    case_pack = (nclex.get("cases") or {}).get(case_id)
+    if not case_pack:
+        st.error(
+            f"No NCLEX-style practice items found for this case ID in nclex_items.json.\n\n"
+            f"Looking for case id: {case_id}"
+        )
+        st.info("Admin: open ✅ NCLEX Validator to auto-fix missing packs (IDs).")
+        return
+
+    items = list(case_pack.get("items", []) or [])
+    enabled_types = (policy.get("enabled_types") or {})
+    items = [it for it in items if enabled_types.get(it.get("type"), True)]
+
+    if not items:
+        st.info("This case has an NCLEX pack, but no items are inside (or all types are disabled).")
+        return
+
+    # Apply items_per_case + optional Admin-controlled active set rotation
+    items_per_case = nclex_items_per_case(policy, case_id)
+    adaptive = bool(policy.get("adaptive_enabled", False))
+    pool = list(items)
+    try:
+        if adaptive:
+            pass  # adaptive mode picks from the whole pack; items_per_case caps the test length
+        elif bool(policy.get("rotation_enabled", False)):
+            qids = nclex_active_qids(case_id)
+            if qids:
+                by_id = {str(it.get("id", "")): it for it in items}
+                ordered = [by_id[q] for q in qids if q in by_id]
+                remaining = [it for it in items if str(it.get("id", "")) not in set(qids)]
+                items = (ordered + remaining)[:items_per_case]
+            else:
+                # No active set yet: fall back to first N
+                items = items[:items_per_case]
+        else:
+            items = items[:items_per_case]
+    except Exception:
+        items = items[:items_per_case]
+
+    # Randomize order per student/session (optional) AFTER rotation is applied
+    seed_base = ""
+    try:
+        if bool(policy.get("randomize_per_student_session", False)) and not adaptive:
+            seed_base = f"{student_username}|{case_id}|{st.session_state.get('attempt_started_epoch') or ''}|{mode}"
+            items = sorted(list(items), key=lambda it: hashlib.sha256((seed_base + '||' + str(it.get('id',''))).encode('utf-8')).hexdigest())
+    except Exception:
+        pass
+
+    # Persist the presented items order for stable scoring/review (prevents missing/out-of-order questions on reruns).
+    # Only the ordered qids live in session state; items are resolved against the shared bank.
+    st.session_state.pop("nclex_presented_items", None)  # legacy: full item copies per session
+    if adaptive:
+        items = nclex_cat_presented_items(case_id, pool, policy)
+    elif st.session_state.get("nclex_presented_case_id") != str(case_id):
+        st.session_state["nclex_presented_case_id"] = str(case_id)
+        st.session_state["nclex_presented_qids"] = tuple(str(it.get("id", "")) for it in items)
+        # Reset one-at-a-time index for a new case/session
+        if "nclex_one_idx" in st.session_state:
+            st.session_state.nclex_one_idx = 0
+    else:
+        # Reuse the same presented list once established
+        pi = get_presented_nclex_items()
+        if pi:
+            items = pi
+        else:
+            st.session_state["nclex_presented_qids"] = tuple(str(it.get("id", "")) for it in items)
+
+    if not adaptive:
+        st.caption(f"{len(items)} items loaded for this case.")
+
+    # Session defaults
+    if "practical_submitted" not in st.session_state:
+        st.session_state.practical_submitted = False
+    if "nclex_answers" not in st.session_state:
+        st.session_state.nclex_answers = {}
+    if "nclex_scored" not in st.session_state:
+        st.session_state.nclex_scored = None
+    if "nclex_finalized" not in st.session_state:
+        st.session_state.nclex_finalized = False
+    if "nclex_ai_explanations" not in st.session_state:
+        st.session_state.nclex_ai_explanations = {}  # qid -> text
+
+    # Reset NCLEX state when switching to a different case
+    # (Prevents "frozen" inputs when a prior case was finalized/locked.)
+    if str(st.session_state.get("nclex_case_id", "")).strip() != str(case_id).strip():
+        st.session_state["nclex_case_id"] = str(case_id).strip()
+        st.session_state.practical_submitted = False
+        st.session_state.nclex_answers = {}
+        st.session_state.nclex_track = AnswerChangeTracker()
+        st.session_state.nclex_scored = None
+        st.session_state.nclex_finalized = False
+        st.session_state.nclex_ai_explanations = {}
+        # Reset one-at-a-time index if it exists
+        if "nclex_one_idx" in st.session_state:
+            st.session_state.nclex_one_idx = 0
+
+
+    # When finalized, lock inputs completely
+    disabled_inputs = bool(timer_lock or bool(st.session_state.get('nclex_finalized', False)) or bool(st.session_state.get('practical_submitted', False)))
+
+    one_at_a_time = bool(policy.get("one_question_at_a_time", False))
+    # In "one question at a time" mode, we keep a per-session index
+    if one_at_a_time:
+        if "nclex_one_idx" not in st.session_state:
+            st.session_state.nclex_one_idx = 0
+        # Clamp index
+        st.session_state.nclex_one_idx = max(0, min(int(st.session_state.nclex_one_idx), max(0, len(items) - 1)))
+
+        # Show scenario trigger above each question (helps context without revealing the answer keys)
+        try:
+            case_obj = next((c for c in load_cases() if str(c.get("id","")).strip() == str(case_id).strip()), None)
+            if case_obj:
+                trig = build_scenario_trigger(case_obj)
+                if trig:
+                    st.markdown(trig)
+                    st.divider()
+        except Exception:
+            pass
+
+    if adaptive:
+        # One question at a time; "Confirm answer" scores it and picks the next one (full rerun)
+        _render_nclex_adaptive_step(case_id, items, pool, policy, features, mode, disabled_inputs, shuffle_opts,
+                                    student_username, case_title)
+    else:
+        # Questions re-run on their own (st.fragment); only the controls below trigger full reruns.
+        _nclex_questions_fragment(case_id, items, features, mode, disabled_inputs, one_at_a_time, shuffle_opts,
+                                  show_correct_after, show_rationales_after, student_username, case_title)
 
     # Submit + score + finalize controls
     col1, col2, col3 = st.columns([1, 1, 2])
 
+    cat_pending = adaptive and not bool((st.session_state.get("nclex_cat") or {}).get("done"))
     with col1:
-        if st.button("✅ Submit Practical Section", disabled=(timer_lock or bool(st.session_state.get('practical_submitted', False)) or bool(st.session_state.get('nclex_finalized', False)))):
+        if st.button("✅ Submit Practical Section", disabled=(timer_lock or cat_pending or bool(st.session_state.get('practical_submitted', False)) or bool(st.session_state.get('nclex_finalized', False)))):
             st.session_state.practical_submitted = True
             st.session_state["attempt_saved"] = False
             st.session_state["show_save_attempt"] = True
@@ -4537,7 +6497,7 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
             score_details = []
             total_points = 0
             total_max = 0
-            presented_items = list((st.session_state.get("nclex_presented_items") or items or []) or [])
+            presented_items = get_presented_nclex_items(items)
             for item in presented_items:
                 qid = item.get("id")
                 ans = st.session_state.nclex_answers.get(qid)
@@ -4551,12 +6511,15 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
                 "total_max": total_max,
                 "details": score_details,
             }
+            if adaptive:
+                st.session_state.nclex_scored["adaptive"] = nclex_cat_summary()
             st.rerun()
 
     with col2:
         if st.button("↩ Reset Practical Answers", disabled=(disabled_inputs or bool(st.session_state.get('nclex_finalized', False)))):
             st.session_state.practical_submitted = False
             st.session_state.nclex_answers = {}
+            st.session_state.pop("nclex_cat", None)
             st.session_state.nclex_scored = None
             st.session_state.nclex_ai_explanations = {}
             st.session_state.nclex_finalized = False
@@ -4574,7 +6537,9 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
     if st.session_state.get("nclex_scored") and st.session_state.get("show_save_attempt", False):
         if not st.session_state.get("attempt_saved", False):
             if st.button("💾 Save Attempt", disabled=(locked_out or timer_lock), key="save_attempt_after_nclex"):
-                save_attempt(build_attempt_record_from_state(case_id))
+                _rec = build_attempt_record_from_state(case_id)
+                save_attempt(_rec)
+                flush_nclex_research_record(case_id, _rec)
                 st.session_state["attempt_saved"] = True
                 st.success("Saved to attempts_log.jsonl")
                 st.rerun()
@@ -4587,6 +6552,7 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
             if st.button("🏁 End Practical (Finalize)", disabled=(timer_lock or bool(st.session_state.get("nclex_finalized", False)))):
                 st.session_state.nclex_finalized = True
                 st.session_state.practical_submitted = True
+                flush_nclex_research_record(case_id)
                 st.rerun()
         with cB:
             if st.session_state.nclex_finalized:
@@ -4618,7 +6584,9 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
                 "Be concise (<= 120 words). Use nursing safety and prioritization language."
             )
 
-            presented_items = list((st.session_state.get("nclex_presented_items") or items or []) or [])
+            presented_items = get_presented_nclex_items(items)
+            # Pre-generated explanations (admin batch job) are served without an AI call
+            ai_store = load_nclex_ai_explanations() if ai_explain_after_finalize else {}
             for qi, item in enumerate(presented_items, start=1):
                 qid = str(item.get("id", ""))
                 d = detail_map.get(qid, {})
@@ -4646,7 +6614,11 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
 
                     if ai_explain_after_finalize:
                         # Only run AI explanation if AI key is available (avoid breaking exam flow)
-                        if qid in st.session_state.nclex_ai_explanations:
+                        cached_txt = get_cached_nclex_ai_explanation(item, ai_store)
+                        if cached_txt and qid not in st.session_state.nclex_ai_explanations:
+                            st.markdown("**AI explanation:**")
+                            st.write(cached_txt)
+                        elif qid in st.session_state.nclex_ai_explanations:
                             st.markdown("**AI explanation:**")
                             st.write(st.session_state.nclex_ai_explanations[qid])
                         else:
@@ -4660,16 +6632,22 @@ def render_nclex_practical(case_id: str, policy: dict, nclex: dict, features: di
                                         f"Student answered: {student_ans}\n"
                                         "Write an explanation."
                                     )
-                                    with st.spinner("Generating AI explanation..."):
-                                        txt = openai_responses_call(
-                                            (admin_settings.get("ai_model") or "gpt-5.2").strip() or "gpt-5.2",
-                                            AI_SYSTEM_RATIONALE_PROMPT,
-                                            user_prompt,
-                                        )
+                                    queue_box = st.empty()
+                                    try:
+                                        with st.spinner("Generating AI explanation..."):
+                                            txt = openai_responses_call(
+                                                (admin_settings.get("ai_model") or "gpt-5.2").strip() or "gpt-5.2",
+                                                AI_SYSTEM_RATIONALE_PROMPT,
+                                                user_prompt,
+                                                on_queue=ai_queue_notice(queue_box),
+                                            )
+                                    finally:
+                                        queue_box.empty()
                                     st.session_state.nclex_ai_explanations[qid] = txt
                                     st.rerun()
                                 except Exception as e:
                                     st.warning(f"AI explanation unavailable: {e}")
+@perf_timed()
 def autosave_draft(features: dict, student_username: str, case_id: str, payload: dict):
     if not features.get("autosave_enabled", False):
         return
@@ -4689,6 +6667,7 @@ def autosave_draft(features: dict, student_username: str, case_id: str, payload:
         payload["nclex_answers"] = st.session_state.get("nclex_answers", {}) or {}
         payload["practical_submitted"] = bool(st.session_state.get("practical_submitted", False))
         payload["nclex_scored"] = st.session_state.get("nclex_scored")
+        payload["nclex_cat"] = st.session_state.get("nclex_cat")
         payload["nclex_finalized"] = bool(st.session_state.get("nclex_finalized", False))
         payload["intake"] = st.session_state.get("intake", {}) or {}
         payload["intake_score"] = int(st.session_state.get("intake_score", 0) or 0)
@@ -4707,6 +6686,7 @@ def autosave_draft(features: dict, student_username: str, case_id: str, payload:
         pass
 
 
+@perf_timed()
 def load_last_autosave(student_username: str, case_id: str):
     """Return the latest autosave draft dict for this student+case (or None)."""
     if not AUTOSAVE_DRAFTS_PATH.exists():
@@ -4806,6 +6786,62 @@ def delete_all_autosaves_for_student(student_username: str) -> int:
     return removed
 
 
+def compact_autosave_drafts(archive: bool = False) -> tuple[bool, str]:
+    """Keep only the latest autosave draft per student+case (what load_last_autosave returns).
+
+    Malformed lines are kept. Lines appended while compacting are carried over before the
+    atomic replace, so it is safe to run next to a live server (intended for nightly cron).
+    archive=True first stores the full pre-compaction file, compressed, in BACKUP_DIR.
+    """
+    if not AUTOSAVE_DRAFTS_PATH.exists():
+        return False, "No autosave_drafts.jsonl to compact."
+    try:
+        before = AUTOSAVE_DRAFTS_PATH.stat().st_size
+        arch_msg = ""
+        if archive:
+            BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+            stats = compress_files([AUTOSAVE_DRAFTS_PATH],
+                                   BACKUP_DIR / f"autosave_drafts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+                                   archive_codec())
+            arch_msg = f" Archived first: {stats['path'].name} — {describe_stats(stats)}."
+        latest = {}  # (student, case) -> line; dict keeps first-seen order, value is the last draft
+        other = []
+        total = 0
+        with open(AUTOSAVE_DRAFTS_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                s = (line or "").strip()
+                if not s:
+                    continue
+                total += 1
+                try:
+                    rec = json.loads(s)
+                except Exception:
+                    other.append(s)
+                    continue
+                key = (str(rec.get("student_username", "")).strip(), str(rec.get("caseId", "")).strip())
+                if not all(key) or not isinstance(rec.get("draft"), dict):
+                    other.append(s)
+                    continue
+                latest[key] = s
+            read_upto = f.tell()
+
+        tmp = AUTOSAVE_DRAFTS_PATH.with_suffix(".jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as out:
+            for s in other + list(latest.values()):
+                out.write(s + "\n")
+            with open(AUTOSAVE_DRAFTS_PATH, "r", encoding="utf-8") as f:
+                f.seek(read_upto)
+                tail = f.read()
+            if tail:
+                out.write(tail if tail.endswith("\n") else tail + "\n")
+        os.replace(tmp, AUTOSAVE_DRAFTS_PATH)
+        after = AUTOSAVE_DRAFTS_PATH.stat().st_size
+        kept = len(other) + len(latest)
+        return True, f"Compacted autosaves: {total} → {kept} lines ({before:,} → {after:,} bytes).{arch_msg}"
+    except Exception as e:
+        return False, f"Compaction failed: {e}"
+
+
 def load_exam_overrides() -> dict:
     d = load_json_safe(EXAM_OVERRIDES_PATH, {"students": {}})
     if not isinstance(d, dict):
@@ -4934,6 +6970,7 @@ def apply_exam_overrides_for_student_session(student_username: str):
         st.session_state["_last_seen_reset_token"] = token_int
 
 
+@perf_timed()
 def index_latest_autosaves_for_student(student_username: str):
     """Return dict(caseId -> latest draft dict) for a student. Best-effort; safe if file missing."""
     out = {}
@@ -5034,6 +7071,8 @@ def apply_restored_draft(draft: dict):
         st.session_state["nclex_answers"] = nclex_ans
         st.session_state["practical_submitted"] = bool(draft.get("practical_submitted", False))
         st.session_state["nclex_scored"] = draft.get("nclex_scored")
+        if isinstance(draft.get("nclex_cat"), dict):
+            st.session_state["nclex_cat"] = draft["nclex_cat"]
 
 
 
@@ -5084,6 +7123,7 @@ def nclex_autosave_now(features: dict, student_username: str, case_id: str, mode
 # =============================
 # UI
 # =============================
+perf_checkpoint("page_setup")
 st.set_page_config(page_title="ClinIQ Nurse Adult-NURS-Reason", layout="wide")
 _show_flash_success()
 
@@ -5164,6 +7204,7 @@ st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
 # =============================
 # Session initialization (safe)
 # =============================
+perf_checkpoint("auth_sidebar")
 if ("scores" not in st.session_state) or ("attempt_started_epoch" not in st.session_state) or ("answers" not in st.session_state):
     reset_attempt_state()
 
@@ -5250,19 +7291,28 @@ effective_admin = bool(is_admin and (not is_student))
 # UI: keep sidebar minimal (login + status); admin controls are shown in the top Settings page
 SHOW_ADMIN_PANELS_IN_SIDEBAR = False
 
+perf_set_page("student" if is_student else ("admin" if effective_admin else "anonymous"))
+
 # Apply student hardening (practice + exam) when a student is logged in.
 if is_student:
-    apply_student_hardening(st.session_state.get("student_profile") or {})
+    with perf_span("apply_student_hardening"):
+        apply_student_hardening(st.session_state.get("student_profile") or {})
 
 student_profile = st.session_state.get("student_profile")
 
 is_student_logged_in = bool(student_profile)
 
+# Sampled session-state size (feeds Settings → Session memory); cheap, at most once a minute
+record_session_memory_sample()
+
 # Required: student OR admin
 if not is_student_logged_in and not is_admin:
     st.warning("Please login as **Student** (sidebar).")
+    perf_finish()
     st.stop()
 
+perf_checkpoint("policies_sidebar_panels")
+
 
 # =============================
 # Research consent (students only, opt-in, no penalty to opt out)
@@ -5450,6 +7500,7 @@ if is_admin and IS_EXAM and SHOW_ADMIN_PANELS_IN_SIDEBAR:
 # =============================
 # Load cases
 # =============================
+perf_checkpoint("load_cases")
 if not CASES_PATH.exists():
     st.error("❌ cases.json not found in the same folder as app.py.")
     st.info("Fix: Put cases.json in this folder: " + str(BASE_DIR))
@@ -5884,7 +7935,14 @@ def _safe_iso_to_dt(s: str):
     except Exception:
         return None
 
-def _load_attempts_records(path: Path):
+@perf_timed()
+def _load_attempts_records(path: Path, **segment_filters):
+    """All records from a JSONL file; for ATTEMPTS_PATH, from every attempts segment.
+
+    segment_filters (since/until/cases/cohorts/modes, include_archived) are passed to iter_attempts().
+    """
+    if path == ATTEMPTS_PATH:
+        return [r for r in iter_attempts(**segment_filters) if isinstance(r, dict)]
     records = []
     if not path.exists():
         return records
@@ -6017,7 +8075,7 @@ def _filter_attempts(attempts, *, systems_sel=None, cases_sel=None, student_q=""
         cid = _attempt_case_id(a)
         sys = _attempt_system(a)
         stu = _attempt_student(a)
-        ts = _safe_iso_to_dt(a.get("timestamp",""))
+        ts = _safe_iso_to_dt(_attempt_ts(a))
         total25 = _attempt_total_with_intake(a)
 
         if systems_sel and "All" not in systems_sel:
@@ -6053,14 +8111,12 @@ def admin_page_research_reports():
     st.header("📊 Research Reports (Admin)")
     st.caption("Filters + summary + exports. Read-only unless you click export.")
 
-    attempts = _load_attempts_records(ATTEMPTS_PATH)
-
     cases_list_all = get_cases_list()
     all_systems = sorted({safe_get_system(c) for c in cases_list_all}) or ["—"]
     all_cases = sorted({str(c.get("id","")).strip() for c in cases_list_all if str(c.get("id","")).strip()}) or ["—"]
-    # Include unknown values observed in attempts (legacy records)
-    all_systems = sorted(set(all_systems) | {(_attempt_system(a) or "—") for a in attempts})
-    all_cases = sorted(set(all_cases) | {(_attempt_case_id(a) or "—") for a in attempts})
+    # Include unknown values observed in attempts (legacy records) — from segment manifests, no record reads
+    all_systems = sorted(set(all_systems) | {(v or "—") for v in attempt_manifest_values("systems")})
+    all_cases = sorted(set(all_cases) | {(v or "—") for v in attempt_manifest_values("cases")})
 
     c1, c2, c3 = st.columns([2,2,2])
     with c1:
@@ -6088,6 +8144,13 @@ def admin_page_research_reports():
     with c8:
         score_max = st.number_input("Score max (/25)", min_value=0.0, max_value=25.0, value=25.0, step=0.5)
 
+    # Only open segments whose manifest can match the date/case filters
+    attempts = _load_attempts_records(
+        ATTEMPTS_PATH,
+        since=dt_start.isoformat() if dt_start else "",
+        until=dt_end.isoformat() if dt_end else "",
+        cases=[c for c in cases_sel if c not in ("All", "—")] if (cases_sel and "All" not in cases_sel and "—" not in cases_sel) else None,
+    )
     filtered = _filter_attempts(attempts, systems_sel=systems_sel, cases_sel=cases_sel, student_q=student_q, dt_start=dt_start, dt_end=dt_end, score_min=score_min, score_max=score_max)
 
     # Summary
@@ -6517,84 +8580,157 @@ def admin_page_attempt_search():
                 })
             st.dataframe(mini, width="stretch", hide_index=True)
 
+def _irt_row_columns(qid: str, params: dict) -> dict:
+    p = irt_item_params(qid, params=params)
+    return {
+        "irt_b": p.get("b", ""),
+        "irt_se": p.get("se_b", ""),
+        "irt_a": p.get("a", "") if p.get("model") == "2pl" else "",
+        "irt_outfit": p.get("outfit", ""),
+    }
+
 def admin_page_item_analytics():
     st.header("📈 Item Analytics (Admin)")
     st.caption("Ranks: most missed domains, unsafe patterns, most-wrong NCLEX items (only where item details exist).")
 
-    attempts = _load_attempts_records(ATTEMPTS_PATH)
-    all_systems = sorted({(_attempt_system(a) or "—") for a in attempts})
-    all_cases = sorted({(_attempt_case_id(a) or "—") for a in attempts})
+    # Filter choices come from segment manifests; attempts are read only by the sections that need them
+    all_systems = attempt_system_options()
+    all_cases = sorted({(c or "—") for c in attempt_manifest_values("cases")})
 
     c1, c2 = st.columns(2)
     with c1:
         systems_sel = st.multiselect("Systems", ["All"] + all_systems, default=["All"])
     with c2:
         cases_sel = st.multiselect("Cases", ["All"] + all_cases, default=["All"])
-
-    filtered = _filter_attempts(attempts, systems_sel=systems_sel, cases_sel=cases_sel)
-
-    # A) Most missed domains
-    st.subheader("Most missed rubric domains (A–E)")
-    doms = ["A","B","C","D","E"]
-    dom_stats = []
-    for d in doms:
-        vals = []
+    system_filtered = bool(systems_sel) and "All" not in systems_sel
+    case_filtered = bool(cases_sel) and "All" not in cases_sel
+    _loaded = {}
+
+    def _filtered_attempts() -> list:
+        if "attempts" not in _loaded:
+            seg_cases = [("" if c == "—" else c) for c in cases_sel] if case_filtered else None
+            _loaded["attempts"] = _filter_attempts(iter_attempts(cases=seg_cases), systems_sel=systems_sel, cases_sel=cases_sel)
+        return _loaded["attempts"]
+
+    show_rubric = st.toggle("Rubric-domain and unsafe-pattern tables", value=False, key="item_analytics_rubric_tables",
+                            help="These tables read every matching attempt.")
+    if show_rubric:
+        filtered = _filtered_attempts()
+        # A) Most missed domains
+        st.subheader("Most missed rubric domains (A–E)")
+        doms = ["A","B","C","D","E"]
+        dom_stats = []
+        for d in doms:
+            vals = []
+            for a in filtered:
+                sc = _attempt_domain_scores(a)
+                v = sc.get(d)
+                if isinstance(v,(int,float)):
+                    vals.append(float(v))
+            if vals:
+                avg = sum(vals)/len(vals)
+                dom_stats.append({"domain": d, "avg(/4)": round(avg,2), "missed(/4)": round(4-avg,2), "n": len(vals)})
+        dom_stats.sort(key=lambda r: (-r["missed(/4)"], r["domain"]))
+        st.dataframe(dom_stats if dom_stats else [{"note":"No domain score data found in filtered attempts."}], width="stretch", hide_index=True)
+
+        # B) Unsafe patterns
+        st.subheader("Unsafe patterns (by domain)")
+        unsafe_totals = {}
         for a in filtered:
-            sc = _attempt_domain_scores(a)
-            v = sc.get(d)
-            if isinstance(v,(int,float)):
-                vals.append(float(v))
-        if vals:
-            avg = sum(vals)/len(vals)
-            dom_stats.append({"domain": d, "avg(/4)": round(avg,2), "missed(/4)": round(4-avg,2), "n": len(vals)})
-    dom_stats.sort(key=lambda r: (-r["missed(/4)"], r["domain"]))
-    st.dataframe(dom_stats if dom_stats else [{"note":"No domain score data found in filtered attempts."}], width="stretch", hide_index=True)
-
-    # B) Unsafe patterns
-    st.subheader("Unsafe patterns (by domain)")
-    unsafe_totals = {}
-    for a in filtered:
-        uc = _attempt_unsafe_counts(a)
-        for k, v in (uc or {}).items():
-            try:
-                unsafe_totals[k] = unsafe_totals.get(k, 0) + int(v or 0)
-            except Exception:
-                continue
-    unsafe_rows = [{"domain": k, "unsafe_count": v} for k,v in sorted(unsafe_totals.items(), key=lambda kv: (-kv[1], kv[0]))]
-    st.dataframe(unsafe_rows if unsafe_rows else [{"note":"No unsafe_counts found in filtered attempts."}], width="stretch", hide_index=True)
+            uc = _attempt_unsafe_counts(a)
+            for k, v in (uc or {}).items():
+                try:
+                    unsafe_totals[k] = unsafe_totals.get(k, 0) + int(v or 0)
+                except Exception:
+                    continue
+        unsafe_rows = [{"domain": k, "unsafe_count": v} for k,v in sorted(unsafe_totals.items(), key=lambda kv: (-kv[1], kv[0]))]
+        st.dataframe(unsafe_rows if unsafe_rows else [{"note":"No unsafe_counts found in filtered attempts."}], width="stretch", hide_index=True)
 
     # C) NCLEX most wrong
     st.subheader("Most frequently wrong NCLEX items")
-    wrong = {}
-    seen = {}
-    for a in filtered:
-        det = _attempt_nclex_details(a)
-        for d in det:
-            qid = d.get("qid")
-            if not qid:
-                continue
-            seen[qid] = seen.get(qid, 0) + 1
-            if not bool(d.get("correct", False)):
-                wrong[qid] = wrong.get(qid, 0) + 1
-
+    stats_mode = st.radio(
+        "Statistics",
+        ["Fast (running statistics)", "Exact (full recompute)"],
+        horizontal=True,
+        key="item_analytics_stats_mode",
+        help="Fast reads per-item sums kept up to date at every save (point-biserial is approximate). "
+             "Exact rescans every attempt; use it for publication numbers.",
+    )
     rows = []
-    for qid, n_seen in seen.items():
-        n_wrong = wrong.get(qid, 0)
-        it = NCLEX_BY_QID.get(qid, {})
-        qnum_str = nclex_qnum_from_id(qid)
-        try:
-            qnum = int(qnum_str)
-        except Exception:
-            qnum = 9999
-        rows.append({
-            "q#": f"Q{qnum}" if qnum != 9999 else qnum_str,
-            "qid": qid,
-            "wrong_%": round((n_wrong/n_seen)*100, 1) if n_seen else 0.0,
-            "n_seen": n_seen,
-            "difficulty": it.get("difficulty",""),
-            "type": it.get("type",""),
-            "stem": (it.get("stem","")[:110] + "…") if it.get("stem") and len(it.get("stem",""))>110 else it.get("stem",""),
-        })
+    irt_params = load_irt_params()
+    fast = stats_mode.startswith("Fast") and not system_filtered
+    if stats_mode.startswith("Fast") and system_filtered:
+        st.caption("Running statistics are kept per item (and so per case), not per attempt system: "
+                   "with a system filter these numbers are computed exactly from the matching attempts.")
+    if fast:
+        # O(items): per-qid sums from nclex_item_stats.json; every item belongs to one case, so the case filter is exact
+        case_ok = set(cases_sel) if case_filtered else None
+        for qid, e in (load_item_stats().get("items") or {}).items():
+            summ = nclex_item_stats.item_summary(e)
+            if case_ok is not None and (summ["case_id"] or "—") not in case_ok:
+                continue
+            if not summ["n"]:
+                continue
+            it = NCLEX_BY_QID.get(qid, {})
+            qnum_str = nclex_qnum_from_id(qid)
+            try:
+                qnum = int(qnum_str)
+            except Exception:
+                qnum = 9999
+            rows.append({
+                "q#": f"Q{qnum}" if qnum != 9999 else qnum_str,
+                "qid": qid,
+                "wrong_%": summ["wrong_pct"],
+                "n_seen": summ["n"],
+                "p": round(summ["p"], 3) if summ["p"] is not None else "",
+                "r_pb≈": round(summ["r_pb"], 3) if summ["r_pb"] is not None else "",
+                "top_options": summ["top_options"],
+                "difficulty": it.get("difficulty",""),
+                **_irt_row_columns(qid, irt_params),
+                "type": it.get("type",""),
+                "stem": (it.get("stem","")[:110] + "…") if it.get("stem") and len(it.get("stem",""))>110 else it.get("stem",""),
+            })
+    else:
+        per_item = {}
+        for a in _filtered_attempts():
+            scores = {}
+            for d in _attempt_nclex_details(a):
+                qid = d.get("qid")
+                if not qid:
+                    continue
+                mx = _safe_float(d.get("max"), default=1.0) or 1.0
+                scores[qid] = 1 if (_safe_float(d.get("points"), default=0.0) >= mx) else 0
+            total = sum(scores.values())
+            for qid, x in scores.items():
+                per_item.setdefault(qid, ([], []))
+                per_item[qid][0].append(x)
+                per_item[qid][1].append(float(total - x))
+        for qid, (xs, rest) in per_item.items():
+            n_seen = len(xs)
+            n_wrong = n_seen - sum(xs)
+            r_pb = _point_biserial(xs, rest)
+            it = NCLEX_BY_QID.get(qid, {})
+            qnum_str = nclex_qnum_from_id(qid)
+            try:
+                qnum = int(qnum_str)
+            except Exception:
+                qnum = 9999
+            rows.append({
+                "q#": f"Q{qnum}" if qnum != 9999 else qnum_str,
+                "qid": qid,
+                "wrong_%": round((n_wrong/n_seen)*100, 1) if n_seen else 0.0,
+                "n_seen": n_seen,
+                "p": round(sum(xs)/n_seen, 3) if n_seen else "",
+                "r_pb": round(r_pb, 3) if r_pb is not None else "",
+                "difficulty": it.get("difficulty",""),
+                **_irt_row_columns(qid, irt_params),
+                "type": it.get("type",""),
+                "stem": (it.get("stem","")[:110] + "…") if it.get("stem") and len(it.get("stem",""))>110 else it.get("stem",""),
+            })
+    if not stats_mode.startswith("Fast"):
+        if st.button("Rebuild running statistics from the log", key="item_stats_rebuild_btn"):
+            ok, msg = rebuild_item_stats()
+            (st.success if ok else st.error)(msg)
     # Show in question order (Q1..Qn)
     rows.sort(key=lambda r: (int(str(r.get("q#","Q9999")).lstrip("Q").strip() or 9999), -r["wrong_%"], -r["n_seen"]))
     st.dataframe(rows[:50] if rows else [{"note":"No NCLEX per-item details found (older attempts may not include nclex.details)."}], width="stretch", hide_index=True)
@@ -6602,12 +8738,38 @@ def admin_page_item_analytics():
     if rows:
         st.download_button("⬇️ Download NCLEX item analytics CSV", data=_to_csv_bytes(rows, list(rows[0].keys())), file_name="nclex_item_analytics.csv", mime="text/csv")
 
+    # D) IRT calibration (irt_b / irt_a columns above come from the last run)
+    with st.expander("IRT calibration (Rasch / 2PL)", expanded=False):
+        models = irt_params.get("models") or {}
+        if models:
+            st.dataframe([
+                {"model": m, "items": len(f.get("items") or {}), "responses": f.get("n_responses", 0),
+                 "attempts": f.get("n_persons", 0), "theta_sd": f.get("theta_sd", 1.0), "converged": f.get("converged", False),
+                 "seconds": f.get("seconds", ""), "calibrated_at": f.get("calibrated_at", "")}
+                for m, f in sorted(models.items())
+            ], width="stretch", hide_index=True)
+        else:
+            st.info("Not calibrated yet. irt_b is the item difficulty in logits (higher = harder); irt_a is the 2PL discrimination.")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            irt_model = st.selectbox("Model", list(IRT_MODELS), format_func=lambda m: "2PL" if m == "2pl" else "Rasch", key="irt_model")
+        with c2:
+            irt_min_n = st.number_input("Min responses per item", min_value=5, max_value=1000, value=20, step=5, key="irt_min_n")
+        with c3:
+            irt_archived = st.checkbox("Include archived attempts", value=False, key="irt_include_archived")
+        if st.button("Calibrate now", key="irt_calibrate_btn"):
+            with st.spinner("Calibrating…"):
+                ok, msg = calibrate_nclex_irt(irt_model, include_archived=irt_archived, min_responses=int(irt_min_n))
+            (st.success if ok else st.error)(msg)
+
 def admin_page_data_tools():
     st.header("🧹 Data Tools (Admin)")
     st.caption("Backup + safe delete (with preview, typed confirmation, audit log).")
 
     attempts = _load_attempts_records(ATTEMPTS_PATH)
-    st.write(f"Attempts file: {ATTEMPTS_PATH.name} • Records: {len(attempts)}")
+    st.write(f"Attempts log: {len(list_attempt_segments())} segment(s) • Records: {len(attempts)}")
+    with st.expander("Attempts log segments", expanded=False):
+        st.dataframe(attempt_segments_summary(), width="stretch", hide_index=True)
 
     # Backup download
     st.subheader("Backup")
@@ -6685,19 +8847,16 @@ def admin_page_data_tools():
             st.stop()
 
         # Backup file on disk (copy; do NOT move)
-        import shutil
         backup_path = BASE_DIR / f"attempts_backup_before_delete_{utc_now_iso().replace(':','-')}.jsonl"
         try:
-            shutil.copy2(ATTEMPTS_PATH, backup_path)
+            write_all_attempts_jsonl(backup_path)
         except Exception as e:
             st.error(f"Could not create on-disk backup: {e}")
             st.stop()
 
         # Write new attempts file
         try:
-            with ATTEMPTS_PATH.open("w", encoding="utf-8") as f:
-                for a in keep:
-                    f.write(json.dumps(a, ensure_ascii=False) + "\n")
+            replace_all_attempts(keep)
             st.success(f"Deleted {len(to_delete)} records. Backup saved as {backup_path.name}.")
             st.rerun()
         except Exception as e:
@@ -6745,6 +8904,20 @@ def render_nclex_rotation_admin_ui(pol: dict):
     cases_list = get_cases_list()
     case_ids_all = sorted([str(c.get("id", "")).strip() for c in cases_list if str(c.get("id", "")).strip()])
 
+    with st.expander("🧩 Generate active sets for ALL cases (blueprint-constrained)", expanded=False):
+        st.caption("One new set per case: client-need blueprint and difficulty mix from nclex_policy.json, enabled types only, "
+                   "items from the most recent sets avoided where the bank allows. All cases are saved in one write.")
+        _mix = pol.get("difficulty_mix") or {}
+        st.write("Blueprint: " + ", ".join(f"{c} {float(v):.0%}" for c, v in (pol.get("client_need_blueprint") or {}).items())
+                 + " • Difficulty: " + ", ".join(f"{d} {float(v):.0%}" for d, v in _mix.items()))
+        bulk_window = st.number_input("Avoid items from the last K sets", min_value=0, max_value=50,
+                                      value=int(pol.get("rotation_history_window", 3) or 0), step=1, key="rot_bulk_window")
+        if st.button("🧩 Generate for all cases", key="rot_bulk_btn"):
+            ok, msg, rows = generate_all_active_sets(int(bulk_window))
+            (st.success if ok else st.error)(msg)
+            if rows:
+                st.dataframe(rows, width="stretch", hide_index=True)
+
     cid_pick = st.selectbox("Select case to manage", options=[""] + case_ids_all, index=0, key="rot_case_pick_main")
     if not cid_pick:
         st.info("Pick a case to view bank size, current active set, generate a new active set, or download history.")
@@ -6795,39 +8968,23 @@ def render_nclex_rotation_admin_ui(pol: dict):
         by_case[cid_pick]["generated_at"] = now_ts
         by_case[cid_pick]["seed"] = rnd_seed
 
-        hist = by_case[cid_pick].setdefault("history", [])
-        if isinstance(hist, list):
-            hist.append({"generated_at": now_ts, "seed": rnd_seed, "count": len(new_qids), "qids": list(new_qids)})
-
         active_sets["by_case"] = by_case
         save_nclex_active_sets(active_sets)
+        append_rotation_history([{"case_id": cid_pick, "qids": new_qids, "generated_at": now_ts, "seed": rnd_seed}])
         st.success("Generated and saved a new active set.")
         st.rerun()
 
-    # Download history
-    hist = (by_case.get(cid_pick) or {}).get("history") or []
-    if isinstance(hist, list) and hist:
+    # Download history (served from nclex_rotation_history.jsonl)
+    hist = load_rotation_history(cid_pick)
+    if hist:
         with st.expander("📜 Rotation history", expanded=False):
             st.write(f"History entries: {len(hist)}")
             # show last 5
             for h in hist[-5:][::-1]:
                 st.write(h.get("generated_at",""), "|", h.get("count",""), "items")
-            # download CSV
-            import csv as _csv
-            import io as _io
-            out = _io.StringIO()
-            w = _csv.DictWriter(out, fieldnames=["generated_at","count","seed","qids_json"])
-            w.writeheader()
-            for h in hist:
-                w.writerow({
-                    "generated_at": h.get("generated_at",""),
-                    "count": h.get("count",""),
-                    "seed": h.get("seed",""),
-                    "qids_json": json.dumps(h.get("qids", []), ensure_ascii=False),
-                })
             st.download_button(
                 "⬇️ Download rotation history (CSV)",
-                data=out.getvalue().encode("utf-8"),
+                data=rotation_history_csv_bytes(cid_pick),
                 file_name=f"rotation_history_{cid_pick}.csv",
                 mime="text/csv",
                 key="dl_rot_hist_main"
@@ -7275,6 +9432,96 @@ def admin_page_settings():
                     st.rerun()
 
 
+    # --- Bulk provisioning ---
+    with st.expander("📦 Bulk Student Provisioning (large cohorts: CSV / Excel)", expanded=False):
+        st.caption("For hundreds or thousands of accounts: rows are streamed from the file, saved to students.json in one write, and the credential documents are built in the background.")
+        bulk_up = st.file_uploader("Upload CSV or Excel (.xlsx)", type=["csv", "xlsx"], key="bulk_students_upload_main")
+        if bulk_up is not None:
+            bulk_bytes = bulk_up.getvalue()
+            bulk_name = str(getattr(bulk_up, "name", "upload.csv"))
+            bulk_sheet = ""
+            if bulk_name.lower().endswith(".xlsx"):
+                try:
+                    from openpyxl import load_workbook
+                    _wb = load_workbook(filename=io.BytesIO(bulk_bytes), read_only=True)
+                    bulk_sheet = st.selectbox("Sheet", _wb.sheetnames, index=0, key="bulk_students_sheet_main")
+                except Exception as e:
+                    st.error(f"Failed to read Excel: {e}")
+            bulk_cols = [h for h in read_student_import_header(bulk_bytes, bulk_name, bulk_sheet) if h]
+            if not bulk_cols:
+                st.warning("Could not find a header row in the file.")
+            else:
+                cb1, cb2 = st.columns(2)
+                with cb1:
+                    b_name = st.selectbox("Student name column", bulk_cols, index=0, key="bulk_students_namecol_main")
+                    b_user = st.selectbox("Username column (optional)", ["(none)"] + bulk_cols, index=0, key="bulk_students_usercol_main")
+                with cb2:
+                    b_id = st.selectbox("Student ID column (optional)", ["(none)"] + bulk_cols, index=0, key="bulk_students_idcol_main")
+                    b_cohort = st.selectbox("Cohort column (optional)", ["(none)"] + bulk_cols, index=0, key="bulk_students_cohortcol_main")
+                cb3, cb4, cb5 = st.columns(3)
+                with cb3:
+                    b_prefix = st.text_input("Username prefix (when no username column)", value="student", key="bulk_students_prefix_main").strip() or "student"
+                with cb4:
+                    b_start = st.number_input("Starting number", min_value=1, max_value=9999999, value=1, step=1, key="bulk_students_start_main")
+                with cb5:
+                    b_pwlen = st.slider("Password length", min_value=6, max_value=18, value=10, step=1, key="bulk_students_pwlen_main")
+                b_default_cohort = st.text_input("Cohort label (if no cohort column)", value="", key="bulk_students_cohort_main")
+
+                if st.button("➕ Provision accounts", key="bulk_students_run_main"):
+                    colmap = {"display_name": b_name}
+                    if b_user != "(none)":
+                        colmap["username"] = b_user
+                    if b_id != "(none)":
+                        colmap["student_id"] = b_id
+                    if b_cohort != "(none)":
+                        colmap["cohort"] = b_cohort
+                    try:
+                        with st.spinner("Creating accounts..."):
+                            n_created, n_skipped, cred_rows = bulk_provision_students(
+                                iter_student_import_rows(bulk_bytes, bulk_name, colmap, bulk_sheet),
+                                prefix=b_prefix, start_num=int(b_start), pad3=True,
+                                cohort=str(b_default_cohort or "").strip(), pw_len=int(b_pwlen),
+                            )
+                        if n_created:
+                            title = f"Student Credentials — {str(b_default_cohort or '').strip()}".strip(" —")
+                            st.session_state["bulk_credentials_job"] = submit_background_job("credentials", _build_credentials_bundle, cred_rows, title)
+                            st.success(f"Created {n_created} accounts ({n_skipped} skipped: username already exists). Credential files are being prepared below.")
+                        else:
+                            st.warning(f"No new accounts created ({n_skipped} rows skipped: username already exists).")
+                    except Exception as e:
+                        st.error(f"Bulk provisioning failed: {e}")
+
+        job_id = st.session_state.get("bulk_credentials_job")
+        if job_id:
+            job = get_background_job(job_id)
+            if job is None:
+                st.session_state.pop("bulk_credentials_job", None)
+            elif job["status"] == "running":
+                st.info("⏳ Building credential files (CSV / Excel / Word)...")
+                if st.button("🔄 Check again", key="bulk_students_job_refresh_main"):
+                    st.rerun()
+            elif job["status"] == "error":
+                st.error(f"Building credential files failed: {job['error']}")
+            else:
+                res = job["result"] or {}
+                st.success(f"Credential files ready ({res.get('count', 0)} accounts). Passwords are only available in this batch download.")
+                stamp = utc_now_iso().replace(":", "-")
+                dj1, dj2, dj3, dj4 = st.columns(4)
+                with dj1:
+                    st.download_button("⬇️ CSV", data=res.get("csv", b""), file_name=f"student_credentials_bulk_{stamp}.csv",
+                                       mime="text/csv", key="dl_bulk_students_csv_main")
+                with dj2:
+                    st.download_button("⬇️ Excel (.xlsx)", data=res.get("xlsx", b""), file_name=f"student_credentials_bulk_{stamp}.xlsx",
+                                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key="dl_bulk_students_xlsx_main")
+                with dj3:
+                    st.download_button("⬇️ Word (.docx)", data=res.get("docx", b""), file_name=f"student_credentials_bulk_{stamp}.docx",
+                                       mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", key="dl_bulk_students_docx_main")
+                with dj4:
+                    if st.button("🗑 Discard files", key="bulk_students_job_discard_main"):
+                        discard_background_job(job_id)
+                        st.session_state.pop("bulk_credentials_job", None)
+                        st.rerun()
+
     with st.expander("🔑 Password Management (Reset / Exam / Expiry)", expanded=False):
         st.caption("Reset individual student passwords + enable exam password override with auto-expiry (Qatar time).")
 
@@ -7353,6 +9600,18 @@ def admin_page_settings():
             if st.button("📄 Show exam policy details", key="exam_show_policy_btn_main"):
                 st.json(load_exam_access_policy())
 
+        st.divider()
+        st.markdown("### ⏱ Login throughput check")
+        st.caption("Simulates an exam-start login burst against students.json (wrong passwords only; no accounts or logs are changed).")
+        colL1, colL2 = st.columns(2)
+        with colL1:
+            bench_n = st.number_input("Logins", min_value=10, max_value=20000, value=500, step=50, key="login_bench_n_main")
+        with colL2:
+            bench_threads = st.number_input("Concurrent sessions", min_value=1, max_value=64, value=8, step=1, key="login_bench_threads_main")
+        if st.button("Run login benchmark", key="login_bench_run_main"):
+            with st.spinner("Running..."):
+                st.json(benchmark_login_throughput(int(bench_n), int(bench_threads)))
+
     # --- Mode + AI ---
     with st.expander("🧪 Mode (Practice / Exam)", expanded=True):
         admin_settings = load_admin_settings()
@@ -7392,6 +9651,22 @@ def admin_page_settings():
             st.success("Saved.")
             st.rerun()
 
+        st.markdown("**AI call metrics (this server process)**")
+        st.caption("Concurrent AI calls are capped by features.json → ai_max_concurrency (restart to apply). Students beyond the cap see their queue position.")
+        try:
+            m = ai_call_metrics_summary()
+            cm1, cm2, cm3, cm4 = st.columns(4)
+            cm1.metric("In flight / limit", f"{m['in_flight']} / {m['limit']}")
+            cm2.metric("Waiting", m["waiting"])
+            cm3.metric("p50 / p95 latency (ms)", f"{m['latency_p50_ms'] or '—'} / {m['latency_p95_ms'] or '—'}")
+            cm4.metric("Errors", f"{m['errors']} / {m['calls']}")
+            if m["queued_p95_ms"]:
+                st.caption(f"p95 time spent queued: {m['queued_p95_ms']} ms")
+            if m["recent_errors"]:
+                st.dataframe(m["recent_errors"], use_container_width=True)
+        except Exception as e:
+            st.caption(f"Metrics unavailable: {e}")
+
     # --- KPIs ---
     with st.expander("📊 Research & Teaching KPIs", expanded=False):
         kpi_policy = load_kpi_policy()
@@ -7530,7 +9805,7 @@ def admin_page_settings():
         # --- New: Archive + Guided Start New Study (safe, with confirmations)
         st.divider()
         st.markdown("**Archive / New study tools**")
-        st.caption("Archive keeps a copy of the current research dataset/log in a timestamped folder before you reset anything.")
+        st.caption("Archive compresses the current research dataset partitions and moves the research log into a timestamped folder before you reset anything.")
 
         col_a1, col_a2 = st.columns(2)
         with col_a1:
@@ -7563,8 +9838,11 @@ def admin_page_settings():
                     st.error(msg)
 
         if show_path:
+            _parts = research_store_summary()
+            if _parts:
+                st.dataframe(_parts, width="stretch", hide_index=True)
             st.code(
-                f"Dataset: {RESEARCH_DATASET_PATH}\nResearch log: {RESEARCH_LOG_PATH}\nArchives: {RESEARCH_ARCHIVE_DIR}\nIRB docs: {IRB_DOCS_DIR}",
+                f"Dataset: {RESEARCH_STORE_DIR} (legacy: {RESEARCH_DATASET_PATH})\nResearch log: {RESEARCH_LOG_PATH}\nArchives: {RESEARCH_ARCHIVE_DIR}\nIRB docs: {IRB_DOCS_DIR}",
                 language="text"
             )
         if st.button("💾 Save research settings", key="save_research_policy_main"):
@@ -7580,6 +9858,8 @@ def admin_page_settings():
             # New: IRB / ethics + anonymization + retention
             research_policy["irb_status"] = str(irb_status)
             research_policy["irb_reference"] = str(irb_ref or "").strip()
+            if str(anonym_salt or "").strip() != str(research_policy.get("anonymization_salt", "")).strip():
+                research_policy["pseudonym_scheme"] = "hmac-sha256"  # a new salt starts a new study epoch
             research_policy["anonymization_salt"] = str(anonym_salt or "").strip()
             research_policy["retention_mode"] = str(retention_mode)
             research_policy["retention_months"] = int(retention_months)
@@ -7970,6 +10250,32 @@ def admin_page_settings():
         one_at_time = st.checkbox("Student view: 1 NCLEX question at a time", value=bool(pol.get("one_question_at_a_time", False)), key="nclex_one_at_time_main")
         footer_enabled = st.checkbox("Show tiny footer session code (student view)", value=bool(pol.get("footer_session_code_enabled", True)), key="nclex_footer_enabled_main")
 
+        st.divider()
+        st.subheader("Adaptive mode (CAT)")
+        st.caption("Each next question is the most informative one at the student's current ability estimate; the test stops "
+                   "once the standard error reaches the target (after the minimum), or at the case's question count. "
+                   "Uses the IRT calibration from 📈 Item Analytics; uncalibrated items fall back to their difficulty tag. "
+                   "Rotation and per-student order randomization do not apply in adaptive mode.")
+        cat_enabled = st.checkbox("Enable adaptive NCLEX mode", value=bool(pol.get("adaptive_enabled", False)), key="nclex_adaptive_enabled_main")
+        cA, cB, cC = st.columns(3)
+        with cA:
+            cat_min = st.number_input("Minimum questions", min_value=1, max_value=200, value=int(pol.get("adaptive_min_items", 10) or 10), step=1, key="nclex_adaptive_min_main")
+        with cB:
+            cat_se = st.number_input("Stop at standard error ≤", min_value=0.1, max_value=1.0, value=float(pol.get("adaptive_se_target", 0.50) or 0.50), step=0.05, format="%.2f", key="nclex_adaptive_se_main")
+        with cC:
+            _cat_models = ["auto", "2pl", "rasch"]
+            _cat_cur = str(pol.get("adaptive_model", "auto") or "auto")
+            cat_model = st.selectbox("Parameters", _cat_models, index=_cat_models.index(_cat_cur) if _cat_cur in _cat_models else 0,
+                                     format_func=lambda m: {"auto": "Auto (2PL if calibrated)", "2pl": "2PL", "rasch": "Rasch"}[m], key="nclex_adaptive_model_main")
+        try:
+            cat_len, cat_share, cat_cases = nclex_cat_expected_length({**pol, "adaptive_model": cat_model}, int(cat_min), float(cat_se))
+            if cat_cases:
+                st.caption(f"Expected test length with these settings: about {cat_len:.0f} questions (average over {cat_cases} case packs); "
+                           f"{cat_share:.0%} of students are expected to stop on the standard-error target rather than the question limit. "
+                           "The estimate assumes well-targeted questions, so real sessions run slightly longer.")
+        except Exception as e:
+            st.caption(f"Expected test length unavailable: {e}")
+
         st.divider()
         st.subheader("Exam integrity (deterrent)")
         # New toggle (does not change scoring/exports) — just controls whether copy/print blockers are injected.
@@ -7981,16 +10287,99 @@ def admin_page_settings():
             pol["randomize_per_student_session"] = bool(rand_student)
             pol["one_question_at_a_time"] = bool(one_at_time)
             pol["footer_session_code_enabled"] = bool(footer_enabled)
+            pol["adaptive_enabled"] = bool(cat_enabled)
+            pol["adaptive_min_items"] = int(cat_min)
+            pol["adaptive_se_target"] = round(float(cat_se), 2)
+            pol["adaptive_model"] = cat_model
             # keep watermark disabled (legacy)
             pol["watermark_enabled"] = False
             save_nclex_policy(pol)
             st.success("Saved nclex_policy.json")
             st.rerun()
 
+        st.divider()
+        st.subheader("Session memory (presented sets)")
+        st.caption("Students' sessions keep only qids + the order seed; items come from one shared copy of the bank.")
+        _mem_cases = [c for c in _case_opts if c]
+        if _mem_cases:
+            _mem_cid = st.selectbox("Case", _mem_cases, index=0, key="nclex_mem_measure_case")
+            if st.button("📏 Measure per-session reduction", key="nclex_mem_measure_btn"):
+                m = measure_nclex_session_reduction(_mem_cid, pol)
+                st.write(
+                    f"{m['items']} items — full copies: {m['full_copies_bytes'] / 1024:.1f} KB per session → "
+                    f"qid references: {m['qid_refs_bytes'] / 1024:.2f} KB (−{m['reduction_pct']}%)."
+                )
+
         st.caption("Detailed active-set generator/history (original).")
         st.divider()
         render_nclex_rotation_admin_ui(pol)
 
+    # --- NCLEX AI explanations (batch) ---
+    with st.expander("🧠 NCLEX AI explanations (batch pre-generation)", expanded=False):
+        st.caption("Generate AI explanations once for the bank so the post-finalize review shows them instantly. Only new or edited items are regenerated.")
+        ai_store_admin = load_nclex_ai_explanations()
+        st.write("Stored explanations:", len(ai_store_admin.get("by_qid") or {}))
+        if ai_store_admin.get("updated_at"):
+            st.caption(f"Last run (UTC): {ai_store_admin.get('updated_at')}")
+
+        colx1, colx2, colx3 = st.columns(3)
+        with colx1:
+            ai_scope = st.radio("Items", ["Active sets only", "Whole bank"], index=0, key="nclex_ai_batch_scope_main")
+        with colx2:
+            ai_workers = st.number_input("Parallel requests", min_value=1, max_value=16, value=4, step=1, key="nclex_ai_batch_workers_main")
+        with colx3:
+            ai_force = st.checkbox("Regenerate all (ignore cache)", value=False, key="nclex_ai_batch_force_main")
+
+        if st.button("🚀 Generate missing / changed explanations", key="nclex_ai_batch_run_main"):
+            scope = "active" if ai_scope.startswith("Active") else "all"
+            bar = st.progress(0.0)
+            with st.spinner("Generating AI explanations..."):
+                ok, msg = pregenerate_nclex_ai_explanations(
+                    (load_admin_settings().get("ai_model") or "gpt-5.2").strip() or "gpt-5.2",
+                    scope=scope,
+                    max_workers=int(ai_workers),
+                    force=bool(ai_force),
+                    progress_cb=lambda done, total: bar.progress(min(1.0, done / max(1, total))),
+                )
+            st.success(msg) if ok else st.warning(msg)
+
+    # --- Session memory ---
+    with st.expander("🧮 Session memory (connected students)", expanded=False):
+        st.caption("Approximate size of each live session's state, sampled at most once per minute per session (large lists/dicts are sampled). Use it to size the server before exam day.")
+        cmem1, cmem2 = st.columns(2)
+        with cmem1:
+            alert_session_mb = st.number_input("Alert: per-session size (MB)", min_value=0.5, max_value=500.0, step=0.5,
+                                               value=float(features.get("memory_alert_session_mb", 5) or 5), key="mem_alert_session_mb_main")
+        with cmem2:
+            alert_process_mb = st.number_input("Alert: all sessions total (MB)", min_value=10.0, max_value=64000.0, step=10.0,
+                                               value=float(features.get("memory_alert_process_mb", 1024) or 1024), key="mem_alert_process_mb_main")
+        if st.button("💾 Save thresholds", key="mem_alert_save_main"):
+            features["memory_alert_session_mb"] = float(alert_session_mb)
+            features["memory_alert_process_mb"] = float(alert_process_mb)
+            save_features(features)
+            st.rerun()
+
+        record_session_memory_sample(force=True)
+        rep = session_memory_report(top_n=15)
+        mb = 1024.0 * 1024.0
+        cm1, cm2, cm3 = st.columns(3)
+        cm1.metric("Live sessions", rep["sessions"])
+        cm2.metric("Session state total", f"{rep['total_bytes'] / mb:.2f} MB")
+        cm3.metric("Process peak RSS", f"{rep['peak_rss_bytes'] / mb:.0f} MB" if rep["peak_rss_bytes"] else "n/a")
+
+        if rep["total_bytes"] / mb >= float(alert_process_mb):
+            st.error(f"Total session state exceeds {alert_process_mb:g} MB.")
+        heavy = [s for s in rep["top_sessions"] if s["bytes"] / mb >= float(alert_session_mb)]
+        if heavy:
+            st.warning(f"{len(heavy)} session(s) above {alert_session_mb:g} MB: " + ", ".join(f"{s['who']} ({s['bytes'] / mb:.1f} MB)" for s in heavy))
+
+        st.markdown("**Heaviest keys (all sessions)**")
+        st.dataframe([{"key": r["key"], "total_KB": round(r["total_bytes"] / 1024, 1), "max_KB": round(r["max_bytes"] / 1024, 1), "sessions": r["sessions"]}
+                      for r in rep["top_keys"]], use_container_width=True)
+        st.markdown("**Heaviest sessions**")
+        st.dataframe([{"who": s["who"], "KB": round(s["bytes"] / 1024, 1), "sampled_at": s["sampled_at"]} for s in rep["top_sessions"]],
+                     use_container_width=True)
+
 
     # --- Introductory Case Videos ---
     with st.expander("🎬 Introductory Case Videos", expanded=False):
@@ -8126,6 +10515,33 @@ def _csv_text_score(s: str) -> str:
     return "'" + str(s)
 
 
+def build_grade_center_table(attempts: list) -> list[dict]:
+    """Grade Center rows (score/total strings) for already-filtered attempt records."""
+    table = []
+    for r in attempts:
+        scores = r.get("scores") if isinstance(r.get("scores"), dict) else {}
+        ae_score = sum([int(scores.get(k, 0) or 0) for k in ["A", "B", "C", "D", "E"]])
+        ae_den = _ae_max(r)
+        intake_score = int(r.get("intake_score", 0) or 0)
+        intake_den = _intake_max(r)
+        nclex_score = int(r.get("nclex_score", 0) or 0)
+        nclex_den = int(r.get("nclex_total", 0) or 0)
+        overall_score = _attempt_total_score(r)
+        overall_den = intake_den + ae_den + nclex_den
+
+        table.append({
+            "Submitted (Qatar)": _format_dt_local(r.get("submitted_at", "")),
+            "Student": str(r.get("student_username", "")),
+            "Case ID": str(r.get("caseId", "")),
+            "Case Title": str(r.get("caseTitle", "")),
+            "Intake": _fmt_score(intake_score, intake_den),
+            "A–E": _fmt_score(ae_score, ae_den),
+            "NCLEX": _fmt_score(nclex_score, nclex_den),
+            "Overall": _fmt_score(overall_score, overall_den),
+        })
+    return table
+
+
 def _build_attempt_pdf_bytes(rec: dict) -> bytes:
     # PDF report for ONE attempt (faculty download)
     try:
@@ -8198,6 +10614,53 @@ def _build_attempt_pdf_bytes(rec: dict) -> bytes:
 # =============================
 # Admin Pages: Student Manager + Exam Control (Main screen)
 # =============================
+def admin_page_performance():
+    st.subheader("⏱ Performance (rerun profiler)")
+    st.caption("Timing spans for the main script phases, NCLEX rendering and the JSON/JSONL IO helpers. "
+               "Kept in memory (last 5000 events, all sessions in this server process).")
+
+    feats = load_features()
+    enabled = st.toggle("Enable profiler (features.json → profiler_enabled)", value=bool(feats.get("profiler_enabled", False)), key="perf_enabled_toggle_main")
+    if enabled != bool(feats.get("profiler_enabled", False)):
+        feats["profiler_enabled"] = bool(enabled)
+        save_features(feats)
+        st.rerun()
+
+    fs = html_fragment_stats()
+    cF1, cF2 = st.columns([4, 1])
+    with cF1:
+        st.caption(f"HTML fragment cache: {fs['entries']} entries · {fs['hits']} hits / {fs['misses']} misses "
+                   f"(hit rate {fs['hit_rate']:.0%})")
+    with cF2:
+        if st.button("Clear", key="html_frag_clear_btn_main"):
+            html_fragment_clear()
+            st.rerun()
+
+    rows = perf_summary()
+    if not rows:
+        st.info("No timings recorded yet. Enable the profiler and use the app (student and admin pages) to collect data.")
+        return
+
+    pages = sorted({r["page"] for r in rows})
+    kinds = sorted({r["kind"] for r in rows})
+    c1, c2 = st.columns(2)
+    with c1:
+        page_sel = st.multiselect("Pages", pages, default=pages, key="perf_pages_sel_main")
+    with c2:
+        kind_sel = st.multiselect("Kinds", kinds, default=kinds, key="perf_kinds_sel_main",
+                                  help="rerun = whole script run, phase = top-level script section, span = wrapped block, io = file helper")
+    view = [r for r in rows if r["page"] in page_sel and r["kind"] in kind_sel]
+    st.dataframe(view, use_container_width=True)
+
+    cA, cB = st.columns(2)
+    with cA:
+        st.download_button("⬇️ Download CSV", data=_to_csv_bytes(view, ["page", "kind", "name", "count", "p50_ms", "p95_ms", "max_ms"]), file_name="perf_summary.csv", mime="text/csv", key="perf_dl_csv_main")
+    with cB:
+        if st.button("🧹 Clear recorded timings", key="perf_clear_btn_main"):
+            perf_clear()
+            st.rerun()
+
+
 def admin_page_exam_control():
     st.subheader("🔒 Exam Control")
     admin_settings = load_admin_settings()
@@ -8267,10 +10730,37 @@ def admin_page_exam_control():
             try:
                 set_student_force_unlock(sel_student, True)
                 bump_student_reset_token(sel_student)  # also clears autosaves on next run
+                close_exam_deadline(sel_student, None, "admin_reset")
                 st.success(f"End/Reset requested for student: {sel_student}. Ask them to refresh the app.")
             except Exception:
                 st.error("Could not request reset for the selected student.")
 
+    st.divider()
+    st.markdown("#### ⏱ Server-side deadlines")
+    st.caption("Timed attempts keep their deadline on the server, so refreshing or reconnecting does not restart the clock. "
+               "With **auto_submit_on_expiry** on, a background sweeper saves expired Exam attempts from the latest autosave draft "
+               "once one sweep interval has passed (an open student session auto-submits its own answers first).")
+    rows = list_exam_deadlines(active_only=True)
+    now = time.time()
+    if rows:
+        st.dataframe([{
+            "student": r.get("student", ""),
+            "case": r.get("case_id", ""),
+            "attempt": r.get("attempt_no", ""),
+            "mode": r.get("mode", ""),
+            "limit (min)": r.get("timer_minutes", ""),
+            "remaining": format_seconds(max(0, int(float(r.get("deadline_epoch") or now) - now))),
+            "expired": float(r.get("deadline_epoch") or now) <= now,
+        } for r in rows], width="stretch", hide_index=True)
+    else:
+        st.info("No active timed attempts.")
+    sweeper = ensure_exam_deadline_sweeper()
+    if sweeper.get("last_run"):
+        st.caption(f"Sweeper last ran {int(now - sweeper['last_run'])}s ago: {sweeper.get('last_msg', '')}")
+    if st.button("Sweep expired sessions now", key="exam_deadline_sweep_now_btn"):
+        ok, msg = sweep_expired_exam_sessions()
+        (st.success if ok else st.error)(msg)
+
 
 def admin_page_student_session_manager():
     st.subheader("👤 Student Session Manager")
@@ -8431,28 +10921,7 @@ def render_grade_center_page():
     filt.sort(key=lambda r: str(r.get("submitted_at", "")), reverse=True)
 
     # Build table with score/total formatting
-    table = []
-    for r in filt:
-        scores = r.get("scores") if isinstance(r.get("scores"), dict) else {}
-        ae_score = sum([int(scores.get(k, 0) or 0) for k in ["A", "B", "C", "D", "E"]])
-        ae_den = _ae_max(r)
-        intake_score = int(r.get("intake_score", 0) or 0)
-        intake_den = _intake_max(r)
-        nclex_score = int(r.get("nclex_score", 0) or 0)
-        nclex_den = int(r.get("nclex_total", 0) or 0)
-        overall_score = _attempt_total_score(r)
-        overall_den = intake_den + ae_den + nclex_den
-
-        table.append({
-            "Submitted (Qatar)": _format_dt_local(r.get("submitted_at", "")),
-            "Student": str(r.get("student_username", "")),
-            "Case ID": str(r.get("caseId", "")),
-            "Case Title": str(r.get("caseTitle", "")),
-            "Intake": _fmt_score(intake_score, intake_den),
-            "A–E": _fmt_score(ae_score, ae_den),
-            "NCLEX": _fmt_score(nclex_score, nclex_den),
-            "Overall": _fmt_score(overall_score, overall_den),
-        })
+    table = build_grade_center_table(filt)
 
     # Section title
     st.markdown(
@@ -9201,13 +11670,15 @@ if effective_admin:
 
     admin_page = st.radio(
         "Admin",
-        ["🏠 Run App", "🎓 Grade Center", "🔎 Attempt Search", "👤 Student Manager", "🔒 Exam Control", "📈 Item Analytics", "🧹 Data Tools", "⚙️ Settings"],
+        ["🏠 Run App", "🎓 Grade Center", "🔎 Attempt Search", "👤 Student Manager", "🔒 Exam Control", "📈 Item Analytics", "🧹 Data Tools", "⏱ Performance", "⚙️ Settings"],
         horizontal=True,
         key="admin_pages_v6",
         label_visibility="collapsed",
     )
     st.markdown("---")
     if admin_page != "🏠 Run App":
+        perf_set_page("admin:" + admin_page)
+        perf_checkpoint("admin_page")
         if admin_page.startswith("🎓"):
             render_grade_center_page()
         elif admin_page.startswith("🔎"):
@@ -9220,8 +11691,11 @@ if effective_admin:
             admin_page_item_analytics()
         elif admin_page.startswith("🧹"):
             admin_page_data_tools()
+        elif admin_page.startswith("⏱"):
+            admin_page_performance()
         else:
             admin_page_settings()  # defined below
+        perf_finish()
         st.stop()
 
 
@@ -9229,6 +11703,7 @@ if effective_admin:
 # =============================
 # Step 6 navigation filters (Main panel)
 # =============================
+perf_checkpoint("case_selection")
 # NOTE: student_username is used by the Progress/Resume panel below and must be
 # defined before rendering the Case Selection UI.
 student_username = (
@@ -9435,6 +11910,7 @@ if locked_out:
 # =============================
 # Gold standard targets + UI options
 # =============================
+perf_checkpoint("ae_setup")
 gs_assess = get_gs_list(case, ["keyAssessments", "assessment"])
 gs_prio = get_gs_list(case, ["priorities", "prioritize"])
 gs_inter = get_gs_list(case, ["interventions"])
@@ -9520,6 +11996,7 @@ with st.expander("📘 Rubric (How you will be graded)", expanded=False):
 # =============================
 # Timer: establish deadline for this attempt + show it
 # =============================
+perf_checkpoint("timer")
 mode = admin_settings.get("app_mode", "Practice")
 timer_minutes = timer_minutes_for(case_policy, case_id, mode)
 
@@ -9536,6 +12013,24 @@ elif st.session_state["active_case_id"] != current_case_id:
     st.session_state["attempt_deadline_epoch"] = None
     st.session_state["attempt_started_epoch"] = st.session_state.get("attempt_started_epoch") or time.time()
 
+# Timed student attempts: the server-side deadline is authoritative (survives reconnects / new tabs)
+ensure_exam_deadline_sweeper()
+if (timer_minutes != "unlimited" and is_student_logged_in and not is_admin and student_username
+        and not st.session_state.get("attempt_saved", False)):
+    _srv_deadline = {}
+    try:
+        _srv_deadline = exam_deadline_for(student_username, case_id, timer_minutes, mode,
+                                          current_key=st.session_state.get("exam_deadline_key", ""),
+                                          max_attempts=max_attempts_int)
+        if _srv_deadline:
+            st.session_state["exam_deadline_key"] = _srv_deadline["key"]
+            st.session_state["attempt_started_epoch"] = float(_srv_deadline["started_epoch"])
+            st.session_state["attempt_deadline_epoch"] = float(_srv_deadline["deadline_epoch"])
+    except Exception:
+        pass
+    if _srv_deadline is None and attempts_count_for(student_username, case_id) > attempted:
+        st.rerun()  # an expired Exam attempt was just saved and used up the limit: re-check the lock-out
+
 # Set deadline once per attempt if timed
 if st.session_state.get("attempt_deadline_epoch") is None:
     if timer_minutes != "unlimited":
@@ -9560,7 +12055,13 @@ with st.sidebar.expander("⏱ Case Timer", expanded=True):
         st.write("Unlimited (default)")
     else:
         st.write(f"Limit: **{timer_minutes} min**")
-        st.write("Remaining:", f"**{format_seconds(max(0, time_left_sec))}**")
+        if expired:
+            st.write("Remaining:", f"**{format_seconds(0)}**")
+        else:
+            try:
+                render_deadline_countdown(deadline)
+            except Exception:
+                st.write("Remaining:", f"**{format_seconds(max(0, time_left_sec))}**")
         if expired and not is_admin:
             st.error("Time is up (Exam submissions locked).")
 
@@ -9628,6 +12129,7 @@ with st.expander("🛠️ Debug (click to open)", expanded=False):
 # =============================
 # Tabs restore
 # =============================
+perf_checkpoint("tabs_and_admin_view")
 if effective_admin:
     inspector_tab, student_tab, analytics_tab, editor_tab = st.tabs(["🧑‍🏫 Admin View", "👩‍⚕️ Student View", "📊 Analytics", "🧩 Case Editor"])
 else:
@@ -9657,138 +12159,9 @@ if effective_admin:
         st.caption("Exports all attempts from attempts_log.jsonl into a grading-ready CSV.")
 
         if st.button("🧾 Build CSV export file now"):
-            cases_by_id = {str(c.get("id","")): c for c in cases}
-            nclex_bank = load_nclex_items()
-            nclex_cases = (nclex_bank.get("cases") or {})
-            rows = []
-            qrows = []  # detailed NCLEX per-question rows
-            for rec in iter_attempts():
-                cid = str(rec.get("caseId", ""))
-                case = cases_by_id.get(cid, {}) if isinstance(cases_by_id, dict) else {}
-                answers = rec.get("answers") or {}
-        
-                # --- A–E item analysis (gold vs selected) ---
-                def _gold4(lst):
-                    lst = lst or []
-                    return list(lst)[:4] if isinstance(lst, list) else []
-                gs_assess = _gold4(get_gs_list(case, ["keyAssessments", "assessment"]))
-                gs_prio   = _gold4(get_gs_list(case, ["priorities", "prioritize"]))
-                gs_inter  = _gold4(get_gs_list(case, ["interventions"]))
-                gs_reass  = _gold4(get_gs_list(case, ["reassessment", "reassess"]))
-                gs_sbar_d = get_gs_sbar(case) or {}
-                gs_sbar   = _gold4([x for x in [gs_sbar_d.get("S",""), gs_sbar_d.get("B",""), gs_sbar_d.get("A",""), gs_sbar_d.get("R","")] if str(x).strip()])
-        
-                def _sel(dom):
-                    a = answers.get(dom) or {}
-                    if isinstance(a, dict):
-                        return a.get("selected") or []
-                    return []
-        
-                def _stats(selected, gold):
-                    selected = list(selected or [])
-                    gold = list(gold or [])
-                    correct = [x for x in selected if x in gold]
-                    wrong = [x for x in selected if x not in gold]
-                    missed = [x for x in gold if x not in selected]
-                    return len(correct), len(wrong), len(missed)
-        
-                a_ok,a_wrong,a_miss = _stats(_sel("A"), gs_assess)
-                b_ok,b_wrong,b_miss = _stats(_sel("B"), gs_prio)
-                c_ok,c_wrong,c_miss = _stats(_sel("C"), gs_inter)
-                d_ok,d_wrong,d_miss = _stats(_sel("D"), gs_reass)
-                e_ok,e_wrong,e_miss = _stats(_sel("E"), gs_sbar)
-        
-                # --- NCLEX item analysis ---
-                nblob = rec.get("nclex") or {}
-                ndetails = nblob.get("details") or []
-                n_answers = rec.get("nclex_answers") or {}
-                n_correct = 0
-                n_total = 0
-                for d in ndetails:
-                    n_total += 1
-                    if bool(d.get("correct")) or (str(d.get("points")) == str(d.get("max"))):
-                        n_correct += 1
-        
-                row = {
-                    "timestamp": rec.get("timestamp", ""),
-                    "duration_seconds": rec.get("duration_seconds", ""),
-                    "mode": rec.get("mode", ""),
-                    "timer_minutes": rec.get("timer_minutes", ""),
-                    "timer_expired": rec.get("timer_expired", ""),
-                    "student_username": rec.get("student_username", ""),
-                    "student_display_name": rec.get("student_display_name", ""),
-                    "student_id": rec.get("student_id", ""),
-                    "cohort": rec.get("student_cohort", ""),
-                    "caseId": rec.get("caseId", ""),
-                    "caseTitle": rec.get("caseTitle", ""),
-                    "system": rec.get("system", ""),
-                    "setting": rec.get("setting", ""),
-                    "A": rec.get("scores", {}).get("A", ""),
-                    "B": rec.get("scores", {}).get("B", ""),
-                    "C": rec.get("scores", {}).get("C", ""),
-                    "D": rec.get("scores", {}).get("D", ""),
-                    "E": rec.get("scores", {}).get("E", ""),
-                    "total": rec.get("total", ""),
-                    "unsafe_total": rec.get("unsafe_total", ""),
-                    "attempt_number_for_case": rec.get("attempt_number_for_case", ""),
-                    "A_correct": a_ok, "A_wrong": a_wrong, "A_missed": a_miss,
-                    "B_correct": b_ok, "B_wrong": b_wrong, "B_missed": b_miss,
-                    "C_correct": c_ok, "C_wrong": c_wrong, "C_missed": c_miss,
-                    "D_correct": d_ok, "D_wrong": d_wrong, "D_missed": d_miss,
-                    "E_correct": e_ok, "E_wrong": e_wrong, "E_missed": e_miss,
-                    "nclex_points": (nblob or {}).get("total_points", ""),
-                    "nclex_max": (nblob or {}).get("total_max", ""),
-                    "nclex_correct": n_correct,
-                    "nclex_total": n_total,
-                }
-                rows.append(row)
-        
-                item_map = {}
-                try:
-                    pack = nclex_cases.get(cid, {}) or {}
-                    for it in (pack.get("items") or []):
-                        if isinstance(it, dict) and it.get("id"):
-                            item_map[str(it.get("id"))] = it
-                except Exception:
-                    item_map = {}
-        
-                for d in ndetails:
-                    qid = str(d.get("qid", ""))
-                    meta = item_map.get(qid, {})
-                    qrows.append({
-                        "timestamp": rec.get("timestamp", ""),
-                        "student_username": rec.get("student_username", ""),
-                        "student_id": rec.get("student_id", ""),
-                        "cohort": rec.get("student_cohort", ""),
-                        "caseId": cid,
-                        "caseTitle": rec.get("caseTitle", ""),
-                        "qid": qid,
-                        "type": d.get("type", ""),
-                        "difficulty": meta.get("difficulty", ""),
-                        "client_need": meta.get("client_need", ""),
-                        "topic": meta.get("topic", ""),
-                        "points": d.get("points", ""),
-                        "max": d.get("max", ""),
-                        "correct": d.get("correct", ""),
-                        "student_answer": json.dumps(n_answers.get(qid, ""), ensure_ascii=False),
-                        "correct_answer": json.dumps(meta.get("correct", ""), ensure_ascii=False),
-                    })
-        
-            out = io.StringIO()
-            if rows:
-                w = csv.DictWriter(out, fieldnames=list(rows[0].keys()))
-                w.writeheader()
-                w.writerows(rows)
-            ATTEMPTS_CSV_PATH.write_text(out.getvalue(), encoding="utf-8")
-            st.success(f"CSV built: {ATTEMPTS_CSV_PATH.name} ({len(rows)} rows)")
-        
-            out2 = io.StringIO()
-            if qrows:
-                w2 = csv.DictWriter(out2, fieldnames=list(qrows[0].keys()))
-                w2.writeheader()
-                w2.writerows(qrows)
-            NCLEX_ITEM_CSV_PATH.write_text(out2.getvalue(), encoding="utf-8")
-            st.info(f"NCLEX item analysis built: {NCLEX_ITEM_CSV_PATH.name} ({len(qrows)} rows)")
+            n_rows, n_qrows = rebuild_attempt_export_files(cases)
+            st.success(f"CSV built: {ATTEMPTS_CSV_PATH.name} ({n_rows} rows)")
+            st.info(f"NCLEX item analysis built: {NCLEX_ITEM_CSV_PATH.name} ({n_qrows} rows)")
         if ATTEMPTS_CSV_PATH.exists():
             st.download_button(
                 "⬇️ Download attempts_export.csv",
@@ -9926,36 +12299,20 @@ if effective_admin and SHOW_ADMIN_PANELS_IN_SIDEBAR:
                     picked = rnd.sample(qids_all, k)
                 active_sets.setdefault("by_case", {})
                 active_sets.setdefault("by_case", {})
-                prev = active_sets["by_case"].get(cid_pick)
-                if not isinstance(prev, dict):
-                    prev = {}
-                hist = prev.get("history") if isinstance(prev.get("history"), list) else []
                 entry = {
                     "qids": picked,
                     "generated_at": now_local().isoformat(),
                     "generated_by": "admin",
                     "seed": rnd_seed[:16],
                 }
-                hist.append(entry)
-                # keep last 50 generations
-                if len(hist) > 50:
-                    hist = hist[-50:]
-                active_sets["by_case"][cid_pick] = {
-                    "qids": picked,
-                    "generated_at": entry["generated_at"],
-                    "generated_by": entry["generated_by"],
-                    "seed": entry["seed"],
-                    "history": hist,
-                }
+                active_sets["by_case"][cid_pick] = dict(entry)
                 save_nclex_active_sets(active_sets)
+                append_rotation_history([dict(entry, case_id=cid_pick)])
                 st.success(f"Generated a new active {len(picked)}-item set for {cid_pick}.")
 
 
-        active_sets = load_nclex_active_sets()
-
-        # --- Rotation history for this case ---
-        rec = (active_sets.get("by_case") or {}).get(cid_pick) or {}
-        hist = rec.get("history") if isinstance(rec.get("history"), list) else []
+        # --- Rotation history for this case (nclex_rotation_history.jsonl) ---
+        hist = load_rotation_history(cid_pick)
         if hist:
             st.markdown("### 🕘 Rotation history (this case)")
             rows = []
@@ -9970,14 +12327,9 @@ if effective_admin and SHOW_ADMIN_PANELS_IN_SIDEBAR:
             st.dataframe(rows, width="stretch", height=240)
             # CSV export of history
             try:
-                out_csv = io.StringIO()
-                w = csv.DictWriter(out_csv, fieldnames=list(rows[0].keys()))
-                w.writeheader()
-                for r in rows:
-                    w.writerow(r)
                 st.download_button(
                     "⬇️ Download rotation history (CSV)",
-                    data=out_csv.getvalue().encode("utf-8"),
+                    data=rotation_history_csv_bytes(cid_pick),
                     file_name=f"rotation_history_{cid_pick}.csv",
                     mime="text/csv",
                 )
@@ -10373,6 +12725,7 @@ if is_admin and editor_tab is not None:
 # =============================
 # Student View
 # =============================
+perf_checkpoint("student_view")
 with student_tab:
     # If a new-attempt reset was requested, perform it BEFORE widgets are instantiated.
     if st.session_state.get("_reset_pending", False):
@@ -10772,12 +13125,15 @@ with student_tab:
             return
         model = (admin_settings.get("ai_model") or "gpt-5.2").strip() or "gpt-5.2"
         prompt = build_domain_coach_prompt(domain_key, case, student_text, matched, missed, unsafe_hits)
+        queue_box = st.empty()
         try:
             with st.spinner("AI coach is generating guidance..."):
-                text = openai_responses_call(model, AI_SYSTEM_PROMPT, prompt)
+                text = openai_responses_call(model, AI_SYSTEM_PROMPT, prompt, on_queue=ai_queue_notice(queue_box))
             st.session_state["ai_coach"][domain_key] = text
         except Exception as e:
             st.warning(f"AI coach unavailable: {e}")
+        finally:
+            queue_box.empty()
 
     def show_ai_coach(domain_key: str):
         if admin_settings.get("app_mode") == "Exam":
@@ -11186,12 +13542,15 @@ with student_tab:
 
                 prompt = build_debrief_prompt(case, st.session_state.scores, missed_by_domain, unsafe_by_domain)
                 model = (admin_settings.get("ai_model") or "gpt-5.2").strip() or "gpt-5.2"
+                queue_box = st.empty()
                 try:
                     with st.spinner("AI is generating your end-of-case debrief..."):
-                        text = openai_responses_call(model, AI_SYSTEM_PROMPT, prompt)
+                        text = openai_responses_call(model, AI_SYSTEM_PROMPT, prompt, on_queue=ai_queue_notice(queue_box))
                     st.session_state["ai_debrief"] = text
                 except Exception as e:
                     st.warning(f"AI debrief unavailable: {e}")
+                finally:
+                    queue_box.empty()
 
             if st.session_state.get("ai_debrief"):
                 st.markdown('🧠 <span class="nr-title">AI End-of-Case Debrief</span> (coaching, not answers):', unsafe_allow_html=True)
@@ -11234,8 +13593,9 @@ with student_tab:
         else:
             st.session_state["nclex_in_progress"] = True
             nclex_policy = load_nclex_policy()
-            nclex_items = load_nclex_items()
-            render_nclex_practical(case_id, nclex_policy, nclex_items, features, mode, timer_lock)
+            nclex_items = get_shared_nclex_bank()
+            with perf_span("render_nclex_practical"):
+                render_nclex_practical(case_id, nclex_policy, nclex_items, features, mode, timer_lock)
     else:
         st.session_state["nclex_in_progress"] = False
         st.info("🧾 NCLEX-style practice will appear after you submit all 5 domains (A–E) at least once.")
@@ -11337,7 +13697,7 @@ with student_tab:
 
                 if bool(rp.get("collect_answer_change", True)):
 
-                    research["nclex_track"] = st.session_state.get("nclex_track", {})
+                    research["nclex_track"] = nclex_change_tracker().to_record()
 
 
                 if bool(rp.get("collect_section_performance", True)):
@@ -11438,11 +13798,22 @@ with student_tab:
         key = f"{student_username}::{case_id}"
         autosub = st.session_state.get("autosubmitted_case", {})
         if not autosub.get(key, False):
-            st.warning("⏱ Time expired — auto-saving attempt now.")
-            save_attempt(build_attempt_record_from_state(case_id))
             autosub[key] = True
             st.session_state["autosubmitted_case"] = autosub
-            st.success("Auto-saved to attempts_log.jsonl")
+            # Claim the server deadline first so the background sweeper cannot save the same attempt twice;
+            # a deadline the sweeper closed as "expired" (no draft, nothing written) is still ours to save
+            if (close_exam_deadline(student_username, case_id, "auto_submitted", only_if_expired=True)
+                    or reclaim_unsaved_exam_deadline(st.session_state.get("exam_deadline_key", ""))):
+                st.warning("⏱ Time expired — auto-saving attempt now.")
+                rec = build_attempt_record_from_state(case_id)
+                rec["auto_submitted"] = True
+                rec["auto_submit_source"] = "session"
+                rec["timer_expired"] = True
+                save_attempt(rec)
+                flush_nclex_research_record(case_id, rec)
+                st.success("Auto-saved to attempts_log.jsonl")
+            else:
+                st.info("⏱ Time expired — this attempt was already submitted.")
             st.rerun()
 
 # Research reflection (optional, research-only)
@@ -11457,4 +13828,6 @@ try:
             key="research_reflection_text"
         )
 except Exception:
-    pass
\ No newline at end of file
+    pass
+
+perf_finish()
@@ -0,0 +1,149 @@
+"""Measure app.py's import-time cost with `python -X importtime` and enforce a budget.
+
+    python bench/import_budget.py                         # current tree
+    python bench/import_budget.py --compare-rev HEAD~1    # before/after table
+    python bench/import_budget.py --budget-ms 1200 --out import_report.json
+    python bench/import_budget.py --compare-rev HEAD~1 --repeat 15
+
+Only app.py's module-level import statements are executed (in a fresh
+interpreter, so nothing is cached). That is exactly what every cold start pays
+and what a student session can touch without calling an admin builder. Each
+statement is wrapped in try/except ImportError so a missing optional package is
+reported instead of aborting the measurement. Cold imports vary by tens of ms
+from run to run, so each tree is measured --repeat times (alternating with the
+--compare-rev tree) and the median run is reported, with every total in runs_ms.
+
+Fails (exit 1) when the total exceeds --budget-ms or when any of
+cliniq_core.lazy.HEAVY_MODULES (reportlab, openpyxl, docx) is imported.
+"""
+import argparse
+import ast
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from cliniq_core.lazy import HEAVY_MODULES  # noqa: E402
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _import_probe(app_src: str) -> str:
+    """Python source that runs app.py's top-level imports, one guarded statement at a time."""
+    tree = ast.parse(app_src)
+    out = ["import sys as _sys", "_missing = []"]
+    for node in tree.body:
+        stmts = []
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            stmts = [node]
+        elif isinstance(node, ast.Try):
+            stmts = [b for b in node.body if isinstance(b, (ast.Import, ast.ImportFrom))]
+        for st_node in stmts:
+            out.append("try:\n    " + ast.unparse(st_node) + "\nexcept ImportError as _e:\n    _missing.append(str(_e))")
+    out.append("print('MISSING=' + repr(_missing), file=_sys.stderr)")
+    return "\n".join(out) + "\n"
+
+
+def _has_path(rev: str, path: str) -> bool:
+    return subprocess.run(["git", "cat-file", "-e", f"{rev}:{path}"], cwd=REPO_DIR,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+
+def _checkout(rev: str, dest: Path) -> Path:
+    """Extract app.py (and cliniq_core when that revision has it) from `rev` into dest."""
+    paths = ["app.py"] + (["cliniq_core"] if _has_path(rev, "cliniq_core") else [])
+    data = subprocess.check_output(["git", "archive", rev, *paths], cwd=REPO_DIR)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tf:
+        tf.extractall(dest)
+    return dest
+
+
+def measure(app_dir: Path) -> dict:
+    probe = Path(tempfile.mkdtemp(prefix="cliniq_imp_")) / "probe.py"
+    probe.write_text(_import_probe((app_dir / "app.py").read_text(encoding="utf-8")), encoding="utf-8")
+    env = dict(os.environ, PYTHONPATH=str(app_dir) + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(probe)], cwd=app_dir, env=env,
+                          capture_output=True, text=True)
+    top, modules, missing = [], set(), []
+    for line in proc.stderr.splitlines():
+        if line.startswith("MISSING="):
+            missing = ast.literal_eval(line[len("MISSING="):])
+            continue
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        cum_us, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        modules.add(name)
+        if indent <= 1:
+            top.append((name, cum_us))
+    total_ms = sum(us for _, us in top) / 1000.0
+    heavy = sorted({n.split(".")[0] for n in modules if n.split(".")[0] in HEAVY_MODULES})
+    return {
+        "app_dir": str(app_dir),
+        "total_ms": round(total_ms, 1),
+        "modules_imported": len(modules),
+        "heavy_imported": heavy,
+        "missing": missing,
+        "top": [{"module": n, "cumulative_ms": round(us / 1000.0, 1)} for n, us in sorted(top, key=lambda t: -t[1])[:15]],
+        "returncode": proc.returncode,
+    }
+
+
+def _median_run(runs: list) -> dict:
+    ordered = sorted(runs, key=lambda r: r["total_ms"])
+    med = dict(ordered[(len(ordered) - 1) // 2])
+    med["runs_ms"] = [r["total_ms"] for r in runs]
+    return med
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget-ms", type=float, default=1500.0)
+    ap.add_argument("--compare-rev", default="", help="also measure app.py at this git revision")
+    ap.add_argument("--repeat", type=int, default=5, help="runs per tree; the median is reported")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+
+    rev_dir = _checkout(args.compare_rev, Path(tempfile.mkdtemp(prefix="cliniq_rev_"))) if args.compare_rev else None
+    cur_runs, rev_runs = [], []
+    for _ in range(max(1, args.repeat)):
+        cur_runs.append(measure(REPO_DIR))
+        if rev_dir is not None:
+            rev_runs.append(measure(rev_dir))
+    report = {"budget_ms": args.budget_ms, "repeat": max(1, args.repeat), "current": _median_run(cur_runs)}
+    if rev_dir is not None:
+        before = _median_run(rev_runs)
+        before["rev"] = args.compare_rev
+        report["before"] = before
+        report["delta_ms"] = round(report["current"]["total_ms"] - before["total_ms"], 1)
+
+    cur = report["current"]
+    problems = []
+    if cur["total_ms"] > args.budget_ms:
+        problems.append(f"import time {cur['total_ms']} ms exceeds budget {args.budget_ms} ms")
+    if cur["heavy_imported"]:
+        problems.append("heavy modules imported at module level: " + ", ".join(cur["heavy_imported"]))
+    report["ok"] = not problems
+    report["problems"] = problems
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+    if "before" in report:
+        print(f"cold import (median of {report['repeat']}): {report['before']['total_ms']} ms ({args.compare_rev}) "
+              f"-> {cur['total_ms']} ms (current)", file=sys.stderr)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""Concurrent student-session load test built on streamlit.testing.v1.AppTest.
+
+    python bench/load_test.py --sessions 40 --workers 8 --out load_report.json
+    python bench/load_test.py --data-dir /tmp/cliniq_load --no-generate --sessions 10
+
+Each simulated session runs the real app.py (copied into the data folder so
+BASE_DIR points there) and walks the student path:
+
+    load -> login (verify_student) -> pick case -> intake -> A..E -> NCLEX -> save attempt
+
+Concurrent sessions run in separate worker processes (--workers at a time):
+AppTest drives a process-wide Streamlit runtime, so two sessions on threads of
+one process break each other. Each worker therefore has its own st.cache_resource
+state, like one server replica per worker; the data folder, and so every file
+lock and append-only log, is shared. File growth is measured in the parent.
+The JSON report holds per-step latency percentiles, per-step error rates,
+session completion and growth of the append-only files.
+
+A step that cannot find its widget (feature disabled, flow changed) is recorded
+as an error for that session and the session stops; nothing is faked.
+"""
+import argparse
+import json
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synth import REPO_DIR, generate  # noqa: E402
+
+STEPS = ["load", "login", "pick_case", "intake", "A", "B", "C", "D", "E", "nclex", "save_attempt"]
+# Directories (segmented stores) are reported as the sum of their .jsonl files.
+GROWTH_FILES = ["attempts_log.jsonl", "attempts_segments", "autosave_drafts.jsonl", "research_dataset.jsonl",
+                "research_store", "research_log.jsonl", "audit_log.jsonl", "nclex_active_sets.json",
+                "nclex_rotation_history.jsonl"]
+# Config files the app reads at startup; copied so the run matches the repo's policies.
+CONFIG_FILES = ["admin_settings.json", "attempt_policy.json", "attempts_policy.json", "case_policy.json",
+                "exam_access_policy.json", "exam_overrides.json", "features.json", "kpi_policy.json",
+                "nclex_active_sets.json", "nclex_policy.json", "research_policy.json", "timer_policy.json",
+                "logo_cliniq.png"]
+_EXACT_RE = re.compile(r"select exactly (\d+)", re.I)
+
+
+class StepError(Exception):
+    pass
+
+
+def prepare_data_dir(data_dir: Path, *, generate_data: bool, students: int, attempts: int, seed: int) -> dict:
+    data_dir.mkdir(parents=True, exist_ok=True)
+    dataset = None
+    if generate_data:
+        dataset = generate(data_dir, attempts=attempts, students=students, seed=seed)
+    for name in CONFIG_FILES:
+        src = REPO_DIR / name
+        if src.exists() and not (data_dir / name).exists():
+            shutil.copyfile(src, data_dir / name)
+    shutil.copyfile(REPO_DIR / "app.py", data_dir / "app.py")
+    shutil.copytree(REPO_DIR / "cliniq_core", data_dir / "cliniq_core", dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    return dataset or {}
+
+
+def _file_stats(data_dir: Path) -> dict:
+    out = {}
+    for name in GROWTH_FILES:
+        p = data_dir / name
+        if not p.exists():
+            out[name] = {"bytes": 0, "lines": 0}
+            continue
+        files = sorted(p.rglob("*.jsonl")) if p.is_dir() else [p]
+        lines = 0
+        for fp in files:
+            with fp.open("rb") as f:
+                for _ in f:
+                    lines += 1
+        out[name] = {"bytes": sum(fp.stat().st_size for fp in files), "lines": lines}
+    return out
+
+
+def _pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    idx = min(len(vals) - 1, max(0, int(round(q * (len(vals) - 1)))))
+    return round(vals[idx], 4)
+
+
+# -----------------------------
+# Widget helpers (AppTest element lists)
+# -----------------------------
+def _by_key(elements, key: str):
+    for el in elements:
+        if getattr(el, "key", None) == key:
+            return el
+    return None
+
+
+def _by_prefix(elements, prefix: str):
+    for el in elements:
+        if str(getattr(el, "key", "") or "").startswith(prefix):
+            return el
+    return None
+
+
+def _by_label(elements, label: str):
+    for el in elements:
+        if str(getattr(el, "label", "") or "").strip() == label:
+            return el
+    return None
+
+
+def _run(at, timeout: float):
+    at.run(timeout=timeout)
+    if at.exception:
+        raise StepError(str(at.exception[0].value)[:300])
+
+
+def _click(at, button, timeout: float):
+    if button is None:
+        raise StepError("button not found")
+    if getattr(button, "disabled", False):
+        raise StepError(f"button disabled: {getattr(button, 'key', None) or getattr(button, 'label', '')}")
+    button.click()
+    _run(at, timeout)
+
+
+def _click_if_present(at, prefix: str, timeout: float) -> bool:
+    btn = _by_prefix(at.button, prefix)
+    if btn is None or getattr(btn, "disabled", False):
+        return False
+    btn.click()
+    _run(at, timeout)
+    return True
+
+
+def _warned_count(at):
+    for w in list(at.warning):
+        m = _EXACT_RE.search(str(getattr(w, "value", "")))
+        if m:
+            return int(m.group(1))
+    return None
+
+
+# -----------------------------
+# Session steps
+# -----------------------------
+def _step_login(at, username: str, password: str, timeout: float):
+    role = _by_key(at.selectbox, "login_role_sel")
+    if role is not None and role.value != "Student":
+        role.set_value("Student")
+        _run(at, timeout)
+    user, pw = _by_key(at.text_input, "stu_user"), _by_key(at.text_input, "stu_pass")
+    if user is None or pw is None:
+        raise StepError("student login form not found")
+    user.input(username)
+    pw.input(password)
+    _click(at, _by_key(at.button, "stu_login_btn"), timeout)
+    if "student_profile" not in at.session_state or not at.session_state["student_profile"]:
+        raise StepError("login rejected")
+
+
+def _step_pick_case(at, session_idx: int, timeout: float) -> str:
+    sel = _by_key(at.selectbox, "case_pick_main")
+    if sel is None:
+        raise StepError("case picker not found")
+    opts = list(sel.options or [])
+    if not opts:
+        raise StepError("no cases available")
+    sel.select_index(session_idx % len(opts))
+    _run(at, timeout)
+    confirm = _by_prefix(at.checkbox, "intro_video_confirmed__")
+    if confirm is not None and not confirm.value:
+        confirm.check()
+        _run(at, timeout)
+    intake_btn = _by_prefix(at.button, "intake_submit_")
+    if intake_btn is None:
+        raise StepError("intake form not rendered after case pick")
+    return str(intake_btn.key)[len("intake_submit_"):]
+
+
+def _step_intake(at, case_id: str, timeout: float):
+    for prefix, text in [("intake_age_", "68"), ("intake_setting_", "Emergency department"),
+                         ("intake_cc_", "Shortness of breath"), ("intake_sx_", "Dyspnea, tachycardia"),
+                         ("intake_findings_", "SpO2 88% on room air"), ("intake_hist_", "COPD, hypertension")]:
+        box = _by_key(at.text_input, prefix + case_id) or _by_prefix(at.text_input, prefix)
+        if box is not None and not box.disabled:
+            box.input(text)
+    _click(at, _by_key(at.button, f"intake_submit_{case_id}"), timeout)
+
+
+def _step_domain(at, dom: str, case_id: str, timeout: float):
+    _click_if_present(at, f"ae_guidance_next_{case_id}", timeout)
+    if dom == "D":
+        t = _by_key(at.selectbox, "D_time")
+        if t is not None and not t.disabled and t.options:
+            t.select_index(0)
+    if dom == "E":
+        for k, text in [("E_S", "Patient hypoxic"), ("E_B", "COPD"), ("E_A", "Worsening"), ("E_R", "Review now")]:
+            ta = _by_key(at.text_area, k)
+            if ta is not None and not ta.disabled:
+                ta.input(text)
+    ms = _by_key(at.multiselect, f"{dom}_selected")
+    submit = _by_key(at.button, f"submit_{dom}_{case_id}")
+    if submit is None:
+        raise StepError(f"{dom} submit not rendered")
+    if ms is not None and not ms.disabled and ms.options:
+        m = _EXACT_RE.search(str(ms.label or ""))
+        n = int(m.group(1)) if m else 1
+        ms.set_value(list(ms.options)[:n])
+        _click(at, submit, timeout)
+        need = _warned_count(at)
+        if need is not None:
+            ms = _by_key(at.multiselect, f"{dom}_selected")
+            ms.set_value(list(ms.options)[:need])
+            _click(at, _by_key(at.button, f"submit_{dom}_{case_id}"), timeout)
+            if _warned_count(at) is not None:
+                raise StepError(f"{dom} selection count rejected")
+    else:
+        _click(at, submit, timeout)
+    _click_if_present(at, f"ae_next_{dom}_{case_id}", timeout)
+
+
+def _step_nclex(at, case_id: str, timeout: float):
+    _click_if_present(at, f"debrief_next_{case_id}", timeout)
+    _click_if_present(at, f"nr_next_to_nclex_{case_id}", timeout)
+    answered = 0
+    for r in list(at.radio):
+        if str(getattr(r, "key", "") or "").startswith("nclex_") and not r.disabled and r.options:
+            r.set_value(r.options[0])
+            answered += 1
+    for ms in list(at.multiselect):
+        if str(getattr(ms, "key", "") or "").startswith("nclex_") and not ms.disabled and ms.options:
+            ms.set_value([ms.options[0]])
+            answered += 1
+    submit = _by_label(at.button, "✅ Submit Practical Section")
+    if submit is None:
+        raise StepError("NCLEX section not rendered")
+    _click(at, submit, timeout)
+    return answered
+
+
+def _step_save(at, timeout: float):
+    _click(at, _by_key(at.button, "save_attempt_after_nclex"), timeout)
+
+
+def run_session(app_path: Path, idx: int, username: str, password: str, timeout: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    res = {"session": idx, "username": username, "steps": {}, "error": None, "failed_step": None, "completed": False}
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    ctx = {"case_id": ""}
+
+    plan = [("load", lambda: _run(at, timeout)),
+            ("login", lambda: _step_login(at, username, password, timeout)),
+            ("pick_case", lambda: ctx.update(case_id=_step_pick_case(at, idx, timeout))),
+            ("intake", lambda: _step_intake(at, ctx["case_id"], timeout))]
+    plan += [(d, (lambda d=d: _step_domain(at, d, ctx["case_id"], timeout))) for d in "ABCDE"]
+    plan += [("nclex", lambda: _step_nclex(at, ctx["case_id"], timeout)),
+             ("save_attempt", lambda: _step_save(at, timeout))]
+
+    for name, fn in plan:
+        t0 = time.perf_counter()
+        try:
+            fn()
+            res["steps"][name] = round(time.perf_counter() - t0, 4)
+        except Exception as e:
+            res["steps"][name] = round(time.perf_counter() - t0, 4)
+            res["failed_step"] = name
+            res["error"] = e.args[0] if isinstance(e, StepError) else "".join(
+                traceback.format_exception_only(type(e), e)).strip()[:300]
+            return res
+    res["completed"] = True
+    res["case_id"] = ctx["case_id"]
+    return res
+
+
+def _session_job(app_path: str, idx: int, n_students: int, timeout: float) -> dict:
+    """Worker-process entry point (top level so it pickles under the spawn start method)."""
+    n = (idx % n_students) + 1
+    return run_session(Path(app_path), idx, f"student{n:04d}", f"pw{n}", timeout)
+
+
+def summarize(results: list) -> dict:
+    steps = {}
+    for name in STEPS:
+        ok = [r["steps"][name] for r in results if name in r["steps"] and r["failed_step"] != name]
+        attempted = sum(1 for r in results if name in r["steps"])
+        failed = sum(1 for r in results if r["failed_step"] == name)
+        steps[name] = {
+            "attempted": attempted,
+            "errors": failed,
+            "error_rate": round(failed / attempted, 4) if attempted else 0.0,
+            "p50_s": _pct(ok, 0.50), "p90_s": _pct(ok, 0.90), "p95_s": _pct(ok, 0.95), "p99_s": _pct(ok, 0.99),
+            "mean_s": round(statistics.mean(ok), 4) if ok else 0.0,
+            "max_s": round(max(ok), 4) if ok else 0.0,
+        }
+    errors = {}
+    for r in results:
+        if r["error"]:
+            k = f"{r['failed_step']}: {r['error']}"
+            errors[k] = errors.get(k, 0) + 1
+    totals = [sum(r["steps"].values()) for r in results if r["completed"]]
+    return {
+        "sessions": len(results),
+        "completed": sum(1 for r in results if r["completed"]),
+        "session_error_rate": round(sum(1 for r in results if not r["completed"]) / len(results), 4) if results else 0.0,
+        "session_p50_s": _pct(totals, 0.50),
+        "session_p95_s": _pct(totals, 0.95),
+        "steps": steps,
+        "errors": dict(sorted(errors.items(), key=lambda kv: -kv[1])[:20]),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data-dir", default="", help="working folder (default: a temp folder)")
+    ap.add_argument("--no-generate", action="store_true", help="reuse --data-dir data (app.py is still refreshed)")
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--workers", type=int, default=8, help="concurrent sessions (one process each)")
+    ap.add_argument("--students", type=int, default=300, help="synthetic roster size (>= sessions)")
+    ap.add_argument("--attempts", type=int, default=2000, help="pre-existing attempts in the log")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout (s)")
+    ap.add_argument("--out", default="", help="write the JSON report here (always printed)")
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir or tempfile.mkdtemp(prefix="cliniq_load_"))
+    dataset = prepare_data_dir(data_dir, generate_data=not args.no_generate,
+                               students=max(args.students, args.sessions), attempts=args.attempts, seed=args.seed)
+    app_path = data_dir / "app.py"
+    before = _file_stats(data_dir)
+
+    results = [None] * args.sessions
+    n_students = max(args.students, args.sessions)
+    t0 = time.perf_counter()
+    # spawn: a fresh interpreter per worker (forking a process that has imported streamlit is not safe)
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=get_context("spawn")) as ex:
+        futures = {ex.submit(_session_job, str(app_path), i, n_students, args.timeout): i for i in range(args.sessions)}
+        for done, fut in enumerate(as_completed(futures), start=1):
+            i = futures[fut]
+            try:
+                r = fut.result()
+            except Exception as e:  # worker died (crash, OOM): count the session as failed
+                r = {"session": i, "steps": {}, "error": f"worker failed: {e}"[:300], "failed_step": "load",
+                     "completed": False}
+            results[i] = r
+            print(f"[{done}/{args.sessions}] session {i}: "
+                  f"{'ok' if r['completed'] else 'FAILED at ' + str(r['failed_step'])}", file=sys.stderr)
+    wall = time.perf_counter() - t0
+
+    after = _file_stats(data_dir)
+    growth = {name: {"bytes": after[name]["bytes"] - before[name]["bytes"],
+                     "lines": after[name]["lines"] - before[name]["lines"],
+                     "bytes_after": after[name]["bytes"]} for name in GROWTH_FILES}
+    summary = summarize(results)
+    summary["wall_s"] = round(wall, 3)
+    summary["sessions_per_min"] = round(summary["completed"] / wall * 60.0, 2) if wall > 0 else 0.0
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "data_dir": str(data_dir),
+        "workers": args.workers,
+        "dataset": dataset,
+        "summary": summary,
+        "file_growth": growth,
+        "sessions": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(json.dumps({"summary": summary, "file_growth": growth}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark the app's data paths on a seeded synthetic dataset and emit a JSON report.
+
+    python bench/run_bench.py --attempts 10000 --out bench_report.json
+    python bench/run_bench.py --data-dir /tmp/cliniq_bench --no-generate   # reuse a folder
+
+Timed targets (same functions the app uses, loaded without the UI via
+cliniq_core/headless.py): iter_attempts, attempts_count_for, load_last_autosave,
+build_research_csv_bytes, build_nclex_psychometrics_excel_bytes,
+_filter_attempts and the Grade Center table build.
+
+Each target runs --repeat times; the report keeps min/median/max seconds so two
+reports (before/after a change) can be diffed.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cliniq_core.headless import load_app_namespace  # noqa: E402
+from synth import generate  # noqa: E402
+
+
+def _time(fn, repeat: int) -> dict:
+    runs, result = [], None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    return {"min_s": round(min(runs), 6), "median_s": round(statistics.median(runs), 6),
+            "max_s": round(max(runs), 6), "runs": len(runs), "result": result}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ""
+
+
+def build_targets(ns: dict) -> dict:
+    """name -> zero-arg callable returning a small, JSON-friendly result."""
+    first = next(iter(ns["iter_attempts"]()), {}) or {}
+    stu, cid = first.get("student_username", ""), first.get("caseId", "")
+    records = ns["_load_attempts_records"](ns["ATTEMPTS_PATH"])
+
+    def _grade_center():
+        rows = [r for r in ns["iter_attempts"]() if isinstance(r, dict) and str(r.get("mode", "")) == "Exam"]
+        rows.sort(key=lambda r: str(r.get("submitted_at", "")), reverse=True)
+        return len(ns["build_grade_center_table"](rows))
+
+    return {
+        "iter_attempts": lambda: sum(1 for _ in ns["iter_attempts"]()),
+        "attempts_count_for": lambda: ns["attempts_count_for"](stu, cid),
+        "load_last_autosave": lambda: bool(ns["load_last_autosave"](stu, cid)),
+        "build_research_csv_bytes": lambda: len(ns["build_research_csv_bytes"]()),
+        "build_nclex_psychometrics_excel_bytes": lambda: len(ns["build_nclex_psychometrics_excel_bytes"]()),
+        "_filter_attempts": lambda: len(ns["_filter_attempts"](records, student_q=stu, score_min=5)),
+        "grade_center_table": _grade_center,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data-dir", default="", help="dataset folder (default: a temp folder)")
+    ap.add_argument("--no-generate", action="store_true", help="reuse --data-dir as-is")
+    ap.add_argument("--attempts", type=int, default=10000)
+    ap.add_argument("--students", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--only", default="", help="comma-separated target names")
+    ap.add_argument("--out", default="", help="write the JSON report here (always printed)")
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir or tempfile.mkdtemp(prefix="cliniq_bench_"))
+    dataset = None
+    if not args.no_generate:
+        t0 = time.perf_counter()
+        dataset = generate(data_dir, attempts=args.attempts, students=args.students, seed=args.seed)
+        dataset["generate_s"] = round(time.perf_counter() - t0, 3)
+
+    ns = load_app_namespace(data_dir)
+    targets = build_targets(ns)
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+
+    results = {}
+    for name, fn in targets.items():
+        if only and name not in only:
+            continue
+        try:
+            results[name] = _time(fn, args.repeat)
+        except Exception as e:
+            results[name] = {"error": repr(e)}
+        print(f"{name:40s} {results[name].get('median_s', results[name].get('error'))}", file=sys.stderr)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "data_dir": str(data_dir),
+        "dataset": dataset,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Seeded synthetic data for benchmarks.
+
+Writes files with the same record shapes the app produces:
+
+- attempts_log.jsonl       (build_attempt_record_from_state + nclex.details)
+- autosave_drafts.jsonl    (autosave_draft)
+- research_dataset.jsonl   (append_research_dataset_row)
+- students.json            (Settings student generator)
+
+Case ids and NCLEX qids are taken from the real cases.json / nclex_items.json
+(copied into the output folder) so item-level analytics see realistic keys.
+
+    python bench/synth.py --out /tmp/cliniq_bench --attempts 100000 --seed 7
+"""
+import argparse
+import hashlib
+import json
+import random
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+NCLEX_TYPES_MAX = {"mcq": 1, "sata": 1, "ordered_response": 1, "cloze": 1, "matrix": 1, "evolving_case": 1}
+
+
+def _load_bank(repo_dir: Path):
+    cases = json.loads((repo_dir / "cases.json").read_text(encoding="utf-8"))
+    bank = json.loads((repo_dir / "nclex_items.json").read_text(encoding="utf-8"))
+    packs = bank.get("cases") or bank.get("practical") or bank.get("items") or {}
+    items_by_case = {}
+    for cid, pack in packs.items():
+        its = pack.get("items", []) if isinstance(pack, dict) else (pack or [])
+        items_by_case[str(cid)] = [it for it in its if isinstance(it, dict) and it.get("id")]
+    case_meta = []
+    for c in cases if isinstance(cases, list) else []:
+        cid = str(c.get("id", "")).strip()
+        if cid:
+            case_meta.append({"id": cid, "title": c.get("title", cid), "system": c.get("category") or c.get("system") or "Uncategorized"})
+    return case_meta, items_by_case
+
+
+def _students(n: int):
+    return [{
+        "username": f"student{i:04d}",
+        "display_name": f"Student {i:04d}",
+        "student_id": f"{i:04d}",
+        "cohort": "Adult Nursing Y2" if i % 3 else "Adult Nursing Y3",
+        "password_sha256": hashlib.sha256(f"pw{i}".encode("utf-8")).hexdigest(),
+        "created_at": "2026-01-12T23:33:14.602643",
+    } for i in range(1, n + 1)]
+
+
+def _fake_answer(rng, item):
+    t = item.get("type")
+    opts = item.get("options") or []
+    if t == "mcq":
+        return rng.choice(opts) if opts else None
+    if t in ("sata", "ordered_response"):
+        return rng.sample(opts, k=min(len(opts), rng.randint(1, 3))) if opts else []
+    if t == "cloze":
+        return "answer"
+    return None
+
+
+def _attempt(rng, t0, stu, case, items, k_items=20):
+    started = t0 + timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+    dur = rng.randint(300, 3600)
+    presented = rng.sample(items, k=min(k_items, len(items))) if items else []
+    details, answers = [], {}
+    for it in presented:
+        ok = rng.random() < 0.62
+        details.append({"qid": it["id"], "type": it.get("type", "mcq"), "points": 1 if ok else 0, "max": 1, "correct": ok})
+        answers[it["id"]] = _fake_answer(rng, it) if rng.random() < 0.9 else None
+    points = sum(d["points"] for d in details)
+    scores = {k: rng.randint(0, 5) for k in "ABCDE"}
+    return {
+        "started_at": started.isoformat(),
+        "submitted_at": (started + timedelta(seconds=dur)).isoformat(),
+        "duration_seconds": dur,
+        "student_username": stu["username"],
+        "student_display_name": stu["display_name"],
+        "student_id": stu["student_id"],
+        "cohort": stu["cohort"],
+        "mode": "Exam" if rng.random() < 0.4 else "Practice",
+        "caseId": case["id"],
+        "caseTitle": case["title"],
+        "system": case["system"],
+        "intake_score": rng.randint(0, 5),
+        "intake_breakdown": {k: rng.randint(0, 1) for k in ("age", "setting", "chief_complaint", "signs_symptoms_findings", "history")},
+        "scores": scores,
+        "answers": {
+            "A": {"selected": ["Focused assessment", "Vital signs trend", "Pain assessment"], "notes": ""},
+            "B": {"selected": ["Urgent escalation + continuous monitoring"], "rationale": ""},
+            "C": {"selected": ["Notify provider urgently", "IV access"], "rationale": ""},
+            "D": {"selected": ["Frequent reassessment"], "notes": "", "timing": "15 minutes"},
+            "E": {"S": "", "B": "", "A": "", "R": "", "selected_elements": []},
+        },
+        "unsafe_counts": {k: (1 if rng.random() < 0.05 else 0) for k in "ABCDE"},
+        "unsafe_total": 0,
+        "nclex_total": len(details),
+        "nclex_score": points,
+        "nclex_answers": answers,
+        "nclex": {"total_points": points, "total_max": len(details), "details": details},
+        "research_consent": rng.random() < 0.7,
+    }
+
+
+def generate(out_dir, *, attempts=10000, students=300, autosaves=None, research=None, seed=42, repo_dir=REPO_DIR) -> dict:
+    """Write a full synthetic data folder and return file sizes/counts."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    case_meta, items_by_case = _load_bank(Path(repo_dir))
+    case_meta = [c for c in case_meta if items_by_case.get(c["id"])] or case_meta
+    autosaves = attempts if autosaves is None else autosaves
+    research = attempts // 2 if research is None else research
+
+    for name in ("cases.json", "nclex_items.json"):
+        shutil.copyfile(Path(repo_dir) / name, out / name)
+    (out / "research_policy.json").write_text(json.dumps({"enabled": True, "anonymize_student_id": True,
+                                                          "anonymization_salt": "bench-salt"}, indent=2), encoding="utf-8")
+    (out / "features.json").write_text(json.dumps({"autosave_enabled": True, "backup_on_start": False}, indent=2), encoding="utf-8")
+
+    studs = _students(students)
+    (out / "students.json").write_text(json.dumps({"students": studs}, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    t0 = datetime(2026, 1, 1)
+    with open(out / "attempts_log.jsonl", "w", encoding="utf-8") as f:
+        for _ in range(attempts):
+            case = rng.choice(case_meta)
+            rec = _attempt(rng, t0, rng.choice(studs), case, items_by_case.get(case["id"], []))
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    with open(out / "autosave_drafts.jsonl", "w", encoding="utf-8") as f:
+        for i in range(autosaves):
+            stu, case = rng.choice(studs), rng.choice(case_meta)
+            f.write(json.dumps({
+                "timestamp": (t0 + timedelta(seconds=i * 7)).isoformat(),
+                "student_username": stu["username"],
+                "caseId": case["id"],
+                "draft": {
+                    "answers": {"A": {}, "B": {}, "C": {}, "D": {}, "E": {}},
+                    "scores": {k: 0 for k in "ABCDE"},
+                    "nclex_answers": {},
+                    "practical_submitted": False,
+                    "nclex_finalized": False,
+                    "caseId": case["id"],
+                    "mode": "Exam",
+                    "intake": {"age": "", "setting": "", "chief_complaint": "", "signs_symptoms": "", "history": ""},
+                    "intake_score": 0,
+                    "intake_breakdown": {},
+                    "intake_submitted": False,
+                    "last_feedback": {k: None for k in "ABCDE"},
+                    "ae_focus": rng.choice("ABCDE"),
+                    "nclex_scored": None,
+                },
+            }, ensure_ascii=False) + "\n")
+
+    with open(out / "research_dataset.jsonl", "w", encoding="utf-8") as f:
+        for _ in range(research):
+            stu, case = rng.choice(studs), rng.choice(case_meta)
+            scores = {k: rng.randint(0, 5) for k in "ABCDE"}
+            f.write(json.dumps({
+                "participant_id": hashlib.sha256(f"bench-salt|{stu['student_id']}".encode()).hexdigest()[:16],
+                "submitted_at": (t0 + timedelta(seconds=rng.randint(0, 10 ** 7))).isoformat(),
+                "caseId": case["id"],
+                "caseTitle": case["title"],
+                "mode": "Exam",
+                "cohort": stu["cohort"],
+                "total_score": sum(scores.values()),
+                "total_with_intake": sum(scores.values()) + 3,
+                "nclex_score": rng.randint(0, 20),
+                "nclex_total": 20,
+                "domain_scores": scores,
+                "intake_score": 3,
+                "duration_seconds": rng.randint(300, 3600),
+                "nclex_changes": None,
+                "performance_by_section": None,
+            }, ensure_ascii=False) + "\n")
+
+    files = ["attempts_log.jsonl", "autosave_drafts.jsonl", "research_dataset.jsonl", "students.json"]
+    return {
+        "seed": seed,
+        "counts": {"attempts": attempts, "autosaves": autosaves, "research_rows": research, "students": students},
+        "bytes": {name: (out / name).stat().st_size for name in files},
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True, help="output folder")
+    ap.add_argument("--attempts", type=int, default=10000)
+    ap.add_argument("--students", type=int, default=300)
+    ap.add_argument("--autosaves", type=int, default=None, help="default: same as --attempts")
+    ap.add_argument("--research", type=int, default=None, help="default: attempts / 2")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+    info = generate(args.out, attempts=args.attempts, students=args.students,
+                    autosaves=args.autosaves, research=args.research, seed=args.seed)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
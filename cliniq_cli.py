@@ -0,0 +1,180 @@
+"""Offline jobs for ClinIQ, run without the Streamlit server (e.g. from nightly cron).
+
+    python cliniq_cli.py export-research --out research_export.csv
+    python cliniq_cli.py export-summary  --out attempt_summary.csv
+    python cliniq_cli.py psychometrics   --out nclex_psychometrics.xlsx --min-attempts 10
+    python cliniq_cli.py archive [--keep] [--codec lzma] [--research --note "term 1"]
+    python cliniq_cli.py backup
+    python cliniq_cli.py compact-autosaves [--archive]
+    python cliniq_cli.py rebuild-indexes
+    python cliniq_cli.py segment-attempts
+    python cliniq_cli.py calibrate-irt --model 2pl [--min-responses 20]
+    python cliniq_cli.py rotate-active-sets [--window 3] [--case adult_acs_01]
+
+Exports accept --include-archived to stream compressed archives in
+backups/attempts_archive/ (research_archives/ for export-research) along with
+the live data (nothing is unpacked to disk).
+
+Every subcommand calls the same app.py builder the admin pages use (loaded via
+cliniq_core.headless), against --data-dir (default: this folder). Exit code is
+0 on success and 1 on failure, so cron can alert on errors.
+
+Example crontab (02:30 nightly):
+
+    30 2 * * * cd /srv/cliniq && python cliniq_cli.py rebuild-indexes && python cliniq_cli.py compact-autosaves
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from cliniq_core.headless import load_app_namespace
+
+APP_DIR = Path(__file__).resolve().parent
+
+
+def _default_out(prefix: str, ext: str) -> Path:
+    return Path(f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}")
+
+
+def _write(out, default_prefix: str, ext: str, data: bytes) -> str:
+    path = Path(out) if out else _default_out(default_prefix, ext)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return f"Wrote {path} ({len(data):,} bytes)"
+
+
+def cmd_export_research(ns, args):
+    return True, _write(args.out, "research_export", "csv",
+                        ns["build_research_csv_bytes"](include_archived=args.include_archived))
+
+
+def cmd_export_summary(ns, args):
+    return True, _write(args.out, "attempt_summary", "csv",
+                        ns["build_attempt_summary_csv_bytes"](include_archived=args.include_archived))
+
+
+def cmd_psychometrics(ns, args):
+    data = ns["build_nclex_psychometrics_excel_bytes"](min_attempts_per_item=args.min_attempts,
+                                                       min_items_intersection=args.min_items,
+                                                       include_archived=args.include_archived)
+    return True, _write(args.out, "nclex_psychometrics", "xlsx", data)
+
+
+def cmd_archive(ns, args):
+    ok, msg = ns["archive_attempt_logs"](clear_after=not args.keep, codec=args.codec or None)
+    if args.research:
+        ok_r, msg_r = ns["archive_research_data"](note=args.note)
+        ok, msg = (ok and ok_r), f"{msg}\n{msg_r}"
+    return ok, msg
+
+
+def cmd_backup(ns, args):
+    ns["maybe_backup_on_start"]({"backup_on_start": True})
+    return True, f"Backed up config and data files to {ns['BACKUP_DIR']}"
+
+
+def cmd_compact_autosaves(ns, args):
+    return ns["compact_autosave_drafts"](archive=args.archive)
+
+
+def cmd_rebuild_indexes(ns, args):
+    n_rows, n_qrows = ns["rebuild_attempt_export_files"](ns["load_cases"]())
+    return True, (f"Rebuilt {ns['ATTEMPTS_CSV_PATH'].name} ({n_rows} rows) and "
+                  f"{ns['NCLEX_ITEM_CSV_PATH'].name} ({n_qrows} rows)")
+
+
+def cmd_segment_attempts(ns, args):
+    return ns["segment_legacy_attempts_log"]()
+
+
+def cmd_calibrate_irt(ns, args):
+    return ns["calibrate_nclex_irt"](args.model, include_archived=args.include_archived,
+                                     min_responses=args.min_responses)
+
+
+def cmd_rotate_active_sets(ns, args):
+    ok, msg, rows = ns["generate_all_active_sets"](args.window, case_ids=args.case or None)
+    lines = [f"  {r['case_id']}: {r['items']} items, reused {r['reused_recent']}, "
+             f"blueprint off by {r['blueprint_off_by']}, difficulty off by {r['difficulty_off_by']}" for r in rows]
+    return ok, "\n".join([msg] + lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data-dir", default=str(APP_DIR), help="folder holding the app's JSON/JSONL files")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export-research", help="de-identified research CSV (Research page export)")
+    p.add_argument("--out", default="")
+    p.add_argument("--include-archived", action="store_true",
+                   help="also read research_archives/ (or attempt archives when there is no research dataset)")
+    p.set_defaults(func=cmd_export_research)
+
+    p = sub.add_parser("export-summary", help="attempt summary CSV")
+    p.add_argument("--out", default="")
+    p.add_argument("--include-archived", action="store_true", help="also read compressed attempt archives")
+    p.set_defaults(func=cmd_export_summary)
+
+    p = sub.add_parser("psychometrics", help="NCLEX psychometrics workbook (.xlsx)")
+    p.add_argument("--out", default="")
+    p.add_argument("--min-attempts", type=int, default=10, help="min attempts per item")
+    p.add_argument("--min-items", type=int, default=10, help="min common items for KR-20")
+    p.add_argument("--include-archived", action="store_true", help="also read compressed attempt archives")
+    p.set_defaults(func=cmd_psychometrics)
+
+    p = sub.add_parser("archive", help="compress the attempts log into backups/attempts_archive/")
+    p.add_argument("--keep", action="store_true", help="do not clear the live log after archiving")
+    p.add_argument("--codec", default="", help="gzip, lzma or zstd (default: features.json archive_codec)")
+    p.add_argument("--research", action="store_true", help="also archive research data")
+    p.add_argument("--note", default="", help="note stored with the research archive")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("backup", help="timestamped copies of cases, students, attempts and policies")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("compact-autosaves", help="keep only the latest draft per student+case")
+    p.add_argument("--archive", action="store_true", help="store a compressed copy of the full file first")
+    p.set_defaults(func=cmd_compact_autosaves)
+
+    p = sub.add_parser("rebuild-indexes", help="rebuild attempts_export.csv and nclex_item_analysis.csv")
+    p.set_defaults(func=cmd_rebuild_indexes)
+
+    p = sub.add_parser("segment-attempts", help="move the legacy attempts_log.jsonl into dated segments")
+    p.set_defaults(func=cmd_segment_attempts)
+
+    p = sub.add_parser("calibrate-irt", help="fit Rasch/2PL item parameters into nclex_irt_params.json")
+    p.add_argument("--model", choices=["rasch", "2pl"], default="rasch")
+    p.add_argument("--min-responses", type=int, default=20, help="min responses for an item to be reported")
+    p.add_argument("--include-archived", action="store_true", help="also read compressed attempt archives")
+    p.set_defaults(func=cmd_calibrate_irt)
+
+    p = sub.add_parser("rotate-active-sets", help="new blueprint-constrained NCLEX active set for every case")
+    p.add_argument("--window", type=int, default=None, help="avoid items from the last K sets (default: policy)")
+    p.add_argument("--case", action="append", default=[], help="limit to this case id (repeatable)")
+    p.set_defaults(func=cmd_rotate_active_sets)
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    data_dir = Path(args.data_dir).resolve()
+    if not data_dir.is_dir():
+        print(f"Data folder not found: {data_dir}", file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    ns = load_app_namespace(data_dir)
+    try:
+        ok, msg = args.func(ns, args)
+    except Exception as e:
+        ok, msg = False, f"{args.command} failed: {e}"
+    print(msg, file=sys.stdout if ok else sys.stderr)
+    print(f"[{args.command}] {'ok' if ok else 'FAILED'} in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
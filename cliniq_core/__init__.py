@@ -0,0 +1,46 @@
+"""Side-effect-free scoring core for ClinIQ.
+
+Importing this package does not import Streamlit, openpyxl or reportlab and
+does not touch any data file, so batch jobs and workers can score attempts in a
+plain Python process:
+
+    from cliniq_core import score_intake, score_selectN, nclex_score_item
+
+app.py imports the same functions, so UI and offline scores always agree.
+cliniq_core.lazy holds the deferred-import helpers; cliniq_core.headless (not
+imported here) loads app.py's builders for the CLI and benchmarks.
+"""
+from .pseudonym import Pseudonymizer, study_epoch
+from .psychometrics import _kr20_from_matrix, _point_biserial, _safe_float, _top_bottom_discrimination
+from .scoring import (
+    GENERIC_DOMAIN_DISTRACTORS,
+    SYSTEM_DISTRACTORS,
+    UNSAFE_PATTERNS,
+    _overlap_ratio,
+    _token_set,
+    apply_unsafe_penalty,
+    build_domain_options,
+    detect_unsafe,
+    diff_selected_vs_gold,
+    infer_system_key,
+    item_match,
+    nclex_score_item,
+    rubric_match_report,
+    score_from_matched,
+    score_intake,
+    score_select4,
+    score_selectN,
+    shuffle_if_needed,
+)
+from .telemetry import AnswerChangeTracker
+from .text import STOPWORDS, norm, normalize_text_basic, safe_get_setting, safe_get_system, sha256_hex, tokenize
+
+__all__ = [
+    "AnswerChangeTracker", "GENERIC_DOMAIN_DISTRACTORS", "Pseudonymizer", "SYSTEM_DISTRACTORS", "STOPWORDS",
+    "UNSAFE_PATTERNS",
+    "_kr20_from_matrix", "_overlap_ratio", "_point_biserial", "_safe_float", "_token_set", "_top_bottom_discrimination",
+    "apply_unsafe_penalty", "build_domain_options", "detect_unsafe", "diff_selected_vs_gold", "infer_system_key",
+    "item_match", "nclex_score_item", "norm", "normalize_text_basic", "rubric_match_report", "safe_get_setting",
+    "safe_get_system", "score_from_matched", "score_intake", "score_select4", "score_selectN", "sha256_hex",
+    "shuffle_if_needed", "study_epoch", "tokenize",
+]
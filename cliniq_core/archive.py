@@ -0,0 +1,127 @@
+"""Compressed JSONL archives with streaming readers.
+
+Codecs are pluggable: gzip and lzma (stdlib) are always there, zstd is used
+when the `zstandard` package is installed. The codec is chosen by name when
+writing and recognized by file suffix when reading, so callers just do
+
+    stats = compress_files([seg1, seg2], BACKUP_DIR / "attempts_log_x.jsonl", "gzip")
+    for rec in iter_archive_records(stats["path"]):
+        ...
+
+Nothing is ever decompressed to disk.
+"""
+import gzip
+import io
+import json
+import lzma
+import os
+import shutil
+import time
+from pathlib import Path
+
+from .lazy import module_available
+
+_CHUNK = 1024 * 1024
+
+
+def _zstd_open(path, mode, level):
+    import zstandard  # optional dependency
+
+    if "r" in mode:
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    else:
+        raw = zstandard.ZstdCompressor(level=level or 10).stream_writer(open(path, "wb"), closefd=True)
+    return io.TextIOWrapper(raw, encoding="utf-8") if "t" in mode else raw
+
+
+# name -> (suffix, opener(path, mode, level), default level)
+CODECS = {
+    "gzip": (".gz", lambda p, m, lv: gzip.open(p, m, compresslevel=lv or 6, **({"encoding": "utf-8"} if "t" in m else {})), 6),
+    # lzma refuses a preset when reading, so it is only passed for writes
+    "lzma": (".xz", lambda p, m, lv: lzma.open(p, m, **({"preset": lv if lv is not None else 6} if "w" in m else {}),
+                                               **({"encoding": "utf-8"} if "t" in m else {})), 6),
+    "zstd": (".zst", _zstd_open, 10),
+}
+ARCHIVE_SUFFIXES = {suffix: name for name, (suffix, _o, _l) in CODECS.items()}
+
+
+class ArchiveReadError(RuntimeError):
+    """An archive could not be opened or decompressed (its records would otherwise go missing silently)."""
+
+
+def available_codecs() -> list[str]:
+    return [name for name in CODECS if name != "zstd" or module_available("zstandard")]
+
+
+def resolve_codec(name: str | None) -> str:
+    """Requested codec if usable, else gzip (zstd silently falls back when not installed)."""
+    name = str(name or "gzip").strip().lower()
+    return name if name in available_codecs() else "gzip"
+
+
+def codec_for_path(path) -> str | None:
+    return ARCHIVE_SUFFIXES.get(Path(path).suffix)
+
+
+def open_archive(path, mode: str = "rt", level: int | None = None):
+    """Open a compressed (by suffix) or plain file as a stream."""
+    codec = codec_for_path(path)
+    if codec is None:
+        return open(path, mode if "b" in mode else mode.replace("t", ""), **({} if "b" in mode else {"encoding": "utf-8"}))
+    return CODECS[codec][1](path, mode, level)
+
+
+def iter_archive_records(path):
+    """Yield dict records from a (compressed) JSONL file, decompressing on the fly.
+
+    Malformed JSON lines are skipped; a file that cannot be opened or decompressed raises
+    ArchiveReadError.
+    """
+    try:
+        with open_archive(path, "rt") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue
+                if isinstance(rec, dict):
+                    yield rec
+    except Exception as e:  # OSError, EOFError, LZMAError, zstd errors, missing zstandard, bad UTF-8
+        raise ArchiveReadError(f"cannot read archive {Path(path).name}: {e}") from e
+
+
+def compress_files(sources, dest, codec: str = "gzip", level: int | None = None) -> dict:
+    """Stream-concatenate `sources` into `dest` + codec suffix (atomic). Returns size/ratio/throughput."""
+    codec = resolve_codec(codec)
+    suffix = CODECS[codec][0]
+    dest = Path(dest)
+    if dest.suffix != suffix:
+        dest = dest.with_name(dest.name + suffix)
+    tmp = dest.with_name(dest.name + ".tmp")
+    t0 = time.perf_counter()
+    bytes_in = 0
+    with CODECS[codec][1](tmp, "wb", level) as out:
+        for src in sources:
+            with open(src, "rb") as f:
+                shutil.copyfileobj(f, out, _CHUNK)
+            bytes_in += os.path.getsize(src)
+    os.replace(tmp, dest)
+    secs = max(time.perf_counter() - t0, 1e-9)
+    bytes_out = dest.stat().st_size
+    return {
+        "path": dest,
+        "codec": codec,
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "ratio": round(bytes_in / bytes_out, 2) if bytes_out else 0.0,
+        "seconds": round(secs, 3),
+        "mb_per_s": round(bytes_in / secs / 1e6, 1),
+    }
+
+
+def describe_stats(stats: dict) -> str:
+    return (f"{stats['bytes_in']:,} → {stats['bytes_out']:,} bytes ({stats['codec']}, {stats['ratio']}x) "
+            f"in {stats['seconds']}s ({stats['mb_per_s']} MB/s)")
@@ -0,0 +1,152 @@
+"""Computerized-adaptive item selection for the NCLEX practical.
+
+`ItemInfoTable` is built once per case pack from calibrated parameters
+(nclex_irt_params.json) and precomputes, on a fixed ability grid:
+
+    log P / log Q per item and grid point   (posterior updates are row sums)
+    items ordered by Fisher information     (a² P Q, highest first)
+
+so choosing the next item is "walk the precomputed order at the grid point
+nearest θ and take the first unused qid" — no model evaluation at request
+time. Ability is the EAP over the same grid with a N(0, σ²) prior, σ being
+the calibration's ability SD (`theta_sd`: estimated for Rasch, 1 for 2PL), so
+the prior lives on the same θ metric as b; SE is the posterior SD. Items
+never calibrated get a = 1 and b from their difficulty tag, so a partly
+calibrated bank still works.
+
+The per-session state is a plain dict (session_state / autosave friendly):
+
+    {"administered": [qid, ...], "responses": [0/1, ...], "theta", "se",
+     "done", "stop_reason"}
+"""
+import math
+
+GRID_MIN, GRID_MAX, GRID_STEP = -4.0, 4.0, 0.1
+DIFFICULTY_TAG_B = {"easy": -1.0, "medium": 0.0, "moderate": 0.0, "hard": 1.0}
+
+
+def _log_sigmoid(z: float) -> float:
+    return -math.log1p(math.exp(-z)) if z >= 0 else z - math.log1p(math.exp(z))
+
+
+class ItemInfoTable:
+    __slots__ = ("qids", "index", "grid", "log_p", "log_q", "info", "order", "sources", "_log_prior", "_prior_precision")
+
+    def __init__(self, params: dict, prior_sd: float = 1.0):
+        """params: qid -> {"a", "b", "source"}; see item_params_for_pool(). prior_sd: the calibration's theta_sd."""
+        n_grid = int(round((GRID_MAX - GRID_MIN) / GRID_STEP)) + 1
+        self.grid = [GRID_MIN + GRID_STEP * g for g in range(n_grid)]
+        sd = float(prior_sd) if prior_sd and float(prior_sd) > 0 else 1.0
+        self._log_prior = [-0.5 * (t / sd) ** 2 for t in self.grid]
+        self._prior_precision = 1.0 / (sd * sd)
+        self.qids = [str(q) for q in params]
+        self.index = {q: i for i, q in enumerate(self.qids)}
+        self.sources = [str(params[q].get("source", "")) for q in params]
+        self.log_p, self.log_q, self.info = [], [], []
+        for q in params:
+            a = float(params[q].get("a", 1.0) or 1.0)
+            b = float(params[q].get("b", 0.0) or 0.0)
+            zs = [a * (t - b) for t in self.grid]
+            self.log_p.append([_log_sigmoid(z) for z in zs])
+            self.log_q.append([_log_sigmoid(-z) for z in zs])
+            ps = [1.0 / (1.0 + math.exp(-z)) for z in zs]
+            self.info.append([a * a * p * (1.0 - p) for p in ps])
+        self.order = [sorted(range(len(self.qids)), key=lambda i: -self.info[i][g]) for g in range(n_grid)]
+
+    def __len__(self):
+        return len(self.qids)
+
+    def _grid_index(self, theta: float) -> int:
+        g = int(round((float(theta) - GRID_MIN) / GRID_STEP))
+        return max(0, min(len(self.grid) - 1, g))
+
+    def next_item(self, theta: float, exclude=()) -> str | None:
+        """Unused qid with maximum information at theta (None when the pool is exhausted)."""
+        exclude = exclude if isinstance(exclude, (set, frozenset, dict)) else set(exclude)
+        for i in self.order[self._grid_index(theta)]:
+            if self.qids[i] not in exclude:
+                return self.qids[i]
+        return None
+
+    def estimate(self, qids, responses) -> tuple[float, float]:
+        """EAP theta and posterior SD from scored responses (unknown qids are ignored)."""
+        post = list(self._log_prior)
+        for q, y in zip(qids, responses):
+            i = self.index.get(str(q))
+            if i is None:
+                continue
+            row = self.log_p[i] if y else self.log_q[i]
+            post = [lp + r for lp, r in zip(post, row)]
+        m = max(post)
+        w = [math.exp(lp - m) for lp in post]
+        s = sum(w)
+        theta = sum(wi * t for wi, t in zip(w, self.grid)) / s
+        var = sum(wi * (t - theta) ** 2 for wi, t in zip(w, self.grid)) / s
+        return theta, math.sqrt(max(var, 0.0))
+
+    def expected_length(self, min_items: int, max_items: int, se_target: float) -> tuple[float, float]:
+        """(mean test length, share stopping on precision) over the prior.
+
+        At each grid θ the SE after n items is taken as 1 / sqrt(prior precision + information of the n
+        most informative items at θ), i.e. items perfectly targeted at the true ability. Real sessions
+        estimate θ as they go, so treat the length as a lower bound.
+        """
+        cap = min(int(max_items), len(self.qids))
+        floor = max(1, int(min_items))
+        w_total = length = precise = 0.0
+        for g, lp in enumerate(self._log_prior):
+            w = math.exp(lp)
+            total, n_stop, hit = self._prior_precision, cap, False
+            for n, i in enumerate(self.order[g][:cap], start=1):
+                total += self.info[i][g]
+                if n >= floor and total >= 1.0 / (float(se_target) ** 2):
+                    n_stop, hit = n, True
+                    break
+            w_total += w
+            length += w * n_stop
+            precise += w * hit
+        return length / w_total, precise / w_total
+
+
+def item_params_for_pool(items, calibrated: dict) -> dict:
+    """qid -> {"a", "b", "source"} for a case pack: calibrated values first, difficulty tag otherwise."""
+    out = {}
+    for it in items or []:
+        qid = str(it.get("id", "") or "")
+        if not qid:
+            continue
+        p = (calibrated or {}).get(qid)
+        if p and p.get("b") is not None:
+            out[qid] = {"a": float(p.get("a", 1.0) or 1.0), "b": float(p["b"]), "source": "calibrated"}
+        else:
+            tag = str(it.get("difficulty", "") or "").strip().lower()
+            out[qid] = {"a": 1.0, "b": DIFFICULTY_TAG_B.get(tag, 0.0), "source": "difficulty_tag"}
+    return out
+
+
+def new_state() -> dict:
+    return {"administered": [], "responses": [], "theta": 0.0, "se": 1.0, "done": False, "stop_reason": ""}
+
+
+def record_response(table: ItemInfoTable, state: dict, qid: str, correct: bool,
+                    min_items: int, max_items: int, se_target: float) -> dict:
+    """Add one scored response, re-estimate theta/SE and apply the stopping rule (in place)."""
+    state["administered"].append(str(qid))
+    state["responses"].append(1 if correct else 0)
+    theta, se = table.estimate(state["administered"], state["responses"])
+    state["theta"], state["se"] = round(theta, 4), round(se, 4)
+    n = len(state["administered"])
+    if n >= int(min_items) and se <= float(se_target):
+        state["done"], state["stop_reason"] = True, "precision"
+    elif n >= int(max_items):
+        state["done"], state["stop_reason"] = True, "max_items"
+    elif table.next_item(theta, set(state["administered"])) is None:
+        state["done"], state["stop_reason"] = True, "pool_exhausted"
+    return state
+
+
+def current_item(table: ItemInfoTable, state: dict) -> str | None:
+    """The item to show now (None once the test has stopped)."""
+    if state.get("done"):
+        return None
+    return table.next_item(state.get("theta", 0.0), set(state.get("administered") or []))
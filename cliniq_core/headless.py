@@ -0,0 +1,65 @@
+"""Load app.py's functions and constants without running the Streamlit UI.
+
+app.py is a single Streamlit script: importing it renders the whole app. For
+benchmarks and offline jobs we only need its function definitions, so this
+module parses app.py and executes just:
+
+- imports (including the optional reportlab try/except block),
+- function and class definitions,
+- plain module-level assignments that do not touch `st`.
+
+Top-level UI statements (widgets, `if` blocks, `st.stop()`, backups on start)
+are skipped. BASE_DIR is redirected to `base_dir` so every *_PATH constant
+points at the data folder you pass in (e.g. a synthetic dataset).
+
+Streamlit must still be installed (decorators such as @st.cache_resource are
+evaluated), but no Streamlit server is started. Used by cliniq_cli.py and the
+bench/ scripts; not imported by the package __init__.
+"""
+import ast
+import sys
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def _uses_st(node) -> bool:
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name) and n.id == "st":
+            return True
+    return False
+
+
+def _is_import_block(node) -> bool:
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return True
+    if isinstance(node, ast.Try):
+        return all(isinstance(b, (ast.Import, ast.ImportFrom, ast.Assign)) for b in node.body)
+    return False
+
+
+def load_app_namespace(base_dir, app_path=APP_PATH) -> dict:
+    """Return a dict of app.py's top-level names with BASE_DIR = base_dir."""
+    base_dir = Path(base_dir).resolve()
+    app_path = Path(app_path)
+    if str(app_path.resolve().parent) not in sys.path:
+        sys.path.insert(0, str(app_path.resolve().parent))  # app.py imports cliniq_core from its own folder
+    tree = ast.parse(app_path.read_text(encoding="utf-8"), filename=str(app_path))
+    ns = {"__name__": "cliniq_app_headless", "__file__": str(base_dir / "app.py")}
+    skipped = []
+    for node in tree.body:
+        if _is_import_block(node) or isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            pass
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)) and not _uses_st(node):
+            pass
+        else:
+            continue
+        code = compile(ast.Module(body=[node], type_ignores=[]), str(app_path), "exec")
+        try:
+            exec(code, ns)
+        except Exception as e:  # best-effort: a failing constant should not block the rest
+            skipped.append((getattr(node, "lineno", 0), repr(e)))
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "BASE_DIR" for t in node.targets):
+            ns["BASE_DIR"] = base_dir
+    ns["_HEADLESS_SKIPPED"] = skipped
+    return ns
@@ -0,0 +1,105 @@
+"""Running per-item sufficient statistics for NCLEX items.
+
+Each saved attempt updates, per qid: n, Σx, Σt, Σt², Σx·t, wrong count and
+per-option selection counts, where x is the dichotomous item score (full
+points = 1) and t is the attempt's rest score (dichotomous total minus this
+item, as in the psychometrics export). Difficulty p, wrong-% and a
+point-biserial are then O(1) per item:
+
+    r = (nΣxt − ΣxΣt) / sqrt((nΣx − (Σx)²)(nΣt² − (Σt)²))
+
+That is the Pearson form; cliniq_core.psychometrics._point_biserial uses the
+sample SD of t, so the two differ by a factor of sqrt((n−1)/n) (approximate,
+converging as n grows). Use the exact recompute for publication numbers.
+"""
+import math
+
+STATS_VERSION = 1
+
+
+def empty_item_stats() -> dict:
+    return {"version": STATS_VERSION, "attempts": 0, "items": {}}
+
+
+def _dichotomous_scores(rec: dict) -> dict:
+    nblob = rec.get("nclex") if isinstance(rec.get("nclex"), dict) else {}
+    details = nblob.get("details") if isinstance(nblob.get("details"), list) else []
+    scores = {}
+    for d in details:
+        if not isinstance(d, dict) or not d.get("qid"):
+            continue
+        try:
+            mx = float(d.get("max") or 1.0)
+            pts = float(d.get("points") or 0.0)
+        except Exception:
+            mx, pts = 1.0, 0.0
+        scores[str(d["qid"])] = 1 if pts >= (mx if mx > 0 else 1.0) else 0
+    return scores
+
+
+def _option_keys(ans) -> list[str]:
+    if isinstance(ans, str):
+        return [ans] if ans else []
+    if isinstance(ans, (list, tuple)):
+        return [str(a) for a in ans if a not in (None, "")]
+    if isinstance(ans, dict):
+        return [f"{k}={v}" for k, v in ans.items() if v not in (None, "")]
+    return []
+
+
+def add_attempt(stats: dict, rec: dict) -> bool:
+    """Fold one attempt record into stats (in place). False if it has no NCLEX details."""
+    scores = _dichotomous_scores(rec) if isinstance(rec, dict) else {}
+    if not scores:
+        return False
+    total = sum(scores.values())
+    answers = rec.get("nclex_answers") if isinstance(rec.get("nclex_answers"), dict) else {}
+    case_id = str(rec.get("caseId", "") or "")
+    items = stats["items"]
+    for qid, x in scores.items():
+        e = items.get(qid)
+        if e is None:
+            e = items[qid] = {"n": 0, "sum_x": 0, "sum_t": 0.0, "sum_t2": 0.0, "sum_xt": 0.0,
+                              "wrong": 0, "options": {}, "case_id": case_id}
+        t = float(total - x)
+        e["n"] += 1
+        e["sum_x"] += x
+        e["sum_t"] += t
+        e["sum_t2"] += t * t
+        e["sum_xt"] += x * t
+        e["wrong"] += 0 if x else 1
+        if case_id:
+            e["case_id"] = case_id
+        opts = e["options"]
+        for k in _option_keys(answers.get(qid)):
+            opts[k] = opts.get(k, 0) + 1
+    stats["attempts"] = int(stats.get("attempts", 0)) + 1
+    return True
+
+
+def build_item_stats(records) -> dict:
+    """Full recompute from an iterable of attempt records."""
+    stats = empty_item_stats()
+    for rec in records:
+        add_attempt(stats, rec)
+    return stats
+
+
+def item_summary(e: dict) -> dict:
+    """n, p, wrong %, approximate point-biserial and the most-picked options for one item."""
+    n = int(e.get("n", 0) or 0)
+    sx, st_, st2, sxt = float(e["sum_x"]), float(e["sum_t"]), float(e["sum_t2"]), float(e["sum_xt"])
+    r_pb = None
+    if n >= 5:
+        den = (n * sx - sx * sx) * (n * st2 - st_ * st_)
+        if den > 0:
+            r_pb = (n * sxt - sx * st_) / math.sqrt(den)
+    opts = sorted((e.get("options") or {}).items(), key=lambda kv: -kv[1])[:4]
+    return {
+        "n": n,
+        "p": (sx / n) if n else None,
+        "wrong_pct": round(100.0 * int(e.get("wrong", 0)) / n, 1) if n else 0.0,
+        "r_pb": r_pb,
+        "top_options": "; ".join(f"{k} ({v})" for k, v in opts),
+        "case_id": e.get("case_id", ""),
+    }
@@ -0,0 +1,64 @@
+"""Deferred imports for heavy optional libraries (PDF, Excel, DOCX).
+
+`lazy_import("openpyxl")` returns a stand-in that imports the real module on
+first attribute access, so a module-level name costs nothing until a code path
+actually uses it. `module_available()` answers "is it installed?" without
+importing anything.
+
+HEAVY_MODULES are the packages the student path must never load; the app and
+bench/import_budget.py use `heavy_modules_loaded()` to check that.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+
+HEAVY_MODULES = ("reportlab", "openpyxl", "docx")
+
+
+class _LazyModule:
+    __slots__ = ("_name", "_module", "_lock")
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        mod = self._module
+        if mod is None:
+            with self._lock:
+                mod = self._module
+                if mod is None:
+                    mod = importlib.import_module(self._name)
+                    object.__setattr__(self, "_module", mod)
+        return mod
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str):
+    """Return `name` if already imported, else a proxy that imports it on first use."""
+    mod = sys.modules.get(name)
+    return mod if mod is not None else _LazyModule(name)
+
+
+def module_available(name: str) -> bool:
+    """True if `name` can be imported (checked via find_spec; nothing is executed)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except Exception:
+        return False
+
+
+def heavy_modules_loaded() -> list[str]:
+    """Top-level HEAVY_MODULES currently present in sys.modules."""
+    return [m for m in HEAVY_MODULES if m in sys.modules]
@@ -0,0 +1,94 @@
+"""Classical item statistics used by the NCLEX psychometrics export."""
+import math
+
+
+def _safe_float(x, default=None):
+    try:
+        if x is None or x == "":
+            return default
+        return float(x)
+    except Exception:
+        return default
+
+
+def _point_biserial(item_scores: list[int], total_scores: list[float]):
+    """Point-biserial correlation between item (0/1) and total score."""
+    try:
+        n = len(item_scores)
+        if n < 5:
+            return None
+        # totals variance
+        mt = sum(total_scores) / n
+        vt = sum((t - mt) ** 2 for t in total_scores)
+        if vt <= 0:
+            return None
+        st = math.sqrt(vt / (n - 1))
+        if st <= 0:
+            return None
+
+        p = sum(item_scores) / n
+        q = 1 - p
+        if p <= 0 or p >= 1:
+            return None
+
+        # mean total for correct vs incorrect
+        tot1 = [total_scores[i] for i in range(n) if item_scores[i] == 1]
+        tot0 = [total_scores[i] for i in range(n) if item_scores[i] == 0]
+        if len(tot1) < 2 or len(tot0) < 2:
+            return None
+        m1 = sum(tot1) / len(tot1)
+        m0 = sum(tot0) / len(tot0)
+        r_pb = (m1 - m0) / st * math.sqrt(p * q)
+        return r_pb
+    except Exception:
+        return None
+
+
+def _top_bottom_discrimination(item_scores: list[int], total_scores: list[float], frac: float = 0.27):
+    """Top–bottom discrimination (difference in p between top and bottom groups)."""
+    try:
+        n = len(item_scores)
+        if n < 10:
+            return None
+        idx = list(range(n))
+        idx.sort(key=lambda i: total_scores[i])
+        g = max(1, int(round(n * frac)))
+        bottom = idx[:g]
+        top = idx[-g:]
+        p_top = sum(item_scores[i] for i in top) / len(top)
+        p_bottom = sum(item_scores[i] for i in bottom) / len(bottom)
+        return p_top - p_bottom
+    except Exception:
+        return None
+
+
+def _kr20_from_matrix(matrix: list[list[int]]):
+    """KR-20 from a 0/1 matrix (rows=examinees, cols=items)."""
+    try:
+        if not matrix:
+            return None
+        k = len(matrix[0])
+        if k < 2:
+            return None
+        # total scores
+        totals = [sum(row) for row in matrix]
+        n = len(totals)
+        if n < 3:
+            return None
+        mean_t = sum(totals) / n
+        var_t = sum((t - mean_t) ** 2 for t in totals) / (n - 1) if n > 1 else 0.0
+        if var_t <= 0:
+            return None
+
+        # sum p*q across items
+        pq_sum = 0.0
+        for j in range(k):
+            col = [row[j] for row in matrix]
+            p = sum(col) / n
+            q = 1 - p
+            pq_sum += p * q
+
+        kr20 = (k / (k - 1)) * (1 - (pq_sum / var_t))
+        return kr20
+    except Exception:
+        return None
@@ -0,0 +1,144 @@
+"""Blueprint-constrained active-set selection for NCLEX rotation.
+
+For one case pack, `build_active_set` picks k items so that
+
+    client-need counts   ≈ k × client_need_blueprint (largest-remainder quotas)
+    difficulty counts    ≈ k × difficulty_mix
+    recently used items  (last K rotations) are avoided when the bank allows
+
+Greedy fill: items are visited in a seeded random order (fresh before recent)
+and each step takes the first item that closes the most open quota. Repair:
+single swaps (selected ↔ unselected) are applied while they lower the cost
+
+    Σ|count_c − quota_c| + Σ|count_d − quota_d| + REUSE_PENALTY × reused
+
+which fixes what greedy order could not (e.g. a scarce category reached late).
+A case is a few hundred comparisons; all 30+ cases take milliseconds.
+"""
+import random
+
+# NCLEX client-need subcategories -> top-level category (items often carry only the subcategory)
+CLIENT_NEED_PARENTS = {
+    "management of care": "Safe and Effective Care Environment",
+    "safety and infection control": "Safe and Effective Care Environment",
+    "basic care and comfort": "Physiological Integrity",
+    "pharmacological and parenteral therapies": "Physiological Integrity",
+    "reduction of risk potential": "Physiological Integrity",
+    "physiological adaptation": "Physiological Integrity",
+}
+REUSE_PENALTY = 0.5
+MAX_REPAIR_PASSES = 20
+
+
+def client_need_category(value, categories) -> str:
+    """Blueprint category for an item's client_need ("" when it matches none)."""
+    v = str(value or "").strip()
+    low = v.lower()
+    for c in categories:
+        if low.startswith(str(c).lower()):
+            return c
+    for sub, parent in CLIENT_NEED_PARENTS.items():
+        if sub in low and parent in categories:
+            return parent
+    return ""
+
+
+def apportion(weights: dict, k: int) -> dict:
+    """Integer quotas summing to k from non-negative weights (largest remainder)."""
+    w = {key: max(0.0, float(v or 0.0)) for key, v in (weights or {}).items()}
+    total = sum(w.values())
+    if k <= 0 or total <= 0:
+        return {key: 0 for key in w}
+    exact = {key: k * v / total for key, v in w.items()}
+    quotas = {key: int(x) for key, x in exact.items()}
+    for key in sorted(exact, key=lambda key: -(exact[key] - quotas[key]))[:k - sum(quotas.values())]:
+        quotas[key] += 1
+    return quotas
+
+
+def _cost(counts_c, quota_c, counts_d, quota_d, reused) -> float:
+    return (sum(abs(counts_c.get(c, 0) - q) for c, q in quota_c.items())
+            + sum(abs(counts_d.get(d, 0) - q) for d, q in quota_d.items())
+            + REUSE_PENALTY * reused)
+
+
+def build_active_set(items, k: int, blueprint: dict | None = None, difficulty_mix: dict | None = None,
+                     recent=(), rng: random.Random | None = None) -> tuple[list[str], dict]:
+    """(qids, report) for one case. `items` are already type-filtered bank items."""
+    rng = rng or random.Random()
+    recent = set(recent or ())
+    categories = [c for c, v in (blueprint or {}).items() if float(v or 0) > 0]
+    pool = []
+    for it in items or []:
+        qid = str(it.get("id", "") or "").strip()
+        if qid:
+            pool.append((qid, client_need_category(it.get("client_need"), categories),
+                         str(it.get("difficulty", "") or "").strip().lower(), qid in recent))
+    k = min(int(k), len(pool))
+    quota_c = apportion({c: blueprint[c] for c in categories}, k) if categories else {}
+    quota_d = apportion(difficulty_mix or {}, k) if difficulty_mix else {}
+
+    rng.shuffle(pool)
+    pool.sort(key=lambda p: p[3])  # stable: fresh items first, random order within each group
+    counts_c, counts_d = {}, {}
+    chosen, rest = [], list(pool)
+
+    def _gain(p):
+        return (2 if counts_c.get(p[1], 0) < quota_c.get(p[1], 0) else 0) + \
+               (1 if counts_d.get(p[2], 0) < quota_d.get(p[2], 0) else 0) - (1 if p[3] else 0)
+
+    while len(chosen) < k:
+        best_i, best_g = 0, None
+        for i, p in enumerate(rest):
+            g = _gain(p)
+            if best_g is None or g > best_g:
+                best_i, best_g = i, g
+                if g >= 3:
+                    break
+        p = rest.pop(best_i)
+        chosen.append(p)
+        counts_c[p[1]] = counts_c.get(p[1], 0) + 1
+        counts_d[p[2]] = counts_d.get(p[2], 0) + 1
+
+    # repair: best-improvement single swaps
+    reused = sum(1 for p in chosen if p[3])
+    cost = _cost(counts_c, quota_c, counts_d, quota_d, reused)
+    for _ in range(MAX_REPAIR_PASSES):
+        best = None
+        for i, out in enumerate(chosen):
+            for j, inn in enumerate(rest):
+                if out[1] == inn[1] and out[2] == inn[2] and out[3] <= inn[3]:
+                    continue
+                counts_c[out[1]] -= 1
+                counts_d[out[2]] -= 1
+                counts_c[inn[1]] = counts_c.get(inn[1], 0) + 1
+                counts_d[inn[2]] = counts_d.get(inn[2], 0) + 1
+                c = _cost(counts_c, quota_c, counts_d, quota_d, reused - out[3] + inn[3])
+                counts_c[inn[1]] -= 1
+                counts_d[inn[2]] -= 1
+                counts_c[out[1]] += 1
+                counts_d[out[2]] += 1
+                if c < cost - 1e-9 and (best is None or c < best[0]):
+                    best = (c, i, j)
+        if best is None:
+            break
+        cost, i, j = best
+        out, inn = chosen[i], rest[j]
+        chosen[i], rest[j] = inn, out
+        counts_c[out[1]] -= 1
+        counts_d[out[2]] -= 1
+        counts_c[inn[1]] = counts_c.get(inn[1], 0) + 1
+        counts_d[inn[2]] = counts_d.get(inn[2], 0) + 1
+        reused += inn[3] - out[3]
+
+    rng.shuffle(chosen)
+    report = {
+        "k": k,
+        "bank": len(pool),
+        "reused_recent": reused,
+        "blueprint_deviation": sum(abs(counts_c.get(c, 0) - q) for c, q in quota_c.items()),
+        "difficulty_deviation": sum(abs(counts_d.get(d, 0) - q) for d, q in quota_d.items()),
+        "client_need": {c: f"{counts_c.get(c, 0)}/{q}" for c, q in quota_c.items()},
+        "difficulty": {d: f"{counts_d.get(d, 0)}/{q}" for d, q in quota_d.items()},
+    }
+    return [p[0] for p in chosen], report
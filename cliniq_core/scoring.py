@@ -0,0 +1,598 @@
+"""Intake, A–E domain and NCLEX item scoring.
+
+Pure functions: no Streamlit, file I/O or session state. app.py renders the
+results; batch jobs can call these directly on stored attempts.
+"""
+import hashlib
+import random
+import re
+
+from .text import norm, normalize_text_basic, safe_get_setting, safe_get_system, sha256_hex, tokenize
+
+
+# =============================
+# Intake (5 marks)
+# =============================
+def _token_set(s: str):
+    return set(tokenize(s or ""))
+
+
+def _overlap_ratio(a: str, b: str) -> float:
+    A = _token_set(a)
+    B = _token_set(b)
+    if not A or not B:
+        return 0.0
+    return len(A & B) / max(1, len(B))
+
+
+def score_intake(case: dict, intake: dict) -> tuple[int, dict]:
+    """Score student intake out of 5 using overlap against the case ground truth."""
+    intake = intake or {}
+    patient = case.get("patient", {}) if isinstance(case.get("patient", {}), dict) else {}
+    expected_age = str(patient.get("age", "")).strip()
+    expected_setting = str(safe_get_setting(case) or "")
+    expected_cc = str(case.get("chiefComplaint", "") or "")
+    expected_hist = " ".join([
+        " ".join((case.get("history", {}) or {}).get("pmh", []) if isinstance((case.get("history", {}) or {}).get("pmh", []), list) else []),
+        " ".join((case.get("history", {}) or {}).get("meds", []) if isinstance((case.get("history", {}) or {}).get("meds", []), list) else []),
+        " ".join((case.get("history", {}) or {}).get("allergies", []) if isinstance((case.get("history", {}) or {}).get("allergies", []), list) else []),
+        str((case.get("history", {}) or {}).get("social", "") or ""),
+        str((case.get("history", {}) or {}).get("hpi", "") or ""),
+    ]).strip()
+
+    vitals = case.get("vitals", {}) if isinstance(case.get("vitals", {}), dict) else {}
+    vit_text = " ".join([f"{k} {vitals.get(k,'')}" for k in vitals.keys() if str(vitals.get(k,'')).strip()])
+    findings = case.get("findings", []) if isinstance(case.get("findings", []), list) else []
+    findings_text = " ".join([str(x) for x in findings if str(x).strip()])
+
+    expected_sx = (expected_cc + " " + vit_text + " " + findings_text).strip()
+
+    # Student inputs
+    s_age = str(intake.get("age", "")).strip()
+    s_setting = str(intake.get("setting", "")).strip()
+    s_cc = str(intake.get("chief_complaint", "")).strip()
+    s_sx = str(intake.get("signs_symptoms", "")).strip()
+    s_findings = str(intake.get("findings", "")).strip()
+    s_hist = str(intake.get("history", "")).strip()
+
+    breakdown = {}
+    score = 0
+
+    # 1) Age (exact or close numeric)
+    age_ok = False
+    try:
+        ea = int(re.findall(r"\d+", expected_age)[0]) if expected_age else None
+        sa = int(re.findall(r"\d+", s_age)[0]) if s_age else None
+        if ea is not None and sa is not None and abs(ea - sa) <= 5:
+            age_ok = True
+    except Exception:
+        age_ok = False
+    if age_ok or (expected_age and s_age and expected_age == s_age):
+        score += 1
+        breakdown["age"] = 1
+    else:
+        breakdown["age"] = 0
+
+    # 2) Setting (token overlap)
+    setting_ratio = _overlap_ratio(s_setting, expected_setting)
+    if expected_setting and setting_ratio >= 0.45:
+        score += 1
+        breakdown["setting"] = 1
+    else:
+        breakdown["setting"] = 0
+
+    # 3) Chief complaint
+    cc_ratio = _overlap_ratio(s_cc, expected_cc)
+    if expected_cc and cc_ratio >= 0.45:
+        score += 1
+        breakdown["chief_complaint"] = 1
+    else:
+        breakdown["chief_complaint"] = 0
+
+    # 4) Major signs/symptoms + findings (combined)
+    sx_student = (s_sx + " " + s_findings).strip()
+    sx_ratio = _overlap_ratio(sx_student, expected_sx)
+    if expected_sx and sx_ratio >= 0.30:
+        score += 1
+        breakdown["signs_symptoms_findings"] = 1
+    else:
+        breakdown["signs_symptoms_findings"] = 0
+
+    # 5) History
+    hist_ratio = _overlap_ratio(s_hist, expected_hist)
+    if expected_hist and hist_ratio >= 0.25:
+        score += 1
+        breakdown["history"] = 1
+    else:
+        breakdown["history"] = 0
+
+    return int(score), breakdown
+
+
+# =============================
+# A–D domain options + selection scoring
+# =============================
+SYSTEM_DISTRACTORS = {
+    "Cardiovascular": {
+        "A": [
+            "Ask about long-term diet goals only and delay immediate assessment",
+            "Complete discharge planning before stabilizing the patient",
+            "Assess pain only and skip focused cardiopulmonary assessment",
+            "Perform a full psychosocial interview before obtaining vital signs",
+            "Delay vital signs because the patient is awake and talking",
+            "Focus on sodium education before reassessing instability",
+        ],
+        "B": [
+            "Prioritize completing documentation before reassessment",
+            "Prioritize patient education first despite red flags",
+            "Wait for the next scheduled vital signs without reassessment",
+            "Focus on comfort measures only despite instability",
+            "Arrange routine outpatient follow-up as the first action",
+            "Delay escalation to avoid overreacting",
+        ],
+        "C": [
+            "Administer a medication without verifying orders/allergies",
+            "Change prescribed doses independently",
+            "Allow unassisted ambulation while unstable",
+            "Delay escalation and recheck in 1 hour despite red flags",
+            "Stop oxygen abruptly without targets/orders",
+            "Give extra dose because values are abnormal without protocol",
+        ],
+        "D": [
+            "Reassess only at end of shift regardless of symptoms",
+            "Stop monitoring to reduce alarms",
+            "Do not trend vital signs after interventions",
+            "Reassess only if the patient asks for help",
+            "Skip neuro checks despite headache/visual symptoms",
+            "Document later without trending",
+        ],
+        "E": [
+            "Leave out objective vital signs to keep SBAR brief",
+            "State opinions without objective assessment data",
+            "Recommend medication changes without orders",
+            "Delay calling provider until next round despite red flags",
+            "Do not mention response to interventions",
+            "Request discharge planning as the main recommendation",
+        ],
+    },
+    "Respiratory": {
+        "A": [
+            "Check diet history first and delay respiratory assessment",
+            "Do a full skin assessment before assessing airway",
+            "Focus on family history only and skip SpO2 assessment",
+            "Assess bowel sounds before lung sounds",
+            "Delay vital signs to avoid disturbing the patient",
+            "Ask about exercise routine before checking work of breathing",
+        ],
+        "B": [
+            "Provide education first before treating hypoxia",
+            "Complete documentation before applying oxygen",
+            "Encourage ambulation while dyspneic",
+            "Wait for respiratory therapist without reassessment",
+            "Delay escalation despite increased work of breathing",
+            "Address diet as first priority over breathing",
+        ],
+        "C": [
+            "Discontinue oxygen abruptly without targets/orders",
+            "Administer sedatives without verifying respiratory status",
+            "Delay protocol actions despite wheeze",
+            "Change prescribed doses independently",
+            "Allow oral intake in severe respiratory distress",
+            "Stop monitoring to reduce alarms",
+        ],
+        "D": [
+            "Reassess only once daily regardless of condition",
+            "Stop pulse oximetry to reduce alarms",
+            "Do not reassess after oxygen/nebulizer treatments",
+            "Skip respiratory rate trending",
+            "Ignore accessory muscle use during reassessment",
+            "Document later without trending",
+        ],
+        "E": [
+            "Do not report SpO2 or oxygen requirements",
+            "Provide a vague recommendation with no clear ask",
+            "Leave out response to interventions",
+            "Delay provider call despite deterioration",
+            "Focus SBAR on social history only",
+            "Recommend discharge despite unstable status",
+        ],
+    },
+    "Neurological": {
+        "A": [
+            "Assess diet history only and skip neuro checks",
+            "Delay vital signs to complete full psychosocial interview",
+            "Skip LOC assessment because patient is talking",
+            "Check skin integrity before neuro status",
+            "Focus on sleep hygiene before urgent assessment",
+            "Assess bowel habits first",
+        ],
+        "B": [
+            "Provide reassurance only despite neuro red flags",
+            "Delay reassessment for 1 hour",
+            "Complete paperwork before escalation",
+            "Focus on discharge planning first",
+            "Wait for next scheduled vitals",
+            "Address diet first over neuro status",
+        ],
+        "C": [
+            "Give medication without checking contraindications/orders",
+            "Allow ambulation without fall precautions",
+            "Delay escalation despite acute neuro change",
+            "Change prescribed doses independently",
+            "Ignore seizure precautions when indicated",
+            "Stop monitoring to reduce alarms",
+        ],
+        "D": [
+            "Skip neuro checks during reassessment",
+            "Stop monitoring to reduce alarms",
+            "Reassess only at end of shift",
+            "Do not trend LOC/vitals after interventions",
+            "Ignore headache/vision changes",
+            "Document later without trending",
+        ],
+        "E": [
+            "Do not mention neuro status/LOC in SBAR",
+            "Provide no objective data (vitals, GCS) to provider",
+            "Recommend medication changes without orders",
+            "Delay provider call despite deterioration",
+            "Omit time course/onset details",
+            "Ask for non-urgent consult as main recommendation",
+        ],
+    },
+}
+
+
+GENERIC_DOMAIN_DISTRACTORS = {
+    "A": [
+        "Complete a full head-to-toe exam before checking ABCs",
+        "Focus on documentation first before reassessment",
+        "Discuss discharge planning before stabilizing the patient",
+        "Assess only pain and ignore abnormal vital signs",
+        "Delay vital signs to avoid disturbing the patient",
+        "Ask about lifestyle goals only and delay urgent assessment",
+    ],
+    "B": [
+        "Complete documentation before reassessing the patient",
+        "Provide education first despite instability",
+        "Delay escalation and wait for next scheduled vitals",
+        "Focus on comfort only despite red flags",
+        "Arrange routine follow-up before stabilization",
+        "Address diet first over acute symptoms",
+    ],
+    "C": [
+        "Administer medication without verifying orders/allergies",
+        "Change prescribed doses independently",
+        "Delay escalation despite red flags",
+        "Allow unassisted ambulation while unstable",
+        "Stop monitoring to reduce alarms",
+        "Provide reassurance only and no interventions",
+    ],
+    "D": [
+        "Reassess only at the end of shift regardless of condition",
+        "Do not trend vital signs after interventions",
+        "Stop monitoring to reduce alarms",
+        "Reassess only if the patient asks",
+        "Document later without trending",
+        "Skip reassessment of response to interventions",
+    ],
+    "E": [
+        "Leave out objective data to keep SBAR short",
+        "State opinions without objective assessment",
+        "Recommend medication changes without orders",
+        "Delay provider call despite deterioration",
+        "Omit time course/response to interventions",
+        "Ask for non-urgent tasks as the main recommendation",
+    ],
+}
+
+
+def infer_system_key(case: dict) -> str:
+    s = (safe_get_system(case) or "").lower()
+    if "card" in s or "cv" in s or "hypert" in s or "heart" in s:
+        return "Cardiovascular"
+    if "resp" in s or "pulm" in s or "asth" in s or "copd" in s:
+        return "Respiratory"
+    if "neuro" in s or "stroke" in s or "seiz" in s:
+        return "Neurological"
+    return "Generic"
+
+
+def build_domain_options(domain_key: str, case: dict, gold_list: list, total: int = 10, distractors: int = 6):
+    """Build multi-select options for a domain (A–D).
+
+    IMPORTANT (fairness):
+    - We do NOT force '4 correct' anymore.
+    - The required selection count is the number of gold-standard targets available for that domain in the case.
+    - If a case has 2/3/4 gold targets, the student must select exactly 2/3/4 respectively.
+    """
+    gold = [str(x).strip() for x in (gold_list or []) if str(x).strip()]
+    # Cap very large lists just to keep UI usable (typical cases use 2–4)
+    cap = min(len(gold), 6)
+    goldN = gold[:cap] if cap > 0 else []
+    req_n = len(goldN) if goldN else 4  # safe fallback if a case is missing gold targets
+
+    sys_key = infer_system_key(case)
+
+    pool = []
+    if sys_key != "Generic":
+        pool += SYSTEM_DISTRACTORS.get(sys_key, {}).get(domain_key, [])
+    pool += GENERIC_DOMAIN_DISTRACTORS.get(domain_key, [])
+
+    pool = [p for p in pool if str(p).strip() and str(p).strip() not in set(goldN)]
+
+    picked = []
+    seen = set()
+    for p in pool:
+        p = str(p).strip()
+        if p and p not in seen:
+            seen.add(p)
+            picked.append(p)
+        if len(picked) >= distractors:
+            break
+
+    # Fill if pool is short
+    while len(picked) < distractors:
+        filler = f"Non-priority action ({domain_key}) — routine follow-up"
+        if filler not in seen and filler not in set(goldN):
+            seen.add(filler)
+            picked.append(filler)
+        else:
+            break
+
+    # Ensure enough total options for reasonable choice
+    total = max(int(total or 10), req_n + int(distractors or 6))
+    options = (goldN + picked)[:total]
+
+    # Deterministic shuffle by case_id+domain
+    seed = sha256_hex(f"{case.get('id','')}-{domain_key}-options")[:8]
+    try:
+        r = random.Random(int(seed, 16))
+        r.shuffle(options)
+    except Exception:
+        pass
+
+    return options, goldN
+
+
+def diff_selected_vs_gold(selected: list, gold4: list):
+    selected = [str(x).strip() for x in (selected or []) if str(x).strip()]
+    gold4 = [str(x).strip() for x in (gold4 or []) if str(x).strip()]
+    correct = [x for x in selected if x in gold4]
+    wrong = [x for x in selected if x not in gold4]
+    missed = [x for x in gold4 if x not in selected]
+    return correct, wrong, missed
+
+
+def score_select4(selected: list, gold4: list) -> int:
+    """Backwards-compatible wrapper for score_selectN (kept name to avoid breaking other code)."""
+    return score_selectN(selected, gold4, max_points=len([x for x in (gold4 or []) if str(x).strip()]) or 4)
+
+
+def score_selectN(selected: list, gold_list: list, max_points: int) -> int:
+    """Domain scoring with partial credit and variable max.
+
+    +1 for each correct gold-standard option selected.
+    No negative marking for wrong selections.
+
+    The score is floored at 0 and capped at max_points (typically 4, but may vary by session/question settings).
+    """
+    selected = [str(x).strip() for x in (selected or []) if str(x).strip()]
+    gold_list = [str(x).strip() for x in (gold_list or []) if str(x).strip()]
+    correct = [x for x in selected if x in gold_list]
+
+    score = len(correct)
+
+    if score < 0:
+        score = 0
+    if max_points is None or int(max_points) <= 0:
+        max_points = len(gold_list) or 4
+    if score > int(max_points):
+        score = int(max_points)
+    return int(score)
+
+
+# =============================
+# Free-text rubric matching
+# =============================
+def item_match(student_text: str, gold_item: str) -> bool:
+    stxt = norm(student_text)
+    g = norm(str(gold_item))
+    if not stxt or not g:
+        return False
+    if g in stxt:
+        return True
+    s_tokens = set(tokenize(stxt))
+    g_tokens = set(tokenize(g))
+    if not g_tokens:
+        return False
+    return len(s_tokens.intersection(g_tokens)) >= 1
+
+
+def rubric_match_report(student_text: str, gold_list):
+    gold_list = gold_list or []
+    matched, missed = [], []
+    for g in gold_list:
+        if item_match(student_text, str(g)):
+            matched.append(str(g))
+        else:
+            missed.append(str(g))
+    return matched, missed
+
+
+def score_from_matched(matched_count: int, has_any_text: bool) -> int:
+    if matched_count >= 3:
+        return 4
+    if matched_count == 2:
+        return 3
+    if matched_count == 1:
+        return 2
+    if has_any_text:
+        return 1
+    return 0
+
+
+# =============================
+# Safety flags
+# =============================
+UNSAFE_PATTERNS = [
+    (r"\blower\s+bp\s+quick(ly)?\b", "Rapid BP lowering without orders can cause ischemia/stroke."),
+    (r"\bdouble\s+(the\s+)?dose\b", "Dose changes without orders are unsafe."),
+    (r"\bgive\s+extra\s+dose\b", "Extra dosing without verification/orders is unsafe."),
+    (r"\bpush\s+potassium\b", "IV potassium must NEVER be IV push."),
+    (r"\bbolus\s+insulin\b", "Insulin dosing must follow protocol/orders."),
+    (r"\bdiscontinue\s+oxygen\b", "Stopping oxygen abruptly can worsen hypoxia—follow orders/targets."),
+]
+
+
+def detect_unsafe(text: str):
+    t = norm(text)
+    hits = []
+    for pat, msg in UNSAFE_PATTERNS:
+        if re.search(pat, t):
+            hits.append(msg)
+    return hits
+
+
+def apply_unsafe_penalty(score: int, unsafe_hits):
+    return min(score, 1) if unsafe_hits else score
+
+
+# =============================
+# NCLEX item scoring
+# =============================
+def shuffle_if_needed(options: list, seed_str: str, enabled: bool) -> list:
+    if not enabled:
+        return options
+    # deterministic shuffle per item id
+    rnd = hashlib.sha256(seed_str.encode("utf-8")).hexdigest()
+    # simple deterministic shuffle: sort by hash of (rnd + option)
+    return sorted(list(options), key=lambda x: hashlib.sha256((rnd + "||" + str(x)).encode("utf-8")).hexdigest())
+
+
+def nclex_score_item(item: dict, answer, policy: dict, features: dict):
+    qtype = item.get("type")
+    correct = item.get("correct")
+    max_points = 1
+    points = 0
+    detail = {"qid": item.get("id"), "type": qtype, "points": 0, "max": 1, "correct": False}
+
+    partial_credit = bool(features.get("nclex_partial_credit", False))
+
+    if qtype == "mcq":
+        points = 1 if answer == correct else 0
+
+    elif qtype == "sata":
+        # answer expected list
+        correct_set = set(correct or [])
+        ans_set = set(answer or [])
+        if not partial_credit:
+            points = 1 if ans_set == correct_set else 0
+        else:
+            # simple partial: +1 for each correct chosen, -1 for each extra wrong chosen, floor at 0, normalize to 1
+            # if you want a stricter rule, disable partial_credit.
+            hit = len(ans_set.intersection(correct_set))
+            extra = len(ans_set - correct_set)
+            raw = max(0, hit - extra)
+            points = 1 if (raw > 0 and hit == len(correct_set) and extra == 0) else (1 if raw >= len(correct_set) else 0)
+            # We keep it conservative: either correct=1 or 0. Turn on partial later if you want fractional.
+
+    elif qtype == "ordered_response":
+        # correct expected list
+        corr = list(correct or [])
+        ans = list(answer or [])
+        if not corr:
+            points = 0
+        else:
+            if not partial_credit:
+                points = 1 if ans == corr else 0
+            else:
+                # partial per position (0..1)
+                max_points = len(corr)
+                points = sum(1 for i in range(min(len(ans), len(corr))) if ans[i] == corr[i])
+                detail["max"] = max_points
+                detail["points"] = points
+                detail["correct"] = (points == max_points)
+                return detail
+
+    elif qtype == "cloze":
+        # correct_text OR correct + acceptable
+        correct_text = item.get("correct_text") or correct or ""
+        acceptable = item.get("acceptable") or []
+        ans = normalize_text_basic(answer or "")
+        ok = ans == normalize_text_basic(correct_text)
+        if not ok:
+            for a in acceptable:
+                if ans == normalize_text_basic(a):
+                    ok = True
+                    break
+        points = 1 if ok else 0
+
+    elif qtype == "matrix":
+        # correct expected dict: row -> col
+        corr = item.get("correct") or {}
+        ans = answer or {}
+        rows = item.get("rows") or list(corr.keys())
+        if not partial_credit:
+            ok = True
+            for r in rows:
+                if ans.get(r) != corr.get(r):
+                    ok = False
+                    break
+            points = 1 if ok else 0
+        else:
+            max_points = len(rows) if rows else 1
+            points = 0
+            for r in rows:
+                if ans.get(r) == corr.get(r):
+                    points += 1
+            detail["max"] = max_points
+            detail["points"] = points
+            detail["correct"] = (points == max_points)
+            return detail
+
+    elif qtype == "evolving_case":
+        stages = item.get("stages") or []
+        # answer expected dict stage_index -> stage_answer
+        ans = answer or {}
+        if not partial_credit:
+            ok_all = True
+            for si, stage in enumerate(stages):
+                q = stage.get("question", {}) or {}
+                stype = q.get("type")
+                scorrect = q.get("correct")
+                given = ans.get(str(si))
+                if stype == "mcq":
+                    if given != scorrect:
+                        ok_all = False
+                elif stype == "sata":
+                    if set(given or []) != set(scorrect or []):
+                        ok_all = False
+                else:
+                    ok_all = False
+            points = 1 if ok_all and stages else 0
+        else:
+            max_points = 0
+            points = 0
+            for si, stage in enumerate(stages):
+                q = stage.get("question", {}) or {}
+                stype = q.get("type")
+                scorrect = q.get("correct")
+                given = ans.get(str(si))
+                if stype == "mcq":
+                    max_points += 1
+                    points += 1 if given == scorrect else 0
+                elif stype == "sata":
+                    max_points += 1
+                    points += 1 if set(given or []) == set(scorrect or []) else 0
+            detail["max"] = max_points if max_points else 1
+            detail["points"] = points
+            detail["correct"] = (points == detail["max"])
+            return detail
+
+    else:
+        points = 0
+
+    detail["max"] = max_points
+    detail["points"] = points
+    detail["correct"] = (points == max_points)
+    return detail
@@ -0,0 +1,98 @@
+"""In-session answer-change telemetry for NCLEX items.
+
+`AnswerChangeTracker` lives in st.session_state for one attempt. Per question
+it keeps the initial and final answer, the number of changes and three
+timestamps (first shown, first answered, last answered) in parallel arrays
+indexed by question, so a widget change is a dict lookup plus a few array
+writes. Nothing touches disk; the app serializes `to_record()` once when the
+attempt is finalized.
+"""
+import time
+from array import array
+
+
+def _is_answered(ans) -> bool:
+    return ans is not None and ans != "" and ans != [] and ans != {}
+
+
+def _snapshot(ans):
+    # Widget values are flat lists/dicts of strings; a shallow copy detaches them from the widget.
+    if isinstance(ans, list):
+        return list(ans)
+    if isinstance(ans, dict):
+        return dict(ans)
+    return ans
+
+
+class AnswerChangeTracker:
+    __slots__ = ("_index", "qids", "initial", "final", "changes", "first_seen", "first_answer", "last_answer")
+
+    def __init__(self):
+        self._index = {}
+        self.qids = []
+        self.initial = []
+        self.final = []
+        self.changes = array("I")
+        self.first_seen = array("d")
+        self.first_answer = array("d")
+        self.last_answer = array("d")
+
+    def __len__(self):
+        return len(self.qids)
+
+    def _slot(self, qid) -> int:
+        qid = str(qid)
+        i = self._index.get(qid)
+        if i is None:
+            i = len(self.qids)
+            self._index[qid] = i
+            self.qids.append(qid)
+            self.initial.append(None)
+            self.final.append(None)
+            self.changes.append(0)
+            self.first_seen.append(0.0)
+            self.first_answer.append(0.0)
+            self.last_answer.append(0.0)
+        return i
+
+    def seen(self, qid, ts: float | None = None):
+        """Mark a question as displayed (first time only)."""
+        i = self._slot(qid)
+        if not self.first_seen[i]:
+            self.first_seen[i] = ts or time.time()
+
+    def record(self, qid, prev, ans, ts: float | None = None):
+        """Record the widget value for qid; counts a change only when the answer actually differs."""
+        i = self._slot(qid)
+        if not _is_answered(ans) and self.final[i] is None:
+            return
+        if ans == self.final[i]:
+            return  # same value re-reported on a rerun
+        ts = ts or time.time()
+        if self.initial[i] is None and _is_answered(ans):
+            self.initial[i] = _snapshot(ans)
+            self.first_answer[i] = ts
+        if _is_answered(prev) and prev != ans:
+            self.changes[i] += 1
+        self.final[i] = _snapshot(ans)
+        self.last_answer[i] = ts
+
+    def time_on_item(self, i: int) -> float:
+        start = self.first_seen[i] or self.first_answer[i]
+        end = self.last_answer[i]
+        return round(max(0.0, end - start), 1) if (start and end) else 0.0
+
+    def to_record(self) -> dict:
+        """Columnar JSON-ready summary (one entry per question, same order in every list)."""
+        n = len(self.qids)
+        return {
+            "qids": list(self.qids),
+            "initial": list(self.initial),
+            "final": list(self.final),
+            "changes": list(self.changes),
+            "time_on_item_sec": [self.time_on_item(i) for i in range(n)],
+            "total_changes": int(sum(self.changes)),
+            "items_changed": sum(1 for c in self.changes if c),
+            "items_final_differs_from_initial": sum(
+                1 for i in range(n) if self.initial[i] is not None and self.initial[i] != self.final[i]),
+        }
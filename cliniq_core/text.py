@@ -0,0 +1,39 @@
+"""Text normalisation and case getters shared by the scoring functions."""
+import hashlib
+import re
+
+
+def sha256_hex(s: str) -> str:
+    return hashlib.sha256((s or "").encode("utf-8")).hexdigest()
+
+
+def safe_get_system(case: dict) -> str:
+    return (case.get("system") or case.get("category") or "Uncategorized").strip()
+
+
+def safe_get_setting(case: dict) -> str:
+    return (case.get("setting") or "Unspecified").strip()
+
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "to", "of", "in", "on", "for", "with", "without", "at", "by",
+    "is", "are", "was", "were", "be", "been", "being", "as", "from", "that", "this", "it", "its",
+    "patient", "pt"
+}
+
+
+def norm(s: str) -> str:
+    return (s or "").lower().strip()
+
+
+def tokenize(s: str):
+    s = norm(s)
+    tokens = re.findall(r"[a-z0-9]+", s)
+    return [t for t in tokens if t and t not in STOPWORDS]
+
+
+def normalize_text_basic(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    s = re.sub(r"[^\w\s]", "", s)  # remove punctuation
+    return s
@@ -0,0 +1,42 @@
+"""Round-trip every usable archive codec through compress_files / iter_archive_records."""
+import json
+
+import pytest
+
+from cliniq_core.archive import (
+    ArchiveReadError,
+    available_codecs,
+    codec_for_path,
+    compress_files,
+    iter_archive_records,
+)
+
+RECORDS = [{"caseId": f"c{i % 3}", "student_username": f"s{i}", "nclex": {"details": [{"qid": "q1", "points": i % 2}]}}
+           for i in range(250)]
+
+
+def _write_segments(tmp_path):
+    paths = []
+    for n, chunk in enumerate((RECORDS[:100], RECORDS[100:])):
+        p = tmp_path / f"attempts_{n}.jsonl"
+        p.write_text("".join(json.dumps(r) + "\n" for r in chunk), encoding="utf-8")
+        paths.append(p)
+    return paths
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_round_trip(tmp_path, codec):
+    sources = _write_segments(tmp_path)
+    stats = compress_files(sources, tmp_path / "archive.jsonl", codec)
+    assert stats["codec"] == codec
+    assert codec_for_path(stats["path"]) == codec
+    assert stats["bytes_in"] == sum(p.stat().st_size for p in sources)
+    assert list(iter_archive_records(stats["path"])) == RECORDS
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_corrupt_archive_raises(tmp_path, codec):
+    stats = compress_files(_write_segments(tmp_path), tmp_path / "archive.jsonl", codec)
+    stats["path"].write_bytes(b"not compressed data" * 10)
+    with pytest.raises(ArchiveReadError):
+        list(iter_archive_records(stats["path"]))